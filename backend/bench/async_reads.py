@@ -0,0 +1,158 @@
+"""
+Сравнение латентности read-эндпоинтов: синхронная Session в async-хендлере (как было)
+против асинхронной сессии (aiosqlite) при фиксированной конкурентности.
+
+    python bench/async_reads.py --concurrency 32 --requests 2000
+
+Каждый вариант запускается в отдельном процессе uvicorn (один воркер, как в gunicorn),
+клиент ходит к нему по HTTP, так что блокировка event loop синхронными запросами видна в p99.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def seed(universities: int):
+    from database import SessionLocal
+    from models import University, Program
+    from requests import UniversityRequest, ProgramRequest
+
+    with SessionLocal() as db:
+        for i in range(universities):
+            # Значения по умолчанию берем из моделей запросов, как при POST /api/
+            uni = University(**UniversityRequest(
+                name=f'University {i}', description='Описание', city='Алматы', min_ent_score=60,
+                rating=4, languages='Русский', price=1000,
+            ).model_dump())
+            uni.programs = [
+                Program(**ProgramRequest(
+                    university_id=0, name=f'Program {i}-{j}', description='', degree='Bachelor',
+                    price=500, duration=4, language='Русский', min_ent_score=60, employment=80,
+                ).model_dump(exclude={'university_id'}))
+                for j in range(5)
+            ]
+            db.add(uni)
+        db.commit()
+
+def create_sync_app():
+    from fastapi import FastAPI, Path
+
+    from database import SessionLocal
+    from models import University
+    from routers.universities import catalog_select, build_university_response
+
+    # Старый путь: синхронная Session внутри async def блокирует event loop на время запроса
+    app = FastAPI()
+
+    @app.get('/api/get/{university_id}')
+    async def read_university_sync(university_id: int = Path(gt=0)):
+        # Сессия закрывается внутри хендлера: с db_dependency соединение возвращается в пул
+        # только после ответа, и при конкурентности выше размера пула checkout блокирует loop
+        with SessionLocal() as db:
+            return build_university_response(db.scalars(catalog_select().filter(University.id == university_id)).first())
+
+    return app
+
+def serve(variant: str, port: int):
+    import uvicorn
+
+    if variant == 'async_session':
+        from main import app
+    else:
+        app = create_sync_app()
+    uvicorn.run(app, host='127.0.0.1', port=port, log_level='warning')
+
+async def wait_ready(client, path: str):
+    for _ in range(100):
+        try:
+            await client.get(path)
+            return
+        except Exception:
+            await asyncio.sleep(0.1)
+    raise RuntimeError('server did not start')
+
+async def run(client, paths, concurrency):
+    latencies = []
+    queue = list(paths)
+
+    async def worker():
+        while queue:
+            path = queue.pop()
+            started = time.perf_counter()
+            response = await client.get(path)
+            response.raise_for_status()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+    }
+
+async def measure(variant: str, paths: list[str], concurrency: int) -> dict:
+    import httpx
+
+    port = free_port()
+    server = multiprocessing.Process(target=serve, args=(variant, port), daemon=True)
+    server.start()
+    try:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', limits=limits) as client:
+            await wait_ready(client, paths[0])
+            await run(client, paths[:100], concurrency)  # прогрев
+            return await run(client, paths, concurrency)
+    finally:
+        server.terminate()
+        server.join()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--universities', type=int, default=500)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['CATALOG_VERSION_PATH'] = os.path.join(workdir, 'catalog.version')
+    os.environ.setdefault('API_KEY', 'bench')
+    os.environ.setdefault('RATE_LIMIT_ENABLED', 'false')  # все запросы бенчмарка идут с одного IP
+
+    import main as app_module
+    from database import engine
+    from migrations import run_migrations
+    run_migrations(engine)  # схема и индексы
+    seed(args.universities)
+
+    paths = [f'/api/get/{i % args.universities + 1}' for i in range(args.requests)]
+    results = {}
+    for variant in ['sync_session', 'async_session']:
+        results[variant] = asyncio.run(measure(variant, paths, args.concurrency))
+    print(json.dumps({'concurrency': args.concurrency, **results}, indent=2))
+    asyncio.run(app_module.async_engine.dispose())
+
+
+if __name__ == '__main__':
+    main()
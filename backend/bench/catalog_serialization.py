@@ -0,0 +1,91 @@
+"""
+Микробенчмарк сериализации каталога на 1000 университетов (без обращения к БД).
+
+    python bench/catalog_serialization.py --universities 1000 --repeat 20
+
+old_path       — build_university_response + повторная валидация и сериализация через response_model FastAPI
+snapshot_build — сборка снимка: сериализация, orjson, gzip и brotli (раз на версию каталога)
+snapshot_serve — ответ из готового снимка
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_catalog(universities: int):
+    from models import University, Program, AdmissionInfo
+    from requests import UniversityRequest, ProgramRequest
+
+    catalog = []
+    for i in range(universities):
+        uni = University(id=i + 1, **UniversityRequest(
+            name=f'University {i}', description='Описание университета ' * 10, city='Алматы', min_ent_score=60,
+            rating=4.5, languages='Русский, казахский, английский', price=1000,
+            partners=['Университеты США', 'Университеты Германии'],
+        ).model_dump())
+        uni.programs = [
+            Program(id=i * 10 + j, university_id=i + 1, **ProgramRequest(
+                university_id=i + 1, name=f'Program {i}-{j}', description='Описание программы', degree='Bachelor',
+                price=500, duration=4, language='Русский', min_ent_score=60, employment=80,
+            ).model_dump(exclude={'university_id'}))
+            for j in range(5)
+        ]
+        uni.admission_info = AdmissionInfo(
+            id=i + 1, university_id=i + 1, requirements=['Аттестат', 'ЕНТ'], deadlines=['До 15 июля'], scholarships=[],
+        )
+        catalog.append(uni)
+    return catalog
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(samples), 2)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--universities', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DATABASE_URL', 'sqlite://')
+    os.environ.setdefault('API_KEY', 'bench')
+
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+
+    from routers.universities import router, build_university_response
+    from snapshot import encode_snapshot
+
+    catalog = make_catalog(args.universities)
+    field = next(route.response_field for route in router.routes if route.name == 'read_universities')
+
+    def old_path():
+        content = [build_university_response(uni) for uni in catalog]
+        return JSONResponse(asyncio.run(serialize_response(field=field, response_content=content))).body
+
+    def snapshot_build():
+        return encode_snapshot(1, [build_university_response(uni) for uni in catalog])
+
+    snapshot = snapshot_build()
+    assert json.loads(snapshot.body['identity']) == json.loads(old_path())
+
+    print(json.dumps({
+        'universities': args.universities,
+        'old_path_ms': timed(old_path, args.repeat),
+        'snapshot_build_ms': timed(snapshot_build, args.repeat),
+        'snapshot_serve_ms': timed(lambda: bytes(snapshot.body['br']), args.repeat),
+        'bytes': {encoding: len(body) for encoding, body in snapshot.body.items()},
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Нагрузочный тест конкурентного чтения/записи в локальную SQLite.
+Читатели и писатели — отдельные процессы, как воркеры gunicorn.
+
+    python bench/db_contention.py --readers 8 --writers 4 --seconds 10
+    python bench/db_contention.py --no-tuning   # настройки по умолчанию для сравнения
+
+Читатели выполняют запрос каталога (университеты + программы + admission info),
+писатели добавляют программы с коммитом на каждую запись, как POST /api/programs.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import multiprocessing
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker, selectinload
+
+
+def make_session(url: str, tuned: bool):
+    import database
+    if tuned:
+        engine = database.create_db_engine(url)
+    else:
+        engine = create_engine(url, connect_args={'check_same_thread': False})
+    return engine, sessionmaker(autoflush=False, autocommit=False, bind=engine)
+
+def reader(url, tuned, stop, results):
+    from models import University
+    _, Session = make_session(url, tuned)
+    stats = {'reads': 0, 'read_errors': 0, 'max_read_ms': 0.0}
+    while time.time() < stop:
+        with Session() as db:
+            started = time.perf_counter()
+            try:
+                # Фиксированный объем чтения, чтобы результат не зависел от числа записей
+                db.query(University).options(
+                    selectinload(University.programs), selectinload(University.admission_info)
+                ).order_by(University.id).limit(20).all()
+                stats['reads'] += 1
+            except OperationalError:
+                stats['read_errors'] += 1
+            stats['max_read_ms'] = max(stats['max_read_ms'], (time.perf_counter() - started) * 1000)
+    results.put(stats)
+
+def writer(url, tuned, stop, results, n, universities):
+    from models import Program
+    _, Session = make_session(url, tuned)
+    stats = {'writes': 0, 'write_errors': 0, 'max_write_ms': 0.0}
+    i = 0
+    while time.time() < stop:
+        with Session() as db:
+            started = time.perf_counter()
+            try:
+                db.add(Program(university_id=i % universities + 1, name=f'Program {n}-{i}', degree='Bachelor'))
+                db.commit()
+                stats['writes'] += 1
+            except OperationalError:
+                db.rollback()
+                stats['write_errors'] += 1
+            stats['max_write_ms'] = max(stats['max_write_ms'], (time.perf_counter() - started) * 1000)
+        i += 1
+    results.put(stats)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--universities', type=int, default=200)
+    parser.add_argument('--no-tuning', action='store_true', help='engine без PRAGMA (journal_mode=DELETE)')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'contention.db')
+    url = f'sqlite:///{path}'
+    os.environ['DATABASE_URL'] = url
+    tuned = not args.no_tuning
+
+    from models import Base, University
+
+    engine, Session = make_session(url, tuned)
+    Base.metadata.create_all(bind=engine)
+    with Session() as db:
+        for i in range(args.universities):
+            db.add(University(name=f'University {i}', description='', city='Алматы', min_ent_score=50, rating=4, price=1000))
+        db.commit()
+    journal_mode = engine.connect().exec_driver_sql('PRAGMA journal_mode').scalar()
+    engine.dispose()
+
+    stop = time.time() + args.seconds
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=reader, args=(url, tuned, stop, results)) for _ in range(args.readers)]
+    processes += [
+        multiprocessing.Process(target=writer, args=(url, tuned, stop, results, n, args.universities))
+        for n in range(args.writers)
+    ]
+    for p in processes:
+        p.start()
+    stats = {'reads': 0, 'writes': 0, 'read_errors': 0, 'write_errors': 0, 'max_read_ms': 0.0, 'max_write_ms': 0.0}
+    for _ in processes:
+        for key, value in results.get().items():
+            stats[key] = max(stats[key], round(value, 1)) if key.startswith('max_') else stats[key] + value
+    for p in processes:
+        p.join()
+
+    print(json.dumps({
+        'journal_mode': journal_mode,
+        'seconds': args.seconds,
+        **stats,
+        'reads_per_second': round(stats['reads'] / args.seconds, 1),
+        'writes_per_second': round(stats['writes'] / args.seconds, 1),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
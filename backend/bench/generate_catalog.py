@@ -0,0 +1,174 @@
+"""
+Генератор синтетического каталога для бенчмарков: университеты, программы и admission info
+с правдоподобными текстами и JSON-списками. При одинаковом --seed результат один и тот же.
+
+    python bench/generate_catalog.py /tmp/bench.db --universities 1000 --programs-per-university 10
+    python bench/generate_catalog.py /tmp/bench.db --universities 200 --admissions-per-university 2 --seed 7
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CITIES = ['Алматы', 'Астана', 'Шымкент', 'Караганда', 'Актобе', 'Павлодар', 'Усть-Каменогорск', 'Семей', 'Атырау', 'Туркестан']
+CITY_WEIGHTS = [30, 25, 10, 8, 5, 5, 5, 4, 4, 4]
+NAME_PREFIXES = ['Казахский национальный', 'Евразийский', 'Международный', 'Технический', 'Педагогический', 'Медицинский', 'Аграрный', 'Гуманитарный']
+NAME_SUFFIXES = ['университет', 'университет технологий', 'исследовательский университет', 'университет бизнеса']
+FIELDS = {
+    'Информатика и вычислительная техника': 'программирование, алгоритмы, базы данных, машинное обучение',
+    'Информационная безопасность': 'криптография, защита сетей, анализ угроз',
+    'Прикладная математика': 'математическое моделирование, статистика, анализ данных',
+    'Экономика': 'макроэкономика, финансы, анализ рынков',
+    'Менеджмент': 'управление проектами, маркетинг, предпринимательство',
+    'Юриспруденция': 'гражданское право, международное право, судебная практика',
+    'Медицина': 'анатомия, клиническая практика, фармакология',
+    'Педагогика и психология': 'методика преподавания, детская психология',
+    'Филология / Иностранные языки': 'лингвистика, перевод, литература',
+    'Нефтегазовое дело': 'бурение, добыча нефти, геология',
+    'Архитектура': 'проектирование зданий, градостроительство, дизайн',
+    'Агрономия': 'растениеводство, почвоведение, агротехнологии',
+    'Журналистика': 'медиа, репортаж, цифровые коммуникации',
+    'Международные отношения': 'дипломатия, геополитика, внешняя политика',
+}
+DEGREES = ['Bachelor', 'Bachelor', 'Bachelor', 'Master', 'PhD']
+LANGUAGES = ['Русский', 'Казахский', 'Английский']
+PARTNERS = ['Университеты США', 'Университеты Германии', 'Университеты Кореи', 'Университеты Китая', 'Университеты Турции', 'Университеты Великобритании']
+EXCHANGE = ['Erasmus+', 'Международные программы обмена', 'Летние школы', 'Исследовательские стажировки', 'Академическая мобильность']
+OPPORTUNITIES = ['Подготовительные курсы', 'Общежитие для иностранных студентов', 'Полностью на английском языке', 'Международная среда']
+REQUIREMENTS = ['Аттестат о среднем образовании', 'Сертификат ЕНТ', 'IELTS 5.5 / TOEFL 46+', 'Медицинская справка 075-У', 'Мотивационное письмо', 'Фото 3x4']
+DEADLINES = ['Прием документов: 20 июня — 25 августа', 'Осенний семестр: до 15 июля', 'Весенний семестр: до 15 декабря', 'Творческий экзамен: до 10 июля']
+SCHOLARSHIPS = ['Государственный грант', 'Ректорская скидка 25%', 'Грант акима области', 'Merit-based стипендии (25-75% покрытия)', 'Скидка для победителей олимпиад']
+
+
+def sample(rng: random.Random, values: list[str], low: int, high: int) -> list[str]:
+    return rng.sample(values, rng.randint(low, min(high, len(values))))
+
+def university_row(rng: random.Random, i: int) -> dict:
+    city = rng.choices(CITIES, CITY_WEIGHTS)[0]
+    name = f'{rng.choice(NAME_PREFIXES)} {rng.choice(NAME_SUFFIXES)} №{i + 1} ({city})'
+    exchange = rng.random() < 0.6
+    double_degree = rng.random() < 0.3
+    ielts = rng.random() < 0.4
+    return {
+        'name': name,
+        'description': f'{name} готовит специалистов по {rng.randint(5, 60)} направлениям. ' * rng.randint(1, 4),
+        'mission_text': 'Подготовка конкурентоспособных специалистов, исследования и развитие региона.',
+        'history': f'Основан в {rng.randint(1930, 2015)} году. ' * rng.randint(1, 3),
+        'min_ent_score': rng.randint(50, 120),
+        'logo_url': f'https://example.com/logo/{i + 1}.png',
+        'tour_url': f'https://example.com/tour/{i + 1}' if rng.random() < 0.3 else None,
+        'city': city,
+        'has_dormitory': rng.random() < 0.7,
+        'has_military_dept': rng.random() < 0.3,
+        'rating': round(rng.uniform(3.0, 5.0), 1),
+        'has_tour': rng.random() < 0.3,
+        'languages': sample(rng, LANGUAGES, 1, 3),
+        'number_of_grants': rng.choice([0, rng.randint(20, 2000)]),
+        'exchange_program': exchange,
+        'exchange_programs': sample(rng, EXCHANGE, 1, 3) if exchange else None,
+        'partners': sample(rng, PARTNERS, 0, 4),
+        'foreign_student_opps': sample(rng, OPPORTUNITIES, 0, 3),
+        'double_degree_program': double_degree,
+        'double_degree_programs': sample(rng, PARTNERS, 1, 2) if double_degree else None,
+        'IELTS_sertificate': ielts,
+        'min_ielts': rng.choice([5.0, 5.5, 6.0, 6.5]) if ielts else None,
+        'format': rng.choice(['offline', 'hybrid', 'online']),
+        'price': rng.randrange(600_000, 8_000_000, 50_000),
+    }
+
+def program_row(rng: random.Random, university_id: int) -> dict:
+    field, topics = rng.choice(list(FIELDS.items()))
+    return {
+        'university_id': university_id,
+        'name': field,
+        'description': f'Программа: {topics}.',
+        'degree': rng.choice(DEGREES),
+        'price': rng.randrange(500_000, 6_000_000, 50_000),
+        'duration': rng.choice([2, 4, 4, 5]),
+        'language': rng.choice(LANGUAGES),
+        'min_ent_score': rng.randint(50, 130),
+        'internship': rng.random() < 0.6,
+        'double_degree_program': rng.random() < 0.15,
+        'employment': rng.randint(55, 98),
+    }
+
+def admission_row(rng: random.Random, university_id: int) -> dict:
+    return {
+        'university_id': university_id,
+        'requirements_text': 'Документы принимаются в приемной комиссии и онлайн.',
+        'requirements': sample(rng, REQUIREMENTS, 2, 5),
+        'deadlines': sample(rng, DEADLINES, 1, 3),
+        'scholarships': sample(rng, SCHOLARSHIPS, 0, 3),
+        'procedure': 'Подача документов → Вступительные испытания → Зачисление',
+    }
+
+def generate(
+    path: str,
+    universities: int = 1000,
+    programs_per_university: int = 10,
+    admissions_per_university: int = 1,
+    seed: int = 42,
+    batch_size: int = 5000,
+) -> dict:
+    """Создает базу с нуля по пути path; возвращает число строк по таблицам."""
+    from sqlalchemy import insert
+
+    from database import Base, create_db_engine
+    from migrations import run_migrations
+    from models import University, Program, AdmissionInfo
+
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_db_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(seed)
+    counts = {'universities': 0, 'programs': 0, 'admission_info': 0}
+
+    def flush(model, rows: list, key: str):
+        if rows:
+            with engine.begin() as conn:
+                conn.execute(insert(model), rows)
+            counts[key] += len(rows)
+            rows.clear()
+
+    unis, programs, admissions = [], [], []
+    for i in range(universities):
+        unis.append(university_row(rng, i))
+        # id назначаются по порядку вставки в пустую таблицу
+        programs.extend(program_row(rng, i + 1) for _ in range(programs_per_university))
+        admissions.extend(admission_row(rng, i + 1) for _ in range(admissions_per_university))
+        if len(programs) >= batch_size:
+            flush(University, unis, 'universities')
+            flush(Program, programs, 'programs')
+            flush(AdmissionInfo, admissions, 'admission_info')
+    flush(University, unis, 'universities')
+    flush(Program, programs, 'programs')
+    flush(AdmissionInfo, admissions, 'admission_info')
+
+    # Индекс поиска строится одним проходом после загрузки, а не триггерами на каждую строку;
+    # run_migrations заодно ставит версию схемы, и приложение не мигрирует базу при старте
+    run_migrations(engine)
+    engine.dispose()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Синтетический каталог для бенчмарков')
+    parser.add_argument('path')
+    parser.add_argument('--universities', type=int, default=1000)
+    parser.add_argument('--programs-per-university', type=int, default=10)
+    parser.add_argument('--admissions-per-university', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = generate(args.path, args.universities, args.programs_per_university, args.admissions_per_university, args.seed)
+    print(json.dumps({**counts, 'seconds': round(time.perf_counter() - started, 2)}, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
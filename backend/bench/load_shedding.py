@@ -0,0 +1,143 @@
+"""
+Задержка чтений каталога во время всплеска запросов к советнику: без всплеска, со всплеском без лимитов
+и со всплеском с лимитами (limits.py). Модель заменена заглушкой из suite.py.
+
+    python bench/load_shedding.py --universities 1000 --flood-concurrency 64
+
+Клиенты различаются по X-Forwarded-For (127.0.0.1 — доверенный прокси): один «скрейпер» шлет
+POST /api/advisor/recommend без пауз (после 429/503 ждет Retry-After), другой клиент в это время
+читает карточки университетов; бюджет каталога в бенчмарке не ограничен, чтобы читатель не получал 429.
+Для каждого режима — p50/p99 чтений, сколько запросов скрейпера обслужено и сколько отклонено (429/503).
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_reads import free_port, percentile, wait_ready  # noqa: E402
+from generate_catalog import generate  # noqa: E402
+from suite import install_llm_stub, make_requests  # noqa: E402
+
+MODES = {
+    'baseline': {'flood': False, 'limits': False},
+    'flood_no_limits': {'flood': True, 'limits': False},
+    'flood_limits': {'flood': True, 'limits': True},
+}
+
+
+def serve(port: int, llm_latency_ms: float, limits: bool):
+    # До импорта main: настройки limits.py читаются при импорте
+    os.environ['RATE_LIMIT_ENABLED'] = 'true' if limits else 'false'
+    os.environ['RATE_LIMIT_TRUSTED_PROXIES'] = '127.0.0.1'
+    os.environ['RATE_LIMIT_CATALOG_PER_MINUTE'] = '0'
+    import uvicorn
+
+    from main import app
+    install_llm_stub(llm_latency_ms)
+    uvicorn.run(app, host='127.0.0.1', port=port, log_level='warning')
+
+async def measure(args, universities: int, mode: dict) -> dict:
+    import httpx
+
+    port = free_port()
+    server = multiprocessing.Process(target=serve, args=(port, args.llm_latency_ms, mode['limits']), daemon=True)
+    server.start()
+    try:
+        limits = httpx.Limits(max_connections=args.flood_concurrency + args.concurrency)
+        async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', limits=limits, timeout=120) as client:
+            await wait_ready(client, '/api/get/1')
+            await client.get('/api/get/1', headers={'X-Forwarded-For': '10.0.0.2'})
+            statuses: dict[int, int] = {}
+            stop = asyncio.Event()
+            advisor = make_requests('advisor', 1000, universities, random.Random(args.seed))
+
+            async def scraper(worker: int):
+                i = worker
+                while not stop.is_set():
+                    _, path, body = advisor[i % len(advisor)]
+                    i += args.flood_concurrency
+                    try:
+                        response = await client.post(path, json=body, headers={'X-Forwarded-For': '10.0.0.1'})
+                        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                    except httpx.TransportError:
+                        statuses[0] = statuses.get(0, 0) + 1
+                        continue
+                    if 'retry-after' in response.headers:
+                        try:
+                            await asyncio.wait_for(stop.wait(), float(response.headers['retry-after']))
+                        except asyncio.TimeoutError:
+                            pass
+
+            flood = [asyncio.create_task(scraper(worker)) for worker in range(args.flood_concurrency)] if mode['flood'] else []
+            await asyncio.sleep(1 if flood else 0)  # всплеск уже идет, когда начинаются чтения
+
+            rng = random.Random(args.seed)
+            paths = [f'/api/get/{rng.randint(1, universities)}' for _ in range(args.requests)]
+            latencies, errors = [], 0
+
+            async def reader():
+                nonlocal errors
+                while paths:
+                    path = paths.pop()
+                    started = time.perf_counter()
+                    response = await client.get(path, headers={'X-Forwarded-For': '10.0.0.2'})
+                    if response.status_code != 200:
+                        errors += 1
+                        continue
+                    latencies.append((time.perf_counter() - started) * 1000)
+
+            await asyncio.gather(*(reader() for _ in range(args.concurrency)))
+            stop.set()
+            await asyncio.gather(*flood)
+        return {
+            'reads': len(latencies),
+            'read_errors': errors,
+            'read_p50_ms': round(percentile(latencies, 50), 2) if latencies else None,
+            'read_p99_ms': round(percentile(latencies, 99), 2) if latencies else None,
+            'scraper_statuses': {str(code): count for code, count in sorted(statuses.items())},
+        }
+    finally:
+        server.terminate()
+        server.join()
+
+def main():
+    parser = argparse.ArgumentParser(description='Чтения каталога во время всплеска запросов к советнику')
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    parser.add_argument('--universities', type=int, default=1000)
+    parser.add_argument('--programs-per-university', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=500, help='чтений каталога')
+    parser.add_argument('--concurrency', type=int, default=4, help='одновременных чтений')
+    parser.add_argument('--flood-concurrency', type=int, default=64, help='одновременных запросов скрейпера')
+    parser.add_argument('--llm-latency-ms', type=float, default=300)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    path = os.path.join(workdir, 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    os.environ['CATALOG_VERSION_PATH'] = os.path.join(workdir, 'catalog.version')
+    os.environ['SIMILAR_INDEX_PATH'] = os.path.join(workdir, 'similar_index.npz')
+    os.environ['AI_CACHE_BACKEND'] = 'memory'
+    os.environ['AI_CACHE_TTL'] = '0'  # каждый запрос скрейпера доходит до советника
+    os.environ.setdefault('GROQ_REQUESTS_PER_MINUTE', '0')
+    os.environ.setdefault('API_KEY', 'bench')
+    generate(path, args.universities, args.programs_per_university)
+
+    results = {name: asyncio.run(measure(args, args.universities, MODES[name])) for name in args.modes}
+    print(json.dumps({
+        'universities': args.universities,
+        'flood_concurrency': args.flood_concurrency,
+        'llm_latency_ms': args.llm_latency_ms,
+        'modes': results,
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
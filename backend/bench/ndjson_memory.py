@@ -0,0 +1,118 @@
+"""
+Пиковая память воркера и время до первого байта для GET /api/programs: JSON-список против NDJSON-потока.
+
+    python bench/ndjson_memory.py --programs 1000000
+    python bench/ndjson_memory.py --programs 1000000 --modes ndjson   # без материализации списка
+
+База генерируется заново; каждый режим обслуживается отдельным процессом uvicorn,
+память читается из /proc: VmHWM включает страницы БД, отображенные через mmap (SQLITE_MMAP_SIZE),
+поэтому отдельно отслеживается пик анонимной памяти (RssAnon) — кучи Python и буферов.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_reads import free_port, wait_ready  # noqa: E402
+
+
+def generate(path: str, programs: int, universities: int = 1000):
+    # Схему создают миграции, данные вставляем напрямую executemany — так быстрее ORM
+    from database import engine
+    from migrations import run_migrations
+    run_migrations(engine)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO universities (name, description, city, min_ent_score, rating, languages, price) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        ((f"University {i}", "Описание", "Алматы", 60, 4, '["Русский"]', 1000) for i in range(universities)),
+    )
+    conn.executemany(
+        "INSERT INTO programs (university_id, name, description, degree, price, duration, language, min_ent_score, "
+        "internship, double_degree_program, employment) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            (i % universities + 1, f"Program {i}", "Описание программы", "Bachelor", 500, 4, "Русский", 60, 0, 0, 80)
+            for i in range(programs)
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+def serve(port: int):
+    import uvicorn
+    from main import app
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+def proc_status_mb(pid: int, field: str) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(f"{field}:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return 0.0
+
+async def measure(mode: str) -> dict:
+    import httpx
+
+    port = free_port()
+    server = multiprocessing.Process(target=serve, args=(port,), daemon=True)
+    server.start()
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+            await wait_ready(client, "/api/admissions")
+            baseline = proc_status_mb(server.pid, "RssAnon")
+            peak_anon = baseline
+            params = {"stream": 1} if mode == "ndjson" else {}
+            started = time.perf_counter()
+            first_byte = None
+            size = 0
+
+            async def sample():
+                nonlocal peak_anon
+                while True:
+                    peak_anon = max(peak_anon, proc_status_mb(server.pid, "RssAnon"))
+                    await asyncio.sleep(0.05)
+
+            sampler = asyncio.create_task(sample())
+            async with client.stream("GET", "/api/programs", params=params) as response:
+                async for chunk in response.aiter_bytes():
+                    if first_byte is None:
+                        first_byte = time.perf_counter() - started
+                    size += len(chunk)
+            sampler.cancel()
+            return {
+                "ttfb_ms": round(first_byte * 1000, 1),
+                "total_ms": round((time.perf_counter() - started) * 1000, 1),
+                "mb": round(size / 1024 / 1024, 1),
+                "baseline_anon_mb": baseline,
+                "peak_anon_mb": peak_anon,
+                "peak_rss_mb": proc_status_mb(server.pid, "VmHWM"),
+            }
+    finally:
+        server.terminate()
+        server.join()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--programs", type=int, default=1_000_000)
+    parser.add_argument("--modes", nargs="+", choices=["json", "ndjson"], default=["json", "ndjson"])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    path = os.path.join(workdir, "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ["CATALOG_VERSION_PATH"] = os.path.join(workdir, "catalog.version")
+    os.environ.setdefault("API_KEY", "bench")
+
+    generate(path, args.programs)
+    results = {mode: asyncio.run(measure(mode)) for mode in args.modes}
+    print(json.dumps({"programs": args.programs, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
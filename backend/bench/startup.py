@@ -0,0 +1,128 @@
+"""
+Холодный старт gunicorn: время от запуска до первого 200 и память воркеров.
+
+    python bench/startup.py --workers 4 --universities 2000
+    python bench/startup.py --app-dir /tmp/old/backend --legacy   # другой checkout, запуск как в старом dockerfile
+
+Каталог генерируется один раз и копируется для каждого прогона. После первого 200 отправляется
+пачка одновременных запросов, чтобы каждый воркер обслужил свои первые запросы (без прогрева
+они собирают снимок каталога сами), затем из /proc читаются RSS и PSS каждого воркера:
+PSS делит общие страницы между процессами, поэтому copy-on-write после --preload виден именно в нем.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_reads import free_port, percentile  # noqa: E402
+from generate_catalog import generate  # noqa: E402
+
+LEGACY_ARGS = ['--worker-class', 'uvicorn.workers.UvicornWorker']
+
+
+def proc_mb(path: str, field: str) -> float:
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(f'{field}:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except FileNotFoundError:
+        pass
+    return 0.0
+
+def worker_pids(master: int) -> list[int]:
+    with open(f'/proc/{master}/task/{master}/children') as f:
+        return [int(pid) for pid in f.read().split()]
+
+async def measure(args, workdir: str) -> dict:
+    import httpx
+
+    port = free_port()
+    env = {
+        **os.environ,
+        'DATABASE_URL': f'sqlite:///{os.path.join(workdir, "bench.db")}',
+        'CATALOG_VERSION_PATH': os.path.join(workdir, 'catalog.version'),
+        'SIMILAR_INDEX_PATH': os.path.join(workdir, 'similar_index.npz'),
+        'AI_CACHE_BACKEND': 'memory',
+        'API_KEY': 'bench',
+    }
+    command = [sys.executable, '-m', 'gunicorn', 'main:app', '--workers', str(args.workers), '--bind', f'127.0.0.1:{port}']
+    command += LEGACY_ARGS if args.legacy else ['-c', 'gunicorn.conf.py']
+    started = time.perf_counter()
+    server = subprocess.Popen(command, cwd=args.app_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        limits = httpx.Limits(max_connections=args.burst, max_keepalive_connections=0)  # новое соединение — любой воркер
+        async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', timeout=120, limits=limits) as client:
+            while True:
+                try:
+                    if (await client.get('/api/')).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if server.poll() is not None:
+                    raise RuntimeError('gunicorn exited')
+                await asyncio.sleep(0.05)
+            first_200 = time.perf_counter() - started
+
+            async def timed(path):
+                request_started = time.perf_counter()
+                (await client.get(path)).raise_for_status()
+                return (time.perf_counter() - request_started) * 1000
+
+            paths = [f'/api/get/{i % args.universities + 1}' for i in range(args.burst)]
+            latencies = await asyncio.gather(*(timed(path) for path in paths))
+
+        workers = worker_pids(server.pid)
+        return {
+            'cold_start_to_first_200_ms': round(first_200 * 1000),
+            'first_burst_p50_ms': round(percentile(latencies, 50), 1),
+            'first_burst_max_ms': round(max(latencies), 1),
+            'master_rss_mb': proc_mb(f'/proc/{server.pid}/status', 'VmRSS'),
+            'worker_rss_mb': [proc_mb(f'/proc/{pid}/status', 'VmRSS') for pid in workers],
+            'worker_pss_mb': [proc_mb(f'/proc/{pid}/smaps_rollup', 'Pss') for pid in workers],
+        }
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description='Холодный старт gunicorn: время до первого 200 и память воркеров')
+    parser.add_argument('--app-dir', default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser.add_argument('--legacy', action='store_true', help='без gunicorn.conf.py, как старый dockerfile')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--universities', type=int, default=2000)
+    parser.add_argument('--programs-per-university', type=int, default=10)
+    parser.add_argument('--burst', type=int, default=32, help='одновременных запросов после первого 200')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    source = tempfile.mkdtemp()
+    generate(os.path.join(source, 'bench.db'), args.universities, args.programs_per_university)
+    runs = []
+    for _ in range(args.runs):
+        # Каждый прогон на копии: без индекса похожих на диске и со свежей версией каталога
+        workdir = tempfile.mkdtemp()
+        shutil.copy(os.path.join(source, 'bench.db'), workdir)
+        runs.append(asyncio.run(measure(args, workdir)))
+        shutil.rmtree(workdir)
+
+    best = min(runs, key=lambda run: run['cold_start_to_first_200_ms'])
+    print(json.dumps({
+        'app_dir': args.app_dir,
+        'legacy': args.legacy,
+        'workers': args.workers,
+        'universities': args.universities,
+        'cold_start_to_first_200_ms': [run['cold_start_to_first_200_ms'] for run in runs],
+        'best': best,
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+"""
+Воспроизводимый бенчмарк API на синтетическом каталоге: список, фильтр, карточка университета,
+поиск и советник. Вызовы Groq заменены заглушкой с фиксированной задержкой.
+
+    python bench/suite.py --universities 1000 --programs-per-university 10 --output results.json
+    python bench/suite.py --mode asgi --scenarios detail search   # без сети, в одном процессе
+    python bench/suite.py --database /tmp/bench.db                # готовая база от generate_catalog.py
+
+Результат — JSON с коммитом, параметрами и по каждому сценарию: requests, errors, rps, p50/p95/p99.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_reads import free_port, percentile, wait_ready  # noqa: E402
+from generate_catalog import CITIES, FIELDS, generate  # noqa: E402
+
+SCENARIOS = ['list', 'list_filtered', 'list_summary', 'detail', 'search', 'advisor']
+SEARCH_TERMS = ['информатика', 'экономика', 'медицина', 'университет', 'право', 'математика', 'архитектура', 'Алматы']
+INTERESTS = ['программирование', 'финансы', 'медицина', 'дизайн', 'языки', 'спорт', 'нефть и газ', 'политика']
+
+
+def install_llm_stub(latency_ms: float):
+    """Подменяет клиент Groq: ответ через latency_ms, первый университет из shortlist в промпте."""
+    import httpx
+    from openai import AsyncOpenAI
+
+    import groq
+
+    async def handler(request):
+        await asyncio.sleep(latency_ms / 1000)
+        prompt = json.loads(request.content).get('input', '')
+        match = re.search(r'^- (.+?) \(', prompt, re.MULTILINE)
+        text = json.dumps({
+            'university_name': match.group(1) if match else 'KIMEP University',
+            'short_reason': 'Подходит по баллу ЕНТ, городу и интересам абитуриента.',
+        }, ensure_ascii=False)
+        return httpx.Response(200, json={
+            'id': 'resp_bench', 'object': 'response', 'created_at': 0, 'model': groq.GROQ_MODEL, 'status': 'completed',
+            'output': [{
+                'type': 'message', 'id': 'msg_bench', 'status': 'completed', 'role': 'assistant',
+                'content': [{'type': 'output_text', 'text': text, 'annotations': []}],
+            }],
+            'parallel_tool_calls': False, 'tool_choice': 'auto', 'tools': [],
+            'usage': {
+                'input_tokens': len(prompt) // 4, 'output_tokens': len(text) // 4, 'total_tokens': (len(prompt) + len(text)) // 4,
+                'input_tokens_details': {'cached_tokens': 0}, 'output_tokens_details': {'reasoning_tokens': 0},
+            },
+        })
+
+    groq._async_client = AsyncOpenAI(
+        api_key='bench', base_url='http://llm-stub/v1', max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+
+def make_requests(scenario: str, count: int, universities: int, rng: random.Random) -> list[tuple[str, str, dict | None]]:
+    """(метод, путь, JSON-тело) — один и тот же набор при одинаковом --seed."""
+    if scenario == 'list':
+        return [('GET', '/api/', None)] * count
+    if scenario == 'list_filtered':
+        return [
+            ('GET', f'/api/?city={rng.choice(CITIES)}&min_score={rng.randint(50, 120)}&sort=rating&order=desc&limit=50', None)
+            for _ in range(count)
+        ]
+    if scenario == 'list_summary':
+        return [
+            ('GET', f'/api/?city={rng.choice(CITIES)}&min_score={rng.randint(50, 120)}&sort=rating&order=desc&limit=50&view=summary', None)
+            for _ in range(count)
+        ]
+    if scenario == 'detail':
+        return [('GET', f'/api/get/{rng.randint(1, universities)}', None) for _ in range(count)]
+    if scenario == 'search':
+        return [('GET', f'/api/search?q={rng.choice(SEARCH_TERMS)}&limit=20', None) for _ in range(count)]
+    return [
+        ('POST', '/api/advisor/recommend', {
+            'ent_score': rng.randint(60, 140),
+            'profile_subjects': rng.choice(['математика, физика', 'биология, химия', 'история, география', 'английский, литература']),
+            'interests': rng.choice(INTERESTS),
+            'preferred_city': rng.choice(CITIES),
+            'career_goal': rng.choice(list(FIELDS)),
+        })
+        for _ in range(count)
+    ]
+
+async def run_scenario(client, requests: list, concurrency: int) -> dict:
+    latencies, errors = [], 0
+    queue = list(reversed(requests))
+
+    async def worker():
+        nonlocal errors
+        while queue:
+            method, path, body = queue.pop()
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                response.raise_for_status()
+            except Exception:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    if not latencies:
+        return {'requests': len(requests), 'errors': errors}
+    return {
+        'requests': len(requests),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+    }
+
+async def run_suite(client, args, universities: int) -> dict:
+    results = {}
+    for scenario in args.scenarios:
+        rng = random.Random(f'{args.seed}:{scenario}')
+        requests = make_requests(scenario, args.requests, universities, rng)
+        await run_scenario(client, requests[:args.warmup], args.concurrency)  # прогрев: снимок каталога, кэши
+        results[scenario] = await run_scenario(client, requests, args.concurrency)
+    return results
+
+def serve(port: int, llm_latency_ms: float):
+    import uvicorn
+
+    from main import app
+    install_llm_stub(llm_latency_ms)
+    uvicorn.run(app, host='127.0.0.1', port=port, log_level='warning')
+
+async def measure_uvicorn(args, universities: int) -> dict:
+    import httpx
+
+    port = free_port()
+    server = multiprocessing.Process(target=serve, args=(port, args.llm_latency_ms), daemon=True)
+    server.start()
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', limits=limits, timeout=60) as client:
+            await wait_ready(client, '/api/get/1')
+            return await run_suite(client, args, universities)
+    finally:
+        server.terminate()
+        server.join()
+
+async def measure_asgi(args, universities: int) -> dict:
+    import httpx
+
+    import database
+    from main import app
+    install_llm_stub(args.llm_latency_ms)
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://bench', timeout=60) as client:
+            return await run_suite(client, args, universities)
+    finally:
+        await database.async_engine.dispose()
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк API на синтетическом каталоге')
+    parser.add_argument('--mode', choices=['uvicorn', 'asgi'], default='uvicorn')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--database', help='готовая база (по умолчанию генерируется во временном каталоге)')
+    parser.add_argument('--universities', type=int, default=1000)
+    parser.add_argument('--programs-per-university', type=int, default=10)
+    parser.add_argument('--admissions-per-university', type=int, default=1)
+    parser.add_argument('--requests', type=int, default=1000, help='запросов на сценарий')
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--llm-latency-ms', type=float, default=300)
+    parser.add_argument('--ai-cache', action='store_true', help='не отключать кэш ответов ИИ')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='дополнительно записать JSON в файл')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    path = os.path.abspath(args.database) if args.database else os.path.join(workdir, 'bench.db')
+    # До первого импорта database: engine создается по DATABASE_URL при импорте
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    os.environ['CATALOG_VERSION_PATH'] = os.path.join(workdir, 'catalog.version')
+    os.environ['AI_CACHE_BACKEND'] = 'memory'
+    if not args.ai_cache:
+        os.environ['AI_CACHE_TTL'] = '0'  # каждый запрос советника доходит до заглушки модели
+    os.environ.setdefault('GROQ_REQUESTS_PER_MINUTE', '0')  # у заглушки нет квоты
+    os.environ.setdefault('API_KEY', 'bench')
+    os.environ.setdefault('RATE_LIMIT_ENABLED', 'false')  # все запросы бенчмарка идут с одного IP
+
+    if not args.database:
+        generate(path, args.universities, args.programs_per_university, args.admissions_per_university, args.seed)
+    import sqlite3
+    with sqlite3.connect(path) as conn:
+        universities = conn.execute('SELECT COUNT(*) FROM universities').fetchone()[0]
+
+    measure = measure_uvicorn if args.mode == 'uvicorn' else measure_asgi
+    started = time.perf_counter()
+    results = asyncio.run(measure(args, universities))
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'params': {
+            'mode': args.mode, 'universities': universities, 'requests': args.requests, 'concurrency': args.concurrency,
+            'llm_latency_ms': args.llm_latency_ms, 'ai_cache': args.ai_cache, 'seed': args.seed,
+        },
+        'seconds': round(time.perf_counter() - started, 1),
+        'scenarios': results,
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
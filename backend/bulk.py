@@ -0,0 +1,241 @@
+"""
+Массовый импорт/экспорт университетов, программ и admission info (JSONL или CSV).
+
+    python bulk.py import universities data.jsonl
+    python bulk.py import programs programs.csv --format csv --chunk-size 1000
+    python bulk.py export universities - > universities.jsonl
+
+Строки валидируются моделями запросов API; запись идет пачками (executemany) с коммитом на пачку.
+Существующие записи обновляются по естественному ключу, ошибки строк не прерывают импорт.
+"""
+from decimal import Decimal
+from typing import Callable, Iterable, Iterator, NamedTuple
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+import orjson
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import JSON, and_, or_, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import University, Program, AdmissionInfo, folded_columns
+from requests import UniversityRequest, ProgramRequest, AdmissionInfoRequest
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+# Сколько ошибок строк возвращать в отчете (считаются все)
+BULK_MAX_ERRORS = int(os.getenv("BULK_MAX_ERRORS", "1000"))
+
+
+class BulkEntity(NamedTuple):
+    model: type
+    request: type[BaseModel]
+    key: tuple[str, ...]  # естественный ключ для upsert
+    # Вычисляемые колонки строки: bulk_*_mappings не вызывают события ORM (models.set_folded_columns)
+    derive: Callable[[dict], dict] | None = None
+
+
+ENTITIES = {
+    "universities": BulkEntity(University, UniversityRequest, ("name",), lambda row: folded_columns(row.get("name"), row.get("languages"))),
+    "programs": BulkEntity(Program, ProgramRequest, ("university_id", "name", "degree")),
+    "admissions": BulkEntity(AdmissionInfo, AdmissionInfoRequest, ("university_id",)),
+}
+
+FORMATS = ["jsonl", "csv"]
+
+
+def read_records(lines: Iterable[str], fmt: str) -> Iterator[tuple[int, dict | None, str | None]]:
+    """(номер строки, запись, ошибка разбора) для JSONL или CSV с заголовком."""
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            # Пустая ячейка CSV — отсутствующее значение, а не пустая строка
+            yield reader.line_num, {k: v for k, v in record.items() if k and v != ""}, None
+        return
+    for line_num, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_num, None, f"invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_num, None, "expected a JSON object"
+            continue
+        yield line_num, record, None
+
+def format_validation_error(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, e['loc'])) or 'row'}: {e['msg']}" for e in error.errors())
+
+def key_condition(columns: list, keys: Iterable[tuple]):
+    """Строки с любым из ключей. IN не находит NULL, поэтому ключи группируются по тому, какие части NULL."""
+    groups: dict[tuple[bool, ...], list[tuple]] = {}
+    for key in keys:
+        groups.setdefault(tuple(part is None for part in key), []).append(key)
+    conditions = []
+    for nulls, group in groups.items():
+        clauses = [column.is_(None) for column, null in zip(columns, nulls) if null]
+        present = [i for i, null in enumerate(nulls) if not null]
+        if len(present) == 1:
+            clauses.append(columns[present[0]].in_([key[present[0]] for key in group]))
+        elif present:
+            clauses.append(tuple_(*(columns[i] for i in present)).in_([tuple(key[i] for i in present) for key in group]))
+        conditions.append(and_(*clauses))
+    return or_(*conditions)
+
+def write_chunk(db: Session, entity: BulkEntity, rows: list[dict]) -> tuple[int, int]:
+    if entity.derive is not None:
+        rows = [{**row, **entity.derive(row)} for row in rows]
+    # Повтор ключа внутри пачки: побеждает последняя строка
+    keyed = {tuple(row[k] for k in entity.key): row for row in rows}
+    columns = [getattr(entity.model, k) for k in entity.key]
+    existing = {}
+    for row in db.query(entity.model.id, *columns).filter(key_condition(columns, keyed)).order_by(entity.model.id):
+        existing.setdefault(tuple(row[1:]), row[0])
+
+    inserts = [row for key, row in keyed.items() if key not in existing]
+    updates = [{**row, "id": existing[key]} for key, row in keyed.items() if key in existing]
+    if inserts:
+        db.bulk_insert_mappings(entity.model, inserts)
+    if updates:
+        db.bulk_update_mappings(entity.model, updates)
+    db.commit()
+    return len(inserts), len(updates)
+
+def import_records(lines: Iterable[str], entity_name: str, fmt: str = "jsonl", chunk_size: int = BULK_CHUNK_SIZE) -> dict:
+    """Импорт потока строк; возвращает отчет со скоростью и ошибками по строкам."""
+    entity = ENTITIES[entity_name]
+    started = time.perf_counter()
+    report = {"entity": entity_name, "rows": 0, "inserted": 0, "updated": 0, "failed": 0, "errors": []}
+
+    def fail(line_num: int, message: str):
+        report["failed"] += 1
+        if len(report["errors"]) < BULK_MAX_ERRORS:
+            report["errors"].append({"line": line_num, "error": message})
+
+    with SessionLocal() as db:
+        chunk = []
+
+        def write(rows: list[tuple[int, dict]]):
+            inserted, updated = write_chunk(db, entity, [row for _, row in rows])
+            report["inserted"] += inserted
+            report["updated"] += updated
+
+        def flush():
+            try:
+                write(chunk)
+            except SQLAlchemyError:
+                db.rollback()
+                # Пачка откатилась целиком: пишем ее построчно, чтобы в отчет попали только строки с ошибкой
+                for line_num, row in chunk:
+                    try:
+                        write([(line_num, row)])
+                    except SQLAlchemyError as e:
+                        db.rollback()
+                        fail(line_num, f"database error: {getattr(e, 'orig', None) or e}")
+            chunk.clear()
+
+        for line_num, record, error in read_records(lines, fmt):
+            report["rows"] += 1
+            if error:
+                fail(line_num, error)
+                continue
+            try:
+                chunk.append((line_num, entity.request.model_validate(record).model_dump()))
+            except ValidationError as e:
+                fail(line_num, format_validation_error(e))
+                continue
+            if len(chunk) >= chunk_size:
+                flush()
+        if chunk:
+            flush()
+
+    elapsed = time.perf_counter() - started
+    report["seconds"] = round(elapsed, 3)
+    report["rows_per_second"] = round(report["rows"] / elapsed, 1) if elapsed > 0 else None
+    return report
+
+def export_row(obj, columns: list[str]) -> dict:
+    row = {column: getattr(obj, column) for column in columns}
+    return {k: float(v) if isinstance(v, Decimal) else v for k, v in row.items()}
+
+def export_records(entity_name: str, fmt: str = "jsonl", chunk_size: int = BULK_CHUNK_SIZE) -> Iterator[bytes]:
+    """Потоковый экспорт в формате, который принимает import_records."""
+    entity = ENTITIES[entity_name]
+    columns = ["id", *entity.request.model_fields]
+    list_columns = [c for c in columns if isinstance(getattr(entity.model, c).type, JSON)]
+    with SessionLocal() as db:
+        rows = db.query(entity.model).order_by(entity.model.id).yield_per(chunk_size)
+        if fmt == "jsonl":
+            for obj in rows:
+                yield orjson.dumps(export_row(obj, columns)) + b"\n"
+            return
+        buffer = CSVBuffer()
+        writer = csv.DictWriter(buffer, fieldnames=columns)
+        writer.writeheader()
+        yield buffer.pop()
+        for obj in rows:
+            row = export_row(obj, columns)
+            # Списки в CSV — JSON-строкой в одной ячейке
+            for column in list_columns:
+                if row[column] is not None:
+                    row[column] = json.dumps(row[column], ensure_ascii=False)
+            writer.writerow(row)
+            yield buffer.pop()
+
+
+class CSVBuffer:
+    """Минимальный файловый объект для csv.writer: отдает накопленные строки байтами."""
+
+    def __init__(self):
+        self._parts: list[str] = []
+
+    def write(self, text: str) -> int:
+        self._parts.append(text)
+        return len(text)
+
+    def pop(self) -> bytes:
+        data = "".join(self._parts).encode()
+        self._parts.clear()
+        return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Массовый импорт/экспорт каталога")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("entity", choices=list(ENTITIES))
+    parser.add_argument("path", help="файл или '-' для stdin/stdout")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="по умолчанию по расширению файла")
+    parser.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE)
+    args = parser.parse_args()
+    fmt = args.format or ("csv" if args.path.endswith(".csv") else "jsonl")
+
+    if args.command == "export":
+        out = sys.stdout.buffer if args.path == "-" else open(args.path, "wb")
+        with out:
+            for chunk in export_records(args.entity, fmt, args.chunk_size):
+                out.write(chunk)
+        return
+
+    from catalog import bump_catalog_version
+    from database import Base, engine
+
+    Base.metadata.create_all(bind=engine)
+    source = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8-sig", newline="")
+    with source:
+        report = import_records(source, args.entity, fmt, args.chunk_size)
+    if report["inserted"] or report["updated"]:
+        # Воркеры API увидят новую версию каталога по файлу версии
+        bump_catalog_version()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    sys.exit(1 if report["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+from collections import OrderedDict
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+# Настройки кэша ответов ИИ
+AI_CACHE_BACKEND = os.getenv("AI_CACHE_BACKEND", "memory")  # memory | sqlite
+AI_CACHE_TTL = float(os.getenv("AI_CACHE_TTL", "3600"))
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "1024"))
+AI_CACHE_MAX_BYTES = int(os.getenv("AI_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+AI_CACHE_PATH = os.getenv("AI_CACHE_PATH", "./ai_cache.db")
+
+
+def normalize_prompt(prompt: str) -> str:
+    # Пробелы и переносы строк не влияют на смысл промпта
+    return " ".join(prompt.split())
+
+def make_key(prompt: str, model: str, version: int | None = None) -> str:
+    return hashlib.sha256(f"{model}\n{version}\n{normalize_prompt(prompt)}".encode()).hexdigest()
+
+
+class MemoryCache:
+    """In-process кэш с TTL и LRU-вытеснением по числу записей и объему."""
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[str, tuple[float, str, int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.time():
+                if item is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    async def get_async(self, key: str) -> str | None:
+        return self.get(key)
+
+    def set(self, key: str, value: str) -> None:
+        size = len(value.encode())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.time() + self.ttl, value, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._data)))
+
+    async def set_async(self, key: str, value: str) -> None:
+        self.set(key, value)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._data),
+            "bytes": self._bytes,
+        }
+
+    def _remove(self, key: str) -> None:
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+
+class SQLiteCache:
+    """
+    Кэш в отдельном SQLite-файле: общий для всех воркеров gunicorn.
+    Методы блокирующие, из event loop их вызывают через get_async/set_async (в потоке).
+    """
+
+    # Сколько отметок last_access копить в памяти до записи в файл
+    TOUCH_FLUSH_SIZE = 256
+
+    def __init__(self, path: str, ttl: float, max_entries: int, max_bytes: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._conn: sqlite3.Connection | None = None
+        self._pid: int | None = None
+        self._touched: dict[str, float] = {}
+        self._lock = threading.Lock()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ai_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_ai_cache_last_access ON ai_cache (last_access)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # Одно соединение на процесс (вызывается под self._lock); после fork воркер открывает свое
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get(self, key: str) -> str | None:
+        # Только чтение: просроченные строки удаляет set, last_access пишется пачкой (_flush_touched)
+        now = time.time()
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM ai_cache WHERE key = ? AND expires_at >= ?", (key, now)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[key] = now
+            if len(self._touched) >= self.TOUCH_FLUSH_SIZE:
+                self._flush_touched(self._connect())
+        return row[0]
+
+    async def get_async(self, key: str) -> str | None:
+        return await asyncio.to_thread(self.get, key)
+
+    def set(self, key: str, value: str) -> None:
+        size = len(value.encode())
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._flush_touched(conn)
+                conn.execute(
+                    "INSERT OR REPLACE INTO ai_cache (key, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                    (key, value, size, now + self.ttl, now),
+                )
+                conn.execute("DELETE FROM ai_cache WHERE expires_at < ?", (now,))
+                # LRU: удаляем самые давно использованные записи сверх лимитов
+                count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ai_cache").fetchone()
+                while count > self.max_entries or total > self.max_bytes:
+                    oldest = conn.execute("SELECT key, size FROM ai_cache ORDER BY last_access LIMIT 1").fetchone()
+                    conn.execute("DELETE FROM ai_cache WHERE key = ?", (oldest[0],))
+                    count -= 1
+                    total -= oldest[1]
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    async def set_async(self, key: str, value: str) -> None:
+        await asyncio.to_thread(self.set, key, value)
+
+    def _flush_touched(self, conn: sqlite3.Connection) -> None:
+        conn.executemany("UPDATE ai_cache SET last_access = ? WHERE key = ?", [(at, k) for k, at in self._touched.items()])
+        self._touched.clear()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._touched.clear()
+            self._connect().execute("DELETE FROM ai_cache")
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, total = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ai_cache").fetchone()
+        return {
+            "backend": "sqlite",
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "bytes": total,
+        }
+
+
+def create_cache():
+    if AI_CACHE_BACKEND == "sqlite":
+        return SQLiteCache(AI_CACHE_PATH, AI_CACHE_TTL, AI_CACHE_MAX_ENTRIES, AI_CACHE_MAX_BYTES)
+    return MemoryCache(AI_CACHE_TTL, AI_CACHE_MAX_ENTRIES, AI_CACHE_MAX_BYTES)
+
+ai_cache = create_cache()
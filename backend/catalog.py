@@ -0,0 +1,89 @@
+from typing import NamedTuple
+import os
+import threading
+import time
+
+from sqlalchemy.orm import Session, selectinload
+
+from models import University
+from ranking import RankingIndex, RankedUniversity
+
+# Версия каталога хранится в файле рядом с БД, чтобы все воркеры gunicorn
+# видели изменения без запроса к базе (достаточно os.stat)
+CATALOG_VERSION_PATH = os.getenv("CATALOG_VERSION_PATH", "./catalog.version")
+
+_version_lock = threading.Lock()
+_version_cache: tuple[tuple[int, int], int] | None = None  # ((inode, mtime_ns) файла, версия)
+
+
+def get_catalog_version() -> int:
+    global _version_cache
+    try:
+        stat = os.stat(CATALOG_VERSION_PATH)
+    except FileNotFoundError:
+        return 0
+    # os.replace создает новый inode, поэтому смена файла видна даже при грубом mtime
+    file_id = (stat.st_ino, stat.st_mtime_ns)
+    if _version_cache is not None and _version_cache[0] == file_id:
+        return _version_cache[1]
+    try:
+        with open(CATALOG_VERSION_PATH) as f:
+            version = int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+    _version_cache = (file_id, version)
+    return version
+
+def bump_catalog_version() -> int:
+    # Версия монотонна и основана на времени: без read-modify-write гонок между воркерами
+    with _version_lock:
+        version = max(time.time_ns(), get_catalog_version() + 1)
+        tmp_path = f"{CATALOG_VERSION_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(str(version))
+        os.replace(tmp_path, CATALOG_VERSION_PATH)
+        return version
+
+
+class AdvisorUniversity(NamedTuple):
+    name: str
+    city: str
+
+
+class AdvisorContext(NamedTuple):
+    version: int
+    universities: list[AdvisorUniversity]  # для проверки ответа модели и fallback
+    index: RankingIndex  # признаки для локального ранжирования
+
+
+_advisor_context: AdvisorContext | None = None
+
+
+def build_advisor_context(db: Session, version: int) -> AdvisorContext:
+    universities = db.query(University).options(selectinload(University.programs)).all()
+    return AdvisorContext(
+        version=version,
+        universities=[AdvisorUniversity(uni.name, uni.city or "") for uni in universities],
+        index=RankingIndex(universities),
+    )
+
+def format_shortlist(context: AdvisorContext, shortlist: list[RankedUniversity]) -> str:
+    # Формируем список университетов для промпта
+    lines = []
+    for item in shortlist:
+        uni = context.universities[item.position]
+        specializations = ", ".join(item.programs) if item.programs else "различные направления"
+        lines.append(f"- {uni.name} ({uni.city}) - {specializations}")
+    return "\n".join(lines) if lines else "- KIMEP University (Алматы) - бизнес, экономика"
+
+def get_advisor_context(db: Session) -> AdvisorContext:
+    """Контекст советника; пересобирается только при смене версии каталога."""
+    global _advisor_context
+    version = get_catalog_version()
+    if _advisor_context is None or _advisor_context.version != version:
+        _advisor_context = build_advisor_context(db, version)
+    return _advisor_context
+
+def rebuild_advisor_context(db: Session, version: int) -> None:
+    global _advisor_context
+    _advisor_context = build_advisor_context(db, version)
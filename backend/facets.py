@@ -0,0 +1,188 @@
+from typing import NamedTuple
+import asyncio
+import os
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from catalog import get_catalog_version
+from models import University, Program, fold
+from requests import UniversityFilterParams, normalize_languages
+
+# Число корзин гистограмм цены и проходного балла (границы — по всему каталогу, чтобы не прыгали при фильтрах)
+FACET_HISTOGRAM_BINS = int(os.getenv("FACET_HISTOGRAM_BINS", "10"))
+
+
+class FacetIndex(NamedTuple):
+    """
+    Колонки каталога в массивах NumPy: фильтр — булева маска, счетчик — сумма по маске.
+    Строится один раз на версию каталога, строки университетов в ответ не попадают.
+    """
+    version: int
+    size: int
+    names: list[str]  # name_folded для фильтра search
+    city_values: list[str]
+    cities: np.ndarray  # университет x город
+    language_values: list[str]
+    languages: np.ndarray  # университет x язык
+    language_text: list[str]  # languages_folded для фильтра language
+    degree_values: list[str]
+    degrees: np.ndarray  # университет x степень программ
+    has_dormitory: np.ndarray
+    has_military_dept: np.ndarray
+    ielts_required: np.ndarray
+    price: np.ndarray  # NaN — не указана
+    min_ent_score: np.ndarray
+
+
+_facet_index: FacetIndex | None = None
+_facet_lock = asyncio.Lock()
+
+
+def build_facet_index(version: int, rows: list, program_degrees: list[tuple[int, str]]) -> FacetIndex:
+    positions = {row.id: i for i, row in enumerate(rows)}
+    n = len(rows)
+
+    # Город сравнивается как есть, как в apply_university_filters (University.city == city)
+    cities = [row.city or "" for row in rows]
+    city_values = sorted({city for city in cities if city})
+    city_codes = {city: j for j, city in enumerate(city_values)}
+    city_matrix = np.zeros((n, len(city_values)), dtype=bool)
+    for i, city in enumerate(cities):
+        if city in city_codes:
+            city_matrix[i, city_codes[city]] = True
+
+    row_languages = [set(normalize_languages([lang.strip() for lang in row.languages or [] if lang and lang.strip()])) for row in rows]
+    language_values = sorted(set().union(*row_languages))
+    language_codes = {value: j for j, value in enumerate(language_values)}
+    languages = np.zeros((n, len(language_values)), dtype=bool)
+    for i, values in enumerate(row_languages):
+        for value in values:
+            languages[i, language_codes[value]] = True
+
+    degree_values = sorted({degree for _, degree in program_degrees if degree})
+    degree_codes = {degree: j for j, degree in enumerate(degree_values)}
+    degrees = np.zeros((n, len(degree_values)), dtype=bool)
+    for university_id, degree in program_degrees:
+        if degree and university_id in positions:
+            degrees[positions[university_id], degree_codes[degree]] = True
+
+    return FacetIndex(
+        version=version,
+        size=n,
+        names=[row.name_folded or "" for row in rows],
+        city_values=city_values,
+        cities=city_matrix,
+        language_values=language_values,
+        languages=languages,
+        language_text=[row.languages_folded or "" for row in rows],
+        degree_values=degree_values,
+        degrees=degrees,
+        has_dormitory=np.array([bool(row.has_dormitory) for row in rows], dtype=bool),
+        has_military_dept=np.array([bool(row.has_military_dept) for row in rows], dtype=bool),
+        ielts_required=np.array([bool(row.IELTS_sertificate) or row.min_ielts is not None for row in rows], dtype=bool),
+        price=np.array([row.price if row.price is not None else np.nan for row in rows], dtype=np.float64),
+        min_ent_score=np.array([row.min_ent_score if row.min_ent_score is not None else np.nan for row in rows], dtype=np.float64),
+    )
+
+async def get_facet_index(db: AsyncSession) -> FacetIndex:
+    """Индекс фасетов; пересобирается только при смене версии каталога (после любой записи)."""
+    global _facet_index
+    version = get_catalog_version()
+    if _facet_index is not None and _facet_index.version == version:
+        return _facet_index
+    async with _facet_lock:
+        if _facet_index is None or _facet_index.version != version:
+            # Только нужные колонки, без текстов и связанных объектов
+            rows = (await db.execute(select(
+                University.id, University.name_folded, University.city, University.languages, University.languages_folded,
+                University.has_dormitory,
+                University.has_military_dept, University.IELTS_sertificate, University.min_ielts,
+                University.price, University.min_ent_score,
+            ).order_by(University.id))).all()
+            program_degrees = (await db.execute(select(Program.university_id, Program.degree).distinct())).all()
+            _facet_index = build_facet_index(version, rows, program_degrees)
+    return _facet_index
+
+def filter_masks(index: FacetIndex, filters: UniversityFilterParams) -> dict[str, np.ndarray]:
+    """Маска на каждый примененный фильтр — те же условия, что apply_university_filters."""
+    masks = {}
+    if filters.city:
+        if filters.city in index.city_values:
+            masks["city"] = index.cities[:, index.city_values.index(filters.city)]
+        else:
+            masks["city"] = np.zeros(index.size, dtype=bool)
+    if filters.has_dormitory is not None:
+        masks["has_dormitory"] = index.has_dormitory == filters.has_dormitory
+    if filters.price_min is not None or filters.price_max is not None:
+        low = filters.price_min if filters.price_min is not None else -np.inf
+        high = filters.price_max if filters.price_max is not None else np.inf
+        masks["price"] = (index.price >= low) & (index.price <= high)
+    if filters.language:
+        needle = fold(filters.language)
+        masks["language"] = np.array([needle in text for text in index.language_text], dtype=bool)
+    if filters.min_ent_score is not None:
+        masks["min_ent_score"] = index.min_ent_score <= filters.min_ent_score
+    if filters.degree:
+        if filters.degree in index.degree_values:
+            masks["degree"] = index.degrees[:, index.degree_values.index(filters.degree)]
+        else:
+            masks["degree"] = np.zeros(index.size, dtype=bool)
+    if filters.search:
+        needle = fold(filters.search)
+        masks["search"] = np.array([needle in name for name in index.names], dtype=bool)
+    return masks
+
+def combine(index: FacetIndex, masks: dict[str, np.ndarray], exclude: str | None = None) -> np.ndarray:
+    mask = np.ones(index.size, dtype=bool)
+    for name, other in masks.items():
+        if name != exclude:
+            mask &= other
+    return mask
+
+def value_counts(values: list[str], matrix: np.ndarray, mask: np.ndarray) -> list[dict]:
+    counts = matrix[mask].sum(axis=0) if len(values) else []
+    items = [{"value": value, "count": int(count)} for value, count in zip(values, counts)]
+    return sorted(items, key=lambda item: (-item["count"], item["value"]))
+
+def flag_counts(values: np.ndarray, mask: np.ndarray) -> dict:
+    selected = values[mask]
+    return {"true": int(selected.sum()), "false": int(len(selected) - selected.sum())}
+
+def histogram(values: np.ndarray, mask: np.ndarray) -> dict:
+    known = values[~np.isnan(values)]
+    if not len(known):
+        return {"min": None, "max": None, "buckets": []}
+    # Границы по всему каталогу, счетчики — по отфильтрованным университетам
+    edges = np.histogram_bin_edges(known, bins=FACET_HISTOGRAM_BINS)
+    selected = values[mask & ~np.isnan(values)]
+    counts, _ = np.histogram(selected, bins=edges)
+    return {
+        "min": float(selected.min()) if len(selected) else None,
+        "max": float(selected.max()) if len(selected) else None,
+        "buckets": [
+            {"from": float(edges[i]), "to": float(edges[i + 1]), "count": int(count)}
+            for i, count in enumerate(counts)
+        ],
+    }
+
+def compute_facets(index: FacetIndex, filters: UniversityFilterParams) -> dict:
+    """
+    Счетчики фасетов для текущих фильтров. Счетчики фасета считаются без его собственного фильтра
+    (выбор города показывает, сколько университетов в других городах), total — со всеми фильтрами.
+    """
+    masks = filter_masks(index, filters)
+    return {
+        "total": int(combine(index, masks).sum()),
+        "cities": value_counts(index.city_values, index.cities, combine(index, masks, "city")),
+        "languages": value_counts(index.language_values, index.languages, combine(index, masks, "language")),
+        "degrees": value_counts(index.degree_values, index.degrees, combine(index, masks, "degree")),
+        "flags": {
+            "has_dormitory": flag_counts(index.has_dormitory, combine(index, masks, "has_dormitory")),
+            "has_military_dept": flag_counts(index.has_military_dept, combine(index, masks)),
+            "ielts_required": flag_counts(index.ielts_required, combine(index, masks)),
+        },
+        "price": histogram(index.price, combine(index, masks, "price")),
+        "min_ent_score": histogram(index.min_ent_score, combine(index, masks, "min_ent_score")),
+    }
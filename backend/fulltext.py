@@ -0,0 +1,174 @@
+import re
+
+from sqlalchemy import and_, case, func, literal, or_, select, text, union_all
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import University, Program
+
+# Полнотекстовый индекс SQLite FTS5 по университетам и программам.
+# rowid кодирует источник: университет -> id * 2, программа -> id * 2 + 1,
+# поэтому триггеры обновляют индекс точечно по rowid, без полного пересчета.
+# На других СУБД (DATABASE_URL) индекса нет: поиск идет по подстрокам (like_search).
+
+SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        kind UNINDEXED,
+        university_id UNINDEXED,
+        name,
+        body,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_universities_ai AFTER INSERT ON universities BEGIN
+        INSERT INTO search_index (rowid, kind, university_id, name, body)
+        VALUES (new.id * 2, 'university', new.id, new.name,
+                coalesce(new.description, '') || ' ' || coalesce(new.mission_text, '') || ' ' || coalesce(new.history, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_universities_au AFTER UPDATE ON universities BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2;
+        INSERT INTO search_index (rowid, kind, university_id, name, body)
+        VALUES (new.id * 2, 'university', new.id, new.name,
+                coalesce(new.description, '') || ' ' || coalesce(new.mission_text, '') || ' ' || coalesce(new.history, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_universities_ad AFTER DELETE ON universities BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_programs_ai AFTER INSERT ON programs BEGIN
+        INSERT INTO search_index (rowid, kind, university_id, name, body)
+        VALUES (new.id * 2 + 1, 'program', new.university_id, new.name, coalesce(new.description, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_programs_au AFTER UPDATE ON programs BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2 + 1;
+        INSERT INTO search_index (rowid, kind, university_id, name, body)
+        VALUES (new.id * 2 + 1, 'program', new.university_id, new.name, coalesce(new.description, ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_programs_ad AFTER DELETE ON programs BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+]
+
+SEARCH_BACKFILL = [
+    """
+    INSERT INTO search_index (rowid, kind, university_id, name, body)
+    SELECT id * 2, 'university', id, name,
+           coalesce(description, '') || ' ' || coalesce(mission_text, '') || ' ' || coalesce(history, '')
+    FROM universities
+    """,
+    """
+    INSERT INTO search_index (rowid, kind, university_id, name, body)
+    SELECT id * 2 + 1, 'program', university_id, name, coalesce(description, '')
+    FROM programs
+    """,
+]
+
+# Вес совпадений в названии выше, чем в описании (порядок как в колонках таблицы)
+BM25_WEIGHTS = "0.0, 0.0, 10.0, 1.0"
+
+TERM_RE = re.compile(r"\w+", re.UNICODE)
+# Длина фрагмента описания в результатах поиска без FTS5
+LIKE_SNIPPET_LENGTH = 160
+
+
+def ensure_search_index(engine: Engine) -> None:
+    """Создает FTS5-таблицу и триггеры; при первом создании заполняет индекс существующими данными."""
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'")
+        ).first()
+        for statement in SEARCH_DDL:
+            conn.execute(text(statement))
+        if not exists:
+            for statement in SEARCH_BACKFILL:
+                conn.execute(text(statement))
+
+def build_match_query(query: str) -> str | None:
+    # Каждое слово — префиксный поиск в кавычках, чтобы пользовательский ввод не ломал синтаксис FTS5
+    terms = TERM_RE.findall(query)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+async def search(db: AsyncSession, query: str, kind: str | None, limit: int, offset: int) -> tuple[int, list[dict]]:
+    if db.bind.dialect.name != "sqlite":
+        return await like_search(db, query, kind, limit, offset)
+    match = build_match_query(query)
+    if match is None:
+        return 0, []
+    kind_filter = "AND kind = :kind" if kind else ""
+    params = {"match": match, "kind": kind, "limit": limit, "offset": offset}
+    total = (await db.execute(
+        text(f"SELECT count(*) FROM search_index WHERE search_index MATCH :match {kind_filter}"),
+        params,
+    )).scalar()
+    rows = (await db.execute(
+        text(
+            f"""
+            SELECT rowid, kind, university_id, name,
+                   snippet(search_index, 3, '<b>', '</b>', '…', 16) AS snippet,
+                   bm25(search_index, {BM25_WEIGHTS}) AS rank
+            FROM search_index
+            WHERE search_index MATCH :match {kind_filter}
+            ORDER BY rank
+            LIMIT :limit OFFSET :offset
+            """
+        ),
+        params,
+    )).mappings().all()
+    return total, [
+        {
+            "kind": row["kind"],
+            "id": row["rowid"] // 2,
+            "university_id": row["university_id"],
+            "name": row["name"],
+            "snippet": row["snippet"],
+            "score": -row["rank"],
+        }
+        for row in rows
+    ]
+
+def like_source(kind: str, model, university_id, columns: list, terms: list[str]):
+    # Каждое слово должно встретиться в одной из колонок; все слова в названии — выше в выдаче
+    in_name = and_(*(model.name.icontains(term, autoescape=True) for term in terms))
+    return select(
+        literal(kind).label("kind"),
+        model.id.label("id"),
+        university_id.label("university_id"),
+        model.name.label("name"),
+        func.substr(model.description, 1, LIKE_SNIPPET_LENGTH).label("snippet"),
+        case((in_name, 1.0), else_=0.0).label("score"),
+    ).where(*(or_(*(column.icontains(term, autoescape=True) for column in columns)) for term in terms))
+
+async def like_search(db: AsyncSession, query: str, kind: str | None, limit: int, offset: int) -> tuple[int, list[dict]]:
+    """Поиск без FTS5: те же поля и ответ, релевантность грубее (совпадение в названии или нет)."""
+    terms = TERM_RE.findall(query)
+    if not terms:
+        return 0, []
+    sources = []
+    if kind in (None, "university"):
+        columns = [University.name, University.description, University.mission_text, University.history]
+        sources.append(like_source("university", University, University.id, columns, terms))
+    if kind in (None, "program"):
+        sources.append(like_source("program", Program, Program.university_id, [Program.name, Program.description], terms))
+    results = union_all(*sources).subquery() if len(sources) > 1 else sources[0].subquery()
+    total = await db.scalar(select(func.count()).select_from(results))
+    rows = (await db.execute(
+        select(results).order_by(results.c.score.desc(), results.c.kind, results.c.id).limit(limit).offset(offset)
+    )).mappings().all()
+    return total, [{**row, "score": float(row["score"])} for row in rows]
@@ -1,18 +1,169 @@
 
-from openai import OpenAI
+from openai import AsyncOpenAI, APIStatusError
+from typing import AsyncIterator
+import asyncio
+import random
+import time
+import httpx
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
-
-client = OpenAI(
-    api_key=os.getenv("API_KEY"),
-    base_url="https://api.groq.com/openai/v1",
+from cache import ai_cache, make_key
+from metrics import record_llm
+from jobs import (
+    LLMJobQueue, RateLimiter, SQLiteRateLimiter, SQLiteJobStore, Job, GROQ_REQUESTS_PER_MINUTE, GROQ_BURST,
+    LLM_JOBS_BACKEND, LLM_JOBS_PATH, LLM_JOB_TTL, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND,
 )
 
-def requestAI(data):
-    response = client.responses.create(
-        input=data,
-        model="openai/gpt-oss-20b",
-    )
-    return response.output_text
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1")
+GROQ_MODEL = os.getenv("GROQ_MODEL", "openai/gpt-oss-20b")
+
+# Настройки асинхронного клиента
+GROQ_CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "5"))
+GROQ_READ_TIMEOUT = float(os.getenv("GROQ_READ_TIMEOUT", "60"))
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "8"))
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "3"))
+GROQ_BACKOFF_BASE = float(os.getenv("GROQ_BACKOFF_BASE", "0.5"))
+GROQ_BACKOFF_MAX = float(os.getenv("GROQ_BACKOFF_MAX", "8"))
+
+def _usage(response) -> tuple[int | None, int | None]:
+    usage = getattr(response, "usage", None)
+    return (usage.input_tokens, usage.output_tokens) if usage else (None, None)
+
+# Один пул HTTP-соединений на процесс, создается при первом вызове, а не при импорте (после fork в gunicorn)
+_async_client: AsyncOpenAI | None = None
+_semaphore = asyncio.Semaphore(GROQ_MAX_CONCURRENCY)
+
+def get_async_client() -> AsyncOpenAI:
+    global _async_client
+    if _async_client is None:
+        timeout = httpx.Timeout(GROQ_READ_TIMEOUT, connect=GROQ_CONNECT_TIMEOUT)
+        _async_client = AsyncOpenAI(
+            api_key=os.getenv("API_KEY"),
+            base_url=GROQ_BASE_URL,
+            timeout=timeout,
+            max_retries=0,  # ретраи с джиттером делаем сами
+            http_client=httpx.AsyncClient(
+                timeout=timeout,
+                limits=httpx.Limits(max_connections=GROQ_MAX_CONCURRENCY, max_keepalive_connections=GROQ_MAX_CONCURRENCY),
+            ),
+        )
+    return _async_client
+
+def _is_retryable(error: APIStatusError) -> bool:
+    return error.status_code == 429 or error.status_code >= 500
+
+def _backoff_delay(attempt: int) -> float:
+    # Full jitter: случайная задержка от 0 до экспоненциального предела
+    return random.uniform(0, min(GROQ_BACKOFF_MAX, GROQ_BACKOFF_BASE * 2 ** attempt))
+
+async def requestAIAsync(data):
+    """Неблокирующий вызов модели: не более GROQ_MAX_CONCURRENCY запросов на процесс, ретраи на 429/5xx."""
+    async with _semaphore:
+        attempt = 0
+        while True:
+            # Каждая попытка — отдельное наблюдение; ожидание семафора не входит во время
+            started = time.perf_counter()
+            try:
+                response = await get_async_client().responses.create(
+                    input=data,
+                    model=GROQ_MODEL,
+                )
+            except APIStatusError as e:
+                record_llm(GROQ_MODEL, "async", time.perf_counter() - started, "error")
+                if attempt >= GROQ_MAX_RETRIES or not _is_retryable(e):
+                    raise
+                await asyncio.sleep(_backoff_delay(attempt))
+                attempt += 1
+                continue
+            except BaseException as e:
+                record_llm(GROQ_MODEL, "async", time.perf_counter() - started, "cancelled" if isinstance(e, asyncio.CancelledError) else "error")
+                raise
+            record_llm(GROQ_MODEL, "async", time.perf_counter() - started, "ok", *_usage(response))
+            return response.output_text
+
+# Квота Groq общая для очереди и потоковых вызовов, а с sqlite — и для всех воркеров gunicorn
+if LLM_JOBS_BACKEND == "sqlite":
+    rate_limiter = SQLiteRateLimiter(LLM_JOBS_PATH, GROQ_REQUESTS_PER_MINUTE, GROQ_BURST)
+    job_store = SQLiteJobStore(LLM_JOBS_PATH, LLM_JOB_TTL)
+else:
+    rate_limiter = RateLimiter(GROQ_REQUESTS_PER_MINUTE, GROQ_BURST)
+    job_store = None
+# Все непотоковые вызовы идут через очередь: объединение одинаковых промптов, приоритеты, backpressure.
+# Готовый ответ пишется в кэш даже если все ожидающие уже ушли по таймауту
+llm_queue = LLMJobQueue(requestAIAsync, rate_limiter, workers=GROQ_MAX_CONCURRENCY, on_result=ai_cache.set_async, store=job_store)
+
+async def streamAIAsync(data) -> AsyncIterator[str]:
+    """
+    Потоковый вызов модели: фрагменты текста по мере генерации.
+    Ретраи — только до первого события; при закрытии генератора (отмена клиентом) запрос к модели обрывается.
+    """
+    async with _semaphore:
+        await rate_limiter.acquire()
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                stream = await get_async_client().responses.create(
+                    input=data,
+                    model=GROQ_MODEL,
+                    stream=True,
+                )
+                break
+            except APIStatusError as e:
+                record_llm(GROQ_MODEL, "stream", time.perf_counter() - started, "error")
+                if attempt >= GROQ_MAX_RETRIES or not _is_retryable(e):
+                    raise
+                await asyncio.sleep(_backoff_delay(attempt))
+                attempt += 1
+        status, usage = "cancelled", (None, None)
+        try:
+            async for event in stream:
+                if event.type == "response.output_text.delta":
+                    yield event.delta
+                elif event.type == "response.completed":
+                    usage = _usage(event.response)
+                elif event.type in ("response.failed", "error"):
+                    status = "error"
+                    raise RuntimeError(f"model stream failed: {event.type}")
+            status = "ok"
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            record_llm(GROQ_MODEL, "stream", time.perf_counter() - started, status, *usage)
+            # Закрываем соединение даже при отмене: недочитанный ответ не возвращается в пул
+            await asyncio.shield(stream.close())
+
+async def requestAICached(data, version: int | None = None, priority: int = PRIORITY_INTERACTIVE):
+    """
+    Вызов модели через очередь с кэшем по нормализованному промпту и модели (кэшируются только успешные ответы).
+    version — версия данных, от которых зависит промпт (например, версия каталога).
+    Одинаковые промпты, пока первый в работе, ждут его результата. При заполненной очереди — jobs.QueueFull.
+    """
+    key = make_key(data, GROQ_MODEL, version)
+    cached = await ai_cache.get_async(key)
+    if cached is not None:
+        return cached
+    return await llm_queue.run(data, key, priority)
+
+async def submitAIJob(data, version: int | None = None) -> Job:
+    """Фоновое задание для опроса по id; попадание в кэш — сразу завершенное задание."""
+    key = make_key(data, GROQ_MODEL, version)
+    cached = await ai_cache.get_async(key)
+    if cached is not None:
+        return await llm_queue.add_done(data, key, cached)
+    return await llm_queue.submit_tracked(data, key, PRIORITY_BACKGROUND)
+
+async def streamAICached(data, version: int | None = None) -> AsyncIterator[str]:
+    """streamAIAsync с тем же кэшем, что у requestAICached: попадание отдается одним фрагментом."""
+    key = make_key(data, GROQ_MODEL, version)
+    cached = await ai_cache.get_async(key)
+    if cached is not None:
+        yield cached
+        return
+    parts = []
+    async for delta in streamAIAsync(data):
+        parts.append(delta)
+        yield delta
+    # Сюда доходим только при полностью полученном ответе
+    await ai_cache.set_async(key, "".join(parts))
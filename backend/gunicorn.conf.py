@@ -0,0 +1,20 @@
+"""
+Настройки gunicorn: gunicorn main:app -c gunicorn.conf.py
+
+Приложение импортируется и прогревается в мастере до fork (preload_app + when_ready),
+воркеры получают готовые кэши каталога через copy-on-write. Миграции выполняются до запуска:
+python migrations.py.
+"""
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+
+def when_ready(server):
+    # Мастер: после импорта приложения (preload_app) и до запуска воркеров
+    if preload_app:
+        from startup import preload
+        preload()
@@ -0,0 +1,219 @@
+"""
+Детерминированные расчеты для /api/ai/compare и /api/ai/analyze-chance.
+Модели передается только компактная сводка этих расчетов, а при таймауте ответ строится из них же.
+"""
+from decimal import Decimal
+from typing import NamedTuple
+
+from models import University, Program
+from ranking import tokenize
+
+# Пороги запаса баллов ЕНТ над проходным для оценки шансов
+CHANCE_HIGH_MARGIN = 20
+CHANCE_MEDIUM_MARGIN = 5
+# При меньшем числе грантов высокая оценка понижается: конкуренция за грант выше
+SCARCE_GRANTS = 50
+
+CHANCE_LEVELS = ["Low", "Medium", "High"]
+
+
+class CompareMetric(NamedTuple):
+    key: str
+    label: str
+    higher_is_better: bool
+
+
+COMPARE_METRICS = [
+    CompareMetric("price", "Стоимость обучения, ₸/год", False),
+    CompareMetric("rating", "Рейтинг", True),
+    CompareMetric("min_ent_score", "Проходной балл ЕНТ", False),
+    CompareMetric("number_of_grants", "Гранты в год", True),
+    CompareMetric("programs", "Число программ", True),
+    CompareMetric("avg_employment", "Трудоустройство выпускников, %", True),
+    CompareMetric("has_dormitory", "Общежитие", True),
+]
+
+# Ключевые слова цели абитуриента, усиливающие вес показателя при выборе лучшего варианта
+GOAL_KEYWORDS = {
+    "цен": "price", "дешев": "price", "стоим": "price", "бюджет": "price",
+    "рейтинг": "rating", "престиж": "rating",
+    "грант": "number_of_grants",
+    "работ": "avg_employment", "карьер": "avg_employment", "трудоустр": "avg_employment",
+    "общаг": "has_dormitory", "общеж": "has_dormitory",
+    "програм": "programs", "направлен": "programs",
+}
+GOAL_WEIGHT = 3.0
+
+
+def as_number(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+def known_score(value: int | None) -> int | None:
+    # 0 в каталоге означает, что проходной балл не указан
+    return value or None
+
+def format_value(value, signed: bool = False) -> str:
+    if isinstance(value, float) and not value.is_integer():
+        return (f"{value:+.2f}" if signed else f"{value:.2f}").rstrip("0")
+    text = f"{int(value):+,}" if signed else f"{int(value):,}"
+    return text.replace(",", " ")
+
+def compare_universities(rows: list[tuple[University, int, float | None]], goal: str) -> dict:
+    """
+    Сравнение бок о бок. rows — (университет, число программ, среднее трудоустройство) из одного запроса.
+    Для каждого показателя: значения, лучший университет и разница с лучшим; winner — по взвешенной сумме
+    нормированных показателей с учетом цели. Значения и баллы — по id (названия могут совпадать),
+    названия — в universities.
+    """
+    names = {uni.id: uni.name for uni, _, _ in rows}
+    values = {
+        uni.id: {
+            "price": uni.price,
+            "rating": as_number(uni.rating),
+            "min_ent_score": known_score(uni.min_ent_score),
+            "number_of_grants": uni.number_of_grants,
+            "programs": programs,
+            "avg_employment": round(avg_employment, 1) if avg_employment is not None else None,
+            "has_dormitory": as_number(uni.has_dormitory),
+        }
+        for uni, programs, avg_employment in rows
+    }
+    goal_text = (goal or "").lower()
+    boosted = {metric for keyword, metric in GOAL_KEYWORDS.items() if keyword in goal_text}
+
+    metrics = []
+    scores = dict.fromkeys(values, 0.0)
+    for metric in COMPARE_METRICS:
+        known = {id: row[metric.key] for id, row in values.items() if row[metric.key] is not None}
+        if not known:
+            continue
+        best_value = max(known.values()) if metric.higher_is_better else min(known.values())
+        worst_value = min(known.values()) if metric.higher_is_better else max(known.values())
+        spread = abs(best_value - worst_value)
+        weight = GOAL_WEIGHT if metric.key in boosted else 1.0
+        for id, value in known.items():
+            # 1 — лучший, 0 — худший; при равенстве все получают 1
+            scores[id] += weight * (1 - abs(best_value - value) / spread if spread else 1)
+        metrics.append({
+            "metric": metric.key,
+            "label": metric.label,
+            "values": {id: row[metric.key] for id, row in values.items()},
+            "best": [id for id, value in known.items() if value == best_value],
+            "diff": {id: round(value - best_value, 2) for id, value in known.items()},
+        })
+
+    winner_id = max(scores, key=scores.get) if scores else None
+    return {
+        "winner": names.get(winner_id, ""),
+        "winner_id": winner_id,
+        "universities": [{"id": id, "name": name} for id, name in names.items()],
+        "boosted": sorted(boosted),
+        "scores": {id: round(score, 2) for id, score in scores.items()},
+        "metrics": metrics,
+    }
+
+def format_comparison(comparison: dict) -> str:
+    # Компактная сводка для промпта и для ответа без модели; одинаковые названия различаются по id
+    names = {item["id"]: item["name"] for item in comparison["universities"]}
+    repeated = {name for name in names.values() if list(names.values()).count(name) > 1}
+    labels = {id: f"{name} (id {id})" if name in repeated else name for id, name in names.items()}
+    lines = []
+    for metric in comparison["metrics"]:
+        parts = []
+        for id, value in metric["values"].items():
+            if value is None:
+                parts.append(f"{labels[id]}: нет данных")
+            elif id in metric["best"]:
+                parts.append(f"{labels[id]}: {format_value(value)} (лучший)")
+            else:
+                parts.append(f"{labels[id]}: {format_value(value)} ({format_value(metric['diff'][id], signed=True)})")
+        lines.append(f"- {metric['label']}: " + "; ".join(parts))
+    return "\n".join(lines)
+
+
+class ChanceFeatures(NamedTuple):
+    university: str
+    score: int
+    university_min_score: int | None
+    program: str | None  # программа, наиболее подходящая под профильный предмет
+    program_min_score: int | None
+    margin: int | None  # запас над проходным баллом программы (или университета)
+    number_of_grants: int | None
+    ielts_required: bool
+    min_ielts: float | None
+    ielts: float | None
+    chance: str
+
+
+def match_program(programs: list[Program], subject: str) -> Program | None:
+    subject_tokens = tokenize(subject)
+    best, best_overlap = None, 0
+    for program in programs:
+        overlap = len(subject_tokens & (tokenize(program.name) | tokenize(program.description)))
+        # При равном совпадении — программа с меньшим проходным баллом
+        if overlap > best_overlap or (
+            overlap == best_overlap and overlap and (program.min_ent_score or 0) < (best.min_ent_score or 0)
+        ):
+            best, best_overlap = program, overlap
+    return best
+
+def analyze_chance(university: University, score: int, subject: str, ielts: float | None = None) -> ChanceFeatures:
+    program = match_program(university.programs, subject)
+    program_min_score = known_score(program.min_ent_score) if program else None
+    university_min_score = known_score(university.min_ent_score)
+    threshold = program_min_score or university_min_score
+    margin = score - threshold if threshold is not None else None
+
+    if margin is None:
+        level = 1
+    elif margin >= CHANCE_HIGH_MARGIN:
+        level = 2
+    elif margin >= CHANCE_MEDIUM_MARGIN:
+        level = 1
+    else:
+        level = 0
+    if level == 2 and university.number_of_grants is not None and university.number_of_grants < SCARCE_GRANTS:
+        level = 1
+
+    min_ielts = as_number(university.min_ielts)
+    ielts_required = bool(university.IELTS_sertificate) or min_ielts is not None
+    if ielts_required and ielts is not None and min_ielts is not None and ielts < min_ielts:
+        level = 0
+
+    return ChanceFeatures(
+        university=university.name,
+        score=score,
+        university_min_score=university_min_score,
+        program=program.name if program else None,
+        program_min_score=program_min_score,
+        margin=margin,
+        number_of_grants=university.number_of_grants,
+        ielts_required=ielts_required,
+        min_ielts=min_ielts,
+        ielts=ielts,
+        chance=CHANCE_LEVELS[level],
+    )
+
+def format_chance(features: ChanceFeatures) -> str:
+    # Компактная сводка для промпта и для ответа без модели
+    lines = [f"Балл ЕНТ абитуриента: {features.score}."]
+    if features.university_min_score is not None:
+        lines.append(f"Проходной балл {features.university}: {features.university_min_score}.")
+    if features.program:
+        min_score = f", проходной балл {features.program_min_score}" if features.program_min_score is not None else ""
+        lines.append(f"Подходящая программа: {features.program}{min_score}.")
+    if features.margin is not None:
+        relation = "выше" if features.margin >= 0 else "ниже"
+        lines.append(f"Балл {relation} проходного на {abs(features.margin)}.")
+    if features.number_of_grants is not None:
+        lines.append(f"Грантов в год: {features.number_of_grants}.")
+    if features.ielts_required:
+        required = f" (минимум {features.min_ielts:g})" if features.min_ielts is not None else ""
+        given = f", у абитуриента {features.ielts:g}" if features.ielts is not None else ""
+        lines.append(f"Требуется IELTS{required}{given}.")
+    lines.append(f"Оценка шансов: {features.chance}.")
+    return " ".join(lines)
@@ -0,0 +1,356 @@
+"""
+Очередь вызовов модели внутри процесса: одинаковые промпты в работе объединяются (single-flight),
+очередь ограничена по размеру, задания выбираются по приоритету, а запуск — с ограничением частоты
+под квоту Groq. Бэкенд (функция промпт -> текст) передается снаружи, поэтому очередь можно
+проверять с поддельной моделью (tests/test_jobs.py):
+
+    queue = LLMJobQueue(fake_backend, RateLimiter(0), workers=2)
+    result = await queue.submit("prompt", key="k").wait()
+
+Задание выполняется в том воркере gunicorn, который его принял. Чтобы GET /api/ai/jobs/{id} работал
+на любом воркере, состояние заданий и квота Groq хранятся в общем SQLite-файле (LLM_JOBS_BACKEND=sqlite,
+по умолчанию); с memory и то и другое свое у каждого процесса — только для одного воркера.
+"""
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+import asyncio
+import contextvars
+import itertools
+import logging
+import os
+import sqlite3
+import time
+import uuid
+
+from metrics import RequestStats, current_request
+
+LLM_QUEUE_MAX_SIZE = int(os.getenv("LLM_QUEUE_MAX_SIZE", "100"))
+# Квота Groq: запросов в минуту и допустимый всплеск; 0 — без ограничения
+GROQ_REQUESTS_PER_MINUTE = float(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30"))
+GROQ_BURST = int(os.getenv("GROQ_BURST", "5"))
+# Сколько хранить завершенные задания для опроса GET /api/ai/jobs/{id} (секунды)
+LLM_JOB_TTL = float(os.getenv("LLM_JOB_TTL", "600"))
+# Где хранятся задания и квота: sqlite — общий файл для всех воркеров, memory — память процесса
+LLM_JOBS_BACKEND = os.getenv("LLM_JOBS_BACKEND", "sqlite")  # memory | sqlite
+LLM_JOBS_PATH = os.getenv("LLM_JOBS_PATH", "./llm_jobs.db")
+
+# Меньше — раньше: запросы, которые ждет пользователь, идут перед фоновыми заданиями
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Очередь заполнена: вызывающий должен повторить позже (503 + Retry-After)."""
+
+
+class RateLimiter:
+    """Token bucket: rate_per_minute запросов в минуту со всплеском до burst."""
+
+    def __init__(self, rate_per_minute: float, burst: int = 1):
+        self.rate = rate_per_minute / 60
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock: asyncio.Lock | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._lock = loop, asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@contextmanager
+def connect(path: str):
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        yield conn
+    finally:
+        conn.close()
+
+
+class SQLiteRateLimiter:
+    """
+    Тот же token bucket, но в общем SQLite-файле: квота одна на все воркеры gunicorn.
+    Токен резервируется сразу (счетчик может уйти в минус), и вызывающий ждет, пока резерв не станет его очередью.
+    """
+
+    def __init__(self, path: str, rate_per_minute: float, burst: int = 1, name: str = "groq"):
+        self.path = path
+        self.rate = rate_per_minute / 60
+        self.burst = max(1, burst)
+        self.name = name
+        with connect(path) as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS llm_quota (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+
+    def reserve(self) -> float:
+        """Забирает токен; возвращает, сколько секунд ждать до его появления."""
+        now = time.time()
+        with connect(self.path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT tokens, updated FROM llm_quota WHERE name = ?", (self.name,)).fetchone()
+            tokens = self.burst if row is None else min(self.burst, row[0] + max(0.0, now - row[1]) * self.rate)
+            tokens -= 1
+            conn.execute("INSERT OR REPLACE INTO llm_quota (name, tokens, updated) VALUES (?, ?, ?)", (self.name, tokens, now))
+            conn.execute("COMMIT")
+        return 0.0 if tokens >= 0 else -tokens / self.rate
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        # BEGIN IMMEDIATE может ждать другие воркеры до timeout: не на event loop
+        wait = await asyncio.to_thread(self.reserve)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class SQLiteJobStore:
+    """
+    Состояние заданий для опроса с любого воркера: статус, результат или ошибка.
+    Методы блокирующие: очередь вызывает их через asyncio.to_thread.
+    """
+
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        with connect(path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, created_at REAL NOT NULL, finished_at REAL, "
+                "result TEXT, error TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_jobs_finished_at ON llm_jobs (finished_at)")
+
+    def save(self, data: dict) -> None:
+        """Снимок Job.as_dict(). Записи из разных потоков могут прийти не по порядку, поэтому состояние
+        только продвигается: завершенное задание не перезаписывается, running не становится queued."""
+        with connect(self.path) as conn:
+            conn.execute(
+                "INSERT INTO llm_jobs (id, status, created_at, finished_at, result, error) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET status = excluded.status, finished_at = excluded.finished_at, "
+                "result = excluded.result, error = excluded.error "
+                "WHERE llm_jobs.finished_at IS NULL AND NOT (excluded.status = 'queued' AND llm_jobs.status = 'running')",
+                (data["job_id"], data["status"], data["created_at"], data["finished_at"], data.get("result"), data.get("error")),
+            )
+            if data["finished_at"] is not None:
+                conn.execute("DELETE FROM llm_jobs WHERE finished_at < ?", (time.time() - self.ttl,))
+
+    def load(self, job_id: str) -> dict | None:
+        with connect(self.path) as conn:
+            row = conn.execute(
+                "SELECT status, created_at, finished_at, result, error FROM llm_jobs WHERE id = ? "
+                "AND (finished_at IS NULL OR finished_at >= ?)",
+                (job_id, time.time() - self.ttl),
+            ).fetchone()
+        if row is None:
+            return None
+        status, created_at, finished_at, result, error = row
+        data = {"job_id": job_id, "status": status, "created_at": created_at, "finished_at": finished_at}
+        if status == "done":
+            data["result"] = result
+        elif status == "failed":
+            data["error"] = error
+        return data
+
+
+@dataclass
+class Job:
+    id: str
+    key: str
+    prompt: str
+    priority: int
+    future: asyncio.Future
+    status: str = "queued"  # queued | running | done | failed
+    created_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+    waiters: int = 1  # сколько запросов объединено в это задание
+    llm: RequestStats | None = None  # вызовы модели этого задания (число и время)
+    persist: bool = False  # задание опрашивают через /ai/jobs: состояние пишется в общее хранилище
+
+    async def wait(self) -> str:
+        # shield: отмена одного из ожидающих (таймаут, отключение клиента) не отменяет общее задание
+        try:
+            return await asyncio.shield(self.future)
+        finally:
+            # Модель вызывал воркер очереди, а ждал ответа этот запрос: время модели идет в его статистику
+            caller = current_request.get()
+            if caller is not None and self.llm is not None and self.future.done():
+                caller.llm_calls += self.llm.llm_calls
+                caller.llm_seconds += self.llm.llm_seconds
+
+    def as_dict(self) -> dict:
+        data = {"job_id": self.id, "status": self.status, "created_at": self.created_at, "finished_at": self.finished_at}
+        if self.status == "done":
+            data["result"] = self.future.result()
+        elif self.status == "failed":
+            data["error"] = str(self.future.exception())
+        return data
+
+
+class LLMJobQueue:
+    def __init__(
+        self,
+        backend: Callable[[str], Awaitable[str]],
+        limiter: RateLimiter,
+        workers: int,
+        max_size: int = LLM_QUEUE_MAX_SIZE,
+        on_result: Callable[[str, str], Awaitable[None]] | None = None,
+        job_ttl: float = LLM_JOB_TTL,
+        store: SQLiteJobStore | None = None,
+    ):
+        self.backend = backend
+        self.limiter = limiter
+        self.workers = workers
+        self.max_size = max_size
+        self.on_result = on_result  # например, запись в кэш ИИ, даже если ожидающие уже отвалились по таймауту
+        self.job_ttl = job_ttl
+        self.store = store  # общее хранилище заданий; None — задания видны только этому процессу
+        self.counters = {"submitted": 0, "coalesced": 0, "rejected": 0, "done": 0, "failed": 0}
+        self._jobs: dict[str, Job] = {}
+        self._inflight: dict[str, Job] = {}
+        self._sequence = itertools.count()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.PriorityQueue | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        # Воркеры привязаны к event loop (новый loop — например, в тестах или после fork)
+        self._loop = loop
+        self._queue = asyncio.PriorityQueue()
+        self._inflight.clear()
+        # Пустой контекст: иначе воркер унаследует current_request запроса, который его запустил
+        self._tasks = [loop.create_task(self._worker(), context=contextvars.Context()) for _ in range(self.workers)]
+
+    def submit(self, prompt: str, key: str, priority: int = PRIORITY_INTERACTIVE) -> Job:
+        """Ставит промпт в очередь или присоединяет к такому же заданию в работе (по key)."""
+        self._ensure_started()
+        self._prune()
+        job = self._inflight.get(key)
+        if job is not None:
+            job.waiters += 1
+            self.counters["coalesced"] += 1
+            return job
+        if self._queue.qsize() >= self.max_size:
+            self.counters["rejected"] += 1
+            raise QueueFull(f"LLM queue is full ({self.max_size})")
+        job = Job(uuid.uuid4().hex, key, prompt, priority, self._loop.create_future())
+        self._jobs[job.id] = job
+        self._inflight[key] = job
+        self._queue.put_nowait((priority, next(self._sequence), job))
+        self.counters["submitted"] += 1
+        return job
+
+    async def submit_tracked(self, prompt: str, key: str, priority: int = PRIORITY_BACKGROUND) -> Job:
+        """submit для опроса по id (/ai/jobs): состояние задания видно другим воркерам через хранилище."""
+        job = self.submit(prompt, key, priority)
+        # Присоединились к заданию запроса, которое в хранилище не пишется: теперь пишется
+        job.persist = True
+        await self._save(job)
+        return job
+
+    async def add_done(self, prompt: str, key: str, result: str) -> Job:
+        """Уже готовый результат (например, из кэша) как завершенное задание для опроса."""
+        self._ensure_started()
+        self._prune()
+        job = Job(uuid.uuid4().hex, key, prompt, PRIORITY_BACKGROUND, self._loop.create_future(), status="done", persist=True)
+        job.future.set_result(result)
+        job.finished_at = time.time()
+        self._jobs[job.id] = job
+        await self._save(job)
+        return job
+
+    async def run(self, prompt: str, key: str, priority: int = PRIORITY_INTERACTIVE) -> str:
+        return await self.submit(prompt, key, priority).wait()
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    async def lookup(self, job_id: str) -> dict | None:
+        """Состояние задания для опроса: свое задание из памяти, задание другого воркера — из хранилища."""
+        self._prune()
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.as_dict()
+        return await asyncio.to_thread(self.store.load, job_id) if self.store is not None else None
+
+    def stats(self) -> dict:
+        running = sum(1 for job in self._inflight.values() if job.status == "running")
+        return {
+            **self.counters,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "running": running,
+            "max_size": self.max_size,
+            "workers": self.workers,
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, job = await self._queue.get()
+            try:
+                await self.limiter.acquire()
+                job.status = "running"
+                await self._save(job)
+                job.llm = RequestStats()
+                token = current_request.set(job.llm)
+                try:
+                    result = await self.backend(job.prompt)
+                finally:
+                    current_request.reset(token)
+            except asyncio.CancelledError:
+                # Воркер остановлен (например, при завершении процесса): ожидающие получают ошибку, а не висят
+                self._fail(job, RuntimeError("LLM queue worker was stopped"))
+                raise
+            except Exception as e:
+                self._fail(job, e)
+            else:
+                job.status = "done"
+                job.future.set_result(result)
+                self.counters["done"] += 1
+                if self.on_result is not None:
+                    try:
+                        await self.on_result(job.key, result)
+                    except Exception:
+                        # Например, занятый файл кэша: ответ уже у ожидающих, воркер продолжает работу
+                        logger.exception("on_result failed for LLM job %s", job.id)
+            finally:
+                job.finished_at = time.time()
+                if self._inflight.get(job.key) is job:
+                    del self._inflight[job.key]
+                await self._save(job)
+                self._queue.task_done()
+
+    def _fail(self, job: Job, error: BaseException) -> None:
+        job.status = "failed"
+        job.future.set_exception(error)
+        # Ошибку забирает as_dict/wait; без ожидающих asyncio не должен ругаться на непрочитанное исключение
+        job.future.exception()
+        self.counters["failed"] += 1
+
+    async def _save(self, job: Job) -> None:
+        # Задания обычных запросов (их ждут на месте, а не опрашивают) в хранилище не пишутся
+        if self.store is not None and job.persist:
+            await asyncio.to_thread(self.store.save, job.as_dict())
+
+    def _prune(self) -> None:
+        expired = time.time() - self.job_ttl
+        for job_id in [id for id, job in self._jobs.items() if job.finished_at is not None and job.finished_at < expired]:
+            del self._jobs[job_id]
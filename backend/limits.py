@@ -0,0 +1,230 @@
+"""
+Ограничение нагрузки от одного клиента: token bucket на клиента (IP или API-ключ) отдельно для группы
+маршрутов ИИ и для каталога, лимит размера тела запросов к модели и сброс нагрузки при переполнении.
+
+Группа ИИ — POST /api/ai... и /api/advisor... (вызов модели и полный проход по каталогу), остальные
+/api/... — каталог. Если группа уже обрабатывает max_in_flight запросов, новые сразу получают 503,
+не расходуя токены клиента; поэтому всплеск запросов к модели не занимает воркер, и чтения каталога
+отвечают с прежней задержкой. Исчерпанный бюджет клиента — 429. В обоих случаях есть Retry-After.
+
+Бакеты хранятся в памяти процесса (у каждого воркера gunicorn свои) или, с RATE_LIMIT_BACKEND=sqlite,
+в общем SQLite-файле: тогда бюджет клиента один на все воркеры. Счетчики запросов в работе всегда
+локальны — это загрузка конкретного воркера.
+"""
+from typing import NamedTuple
+import hashlib
+import ipaddress
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from starlette.responses import JSONResponse
+
+from metrics import rate_limit_rejections
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # memory | sqlite
+RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH", "./rate_limits.db")
+# Бюджет клиента: запросов в минуту и допустимый всплеск
+RATE_LIMIT_AI_PER_MINUTE = float(os.getenv("RATE_LIMIT_AI_PER_MINUTE", "20"))
+RATE_LIMIT_AI_BURST = int(os.getenv("RATE_LIMIT_AI_BURST", "5"))
+RATE_LIMIT_CATALOG_PER_MINUTE = float(os.getenv("RATE_LIMIT_CATALOG_PER_MINUTE", "600"))
+RATE_LIMIT_CATALOG_BURST = int(os.getenv("RATE_LIMIT_CATALOG_BURST", "120"))
+# Сколько запросов группы воркер обрабатывает одновременно, остальные — 503
+MAX_IN_FLIGHT_AI = int(os.getenv("MAX_IN_FLIGHT_AI", "16"))
+MAX_IN_FLIGHT_CATALOG = int(os.getenv("MAX_IN_FLIGHT_CATALOG", "256"))
+# Тело запроса к модели, байт: отказ до чтения тела; длина полей промпта ограничена в requests.py
+AI_MAX_BODY_BYTES = int(os.getenv("AI_MAX_BODY_BYTES", "65536"))
+# Прокси, которым доверяем X-Forwarded-For (адреса или сети через запятую), например nginx фронтенда
+RATE_LIMIT_TRUSTED_PROXIES = [
+    ipaddress.ip_network(value.strip(), strict=False)
+    for value in os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "").split(",") if value.strip()
+]
+# Известные ключи (X-API-Key): клиент с ключом считается по ключу, а не по IP
+RATE_LIMIT_API_KEYS = {value.strip() for value in os.getenv("RATE_LIMIT_API_KEYS", "").split(",") if value.strip()}
+
+# Бакет, не тронутый дольше этого, давно полон: его можно удалить
+BUCKET_IDLE_TTL = 3600
+
+
+class RouteGroup(NamedTuple):
+    name: str
+    prefixes: tuple[str, ...]
+    methods: frozenset[str] | None  # None — любой метод
+    rate_per_minute: float
+    burst: int
+    max_in_flight: int
+    max_body_bytes: int | None = None
+
+
+# Первая подходящая группа; GET /api/ai/jobs/{id} и статистика очереди модель не вызывают — это каталог
+ROUTE_GROUPS = (
+    RouteGroup("ai", ("/api/ai", "/api/advisor"), frozenset({"POST"}), RATE_LIMIT_AI_PER_MINUTE, RATE_LIMIT_AI_BURST, MAX_IN_FLIGHT_AI, AI_MAX_BODY_BYTES),
+    RouteGroup("catalog", ("/api/",), None, RATE_LIMIT_CATALOG_PER_MINUTE, RATE_LIMIT_CATALOG_BURST, MAX_IN_FLIGHT_CATALOG),
+)
+
+
+def match_group(method: str, path: str, groups: tuple[RouteGroup, ...] = ROUTE_GROUPS) -> RouteGroup | None:
+    for group in groups:
+        if (group.methods is None or method in group.methods) and path.startswith(group.prefixes):
+            return group
+    return None
+
+def is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in RATE_LIMIT_TRUSTED_PROXIES)
+
+def client_id(scope) -> str:
+    """API-ключ из RATE_LIMIT_API_KEYS или IP клиента (за доверенным прокси — из X-Forwarded-For)."""
+    headers = dict(scope["headers"])
+    api_key = headers.get(b"x-api-key", b"").decode("latin-1")
+    if api_key in RATE_LIMIT_API_KEYS:
+        # В бакетах (и в общем SQLite-файле) хранится не сам ключ
+        return "key:" + hashlib.sha256(api_key.encode()).hexdigest()[:16]
+    address = scope["client"][0] if scope.get("client") else "unknown"
+    forwarded = headers.get(b"x-forwarded-for")
+    if forwarded and is_trusted_proxy(address):
+        # Справа налево: первый адрес, который добавил не наш прокси; левее клиент может написать что угодно
+        for hop in reversed(forwarded.decode("latin-1").split(",")):
+            address = hop.strip()
+            if not is_trusted_proxy(address):
+                break
+    return "ip:" + address
+
+
+class MemoryBuckets:
+    """Token bucket'ы в памяти процесса: ключ -> (токены, время обновления)."""
+
+    def __init__(self):
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._prune_at = 1024
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate_per_minute: float, burst: int) -> float:
+        """Забирает токен; 0 — запрос разрешен, иначе через сколько секунд появится токен."""
+        if rate_per_minute <= 0:
+            return 0.0
+        rate = rate_per_minute / 60
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            self._buckets[key] = (tokens - 1 if wait == 0 else tokens, now)
+            if len(self._buckets) > self._prune_at:
+                self._prune(now)
+        return wait
+
+    def _prune(self, now: float) -> None:
+        self._buckets = {key: item for key, item in self._buckets.items() if now - item[1] < BUCKET_IDLE_TTL}
+        self._prune_at = max(1024, 2 * len(self._buckets))
+
+
+class SQLiteBuckets:
+    """Token bucket'ы в отдельном SQLite-файле: один бюджет клиента на все воркеры gunicorn."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: sqlite3.Connection | None = None
+        self._takes = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Соединение открывается в воркере при первом запросе, а не в мастере до fork (--preload)
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")  # потеря бакетов при сбое питания не страшна
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def take(self, key: str, rate_per_minute: float, burst: int) -> float:
+        if rate_per_minute <= 0:
+            return 0.0
+        rate = rate_per_minute / 60
+        now = time.time()  # общее для процессов время, не monotonic
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute("SELECT tokens, updated FROM rate_limits WHERE key = ?", (key,)).fetchone()
+                tokens = burst if row is None else min(burst, row[0] + max(0.0, now - row[1]) * rate)
+                wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+                conn.execute(
+                    "INSERT OR REPLACE INTO rate_limits (key, tokens, updated) VALUES (?, ?, ?)",
+                    (key, tokens - 1 if wait == 0 else tokens, now),
+                )
+                self._takes += 1
+                if self._takes % 1000 == 0:
+                    conn.execute("DELETE FROM rate_limits WHERE updated < ?", (now - BUCKET_IDLE_TTL,))
+                conn.execute("COMMIT")
+            except sqlite3.OperationalError:
+                # Файл занят дольше timeout: лимитер не должен ронять запросы, пропускаем
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                return 0.0
+        return wait
+
+
+def create_buckets():
+    if RATE_LIMIT_BACKEND == "sqlite":
+        return SQLiteBuckets(RATE_LIMIT_PATH)
+    return MemoryBuckets()
+
+
+class RateLimitMiddleware:
+    """
+    ASGI-middleware перед маршрутизацией: отказ стоит разбора заголовков, без чтения тела и запросов к базе.
+    413/411 — тело запроса к модели больше AI_MAX_BODY_BYTES или без Content-Length,
+    503 — группа перегружена в этом воркере, 429 — клиент исчерпал бюджет группы.
+    """
+
+    def __init__(self, app, groups: tuple[RouteGroup, ...] = ROUTE_GROUPS, buckets=None, enabled: bool = RATE_LIMIT_ENABLED):
+        self.app = app
+        self.groups = groups
+        self.buckets = buckets if buckets is not None else create_buckets()
+        self.enabled = enabled
+        self.in_flight = {group.name: 0 for group in groups}
+
+    async def __call__(self, scope, receive, send):
+        group = match_group(scope["method"], scope["path"], self.groups) if self.enabled and scope["type"] == "http" else None
+        if group is None:
+            await self.app(scope, receive, send)
+            return
+
+        rejection = self.check(scope, group)
+        if rejection is not None:
+            status_code, detail, retry_after = rejection
+            rate_limit_rejections.inc(1, group.name, str(status_code))
+            headers = {"Retry-After": str(retry_after)} if retry_after is not None else None
+            await JSONResponse({"detail": detail}, status_code=status_code, headers=headers)(scope, receive, send)
+            return
+
+        self.in_flight[group.name] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight[group.name] -= 1
+
+    def check(self, scope, group: RouteGroup) -> tuple[int, str, int | None] | None:
+        if group.max_body_bytes is not None:
+            length = dict(scope["headers"]).get(b"content-length")
+            if length is None or not length.isdigit():
+                return 411, "Content-Length required", None
+            if int(length) > group.max_body_bytes:
+                return 413, f"request body is larger than {group.max_body_bytes} bytes", None
+        # Сначала перегрузка: сброшенный запрос не расходует бюджет клиента
+        if self.in_flight[group.name] >= group.max_in_flight:
+            return 503, "server is busy, retry later", 1
+        wait = self.buckets.take(f"{group.name}:{client_id(scope)}", group.rate_per_minute, group.burst)
+        if wait > 0:
+            return 429, "rate limit exceeded", math.ceil(wait)
+        return None
@@ -1,10 +1,40 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+
+# До остальных импортов: настройки модулей читаются из окружения при импорте
+load_dotenv()
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-import models
-from database import engine
-from routers import universities
+from database import async_engine
+from routers import universities, search, bulk
+from startup import startup
+from metrics import MetricsMiddleware, render_metrics
+from limits import RateLimitMiddleware
+from jobs import QueueFull
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Схема и кэши каталога; миграции — отдельным шагом (python migrations.py), см. startup.py
+    await startup()
+    yield
+    # Потоки aiosqlite не дают процессу завершиться, пока соединения пула открыты
+    await async_engine.dispose()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+
+@app.exception_handler(QueueFull)
+async def queue_full_handler(request: Request, exc: QueueFull):
+    # Backpressure: очередь к модели заполнена, клиент повторит запрос позже
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "5"})
+
+# Лимиты клиентов и сброс нагрузки; добавляется до CORS, чтобы браузер мог прочитать 429/503
+app.add_middleware(RateLimitMiddleware)
 
 # Настройка CORS
 # Разрешаем запросы от фронтенда (локально и в Docker)
@@ -19,12 +49,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing", "Retry-After"],
 )
-
-models.Base.metadata.create_all(bind=engine)
+# Добавляется последним, то есть снаружи CORS: измеряет запрос целиком
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(universities.router, prefix="/api")
+app.include_router(search.router, prefix="/api")
+app.include_router(bulk.router, prefix="/api")
 
 
-
-
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики процесса в текстовом формате Prometheus."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,189 @@
+"""
+Метрики производительности в формате Prometheus: время запросов по маршрутам, число и время
+SQL-запросов на HTTP-запрос, задержка и токены вызовов модели.
+
+Метрики считаются в памяти процесса: при нескольких воркерах gunicorn каждый отдает свои.
+"""
+from contextvars import ContextVar
+from dataclasses import dataclass
+import bisect
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Заголовок Server-Timing в ответах (время обработки, SQL, модель)
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "false").lower() in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...], buckets: tuple[float, ...]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}  # значения меток -> [счетчики корзин, сумма, количество]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.setdefault(label_values, [[0] * len(self.buckets), 0.0, 0])
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                labels = format_labels(self.labels, label_values)
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{format_labels(self.labels + ('le',), label_values + (f'{bound:g}',))} {cumulative}")
+                lines.append(f"{self.name}_bucket{format_labels(self.labels + ('le',), label_values + ('+Inf',))} {count}")
+                lines.append(f"{self.name}_sum{labels} {total:.6f}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._series: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1, *label_values) -> None:
+        with self._lock:
+            self._series[label_values] = self._series.get(label_values, 0) + value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._series.items()):
+                lines.append(f"{self.name}{format_labels(self.labels, label_values)} {value:g}")
+        return lines
+
+
+def format_labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+http_requests = Counter("http_requests_total", "HTTP requests", ("method", "route", "status"))
+http_duration = Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route"), LATENCY_BUCKETS)
+db_queries = Histogram("http_request_db_queries", "SQL statements per HTTP request", ("method", "route"), QUERY_COUNT_BUCKETS)
+db_duration = Histogram("http_request_db_seconds", "SQL time per HTTP request", ("method", "route"), LATENCY_BUCKETS)
+llm_requests = Counter("llm_requests_total", "Model calls", ("model", "mode", "status"))
+llm_duration = Histogram("llm_request_duration_seconds", "Model call latency", ("model", "mode"), LATENCY_BUCKETS)
+llm_tokens = Counter("llm_tokens_total", "Model tokens", ("model", "direction"))
+rate_limit_rejections = Counter("rate_limit_rejections_total", "Requests rejected by rate limiting and load shedding", ("group", "status"))
+
+REGISTRY = [http_requests, http_duration, db_queries, db_duration, llm_requests, llm_duration, llm_tokens, rate_limit_rejections]
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_seconds: float = 0.0
+    llm_calls: int = 0
+    llm_seconds: float = 0.0
+
+
+# Статистика текущего HTTP-запроса; изменяемый объект виден и из потоков пула, куда копируется контекст
+current_request: ContextVar[RequestStats | None] = ContextVar("current_request", default=None)
+
+
+def record_llm(model: str, mode: str, seconds: float, status: str, input_tokens: int | None = None, output_tokens: int | None = None) -> None:
+    llm_requests.inc(1, model, mode, status)
+    llm_duration.observe(seconds, model, mode)
+    if input_tokens:
+        llm_tokens.inc(input_tokens, model, "in")
+    if output_tokens:
+        llm_tokens.inc(output_tokens, model, "out")
+    stats = current_request.get()
+    if stats is not None:
+        stats.llm_calls += 1
+        stats.llm_seconds += seconds
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Считает SQL-запросы и их время для текущего HTTP-запроса (для async-движка — его sync_engine)."""
+
+    # Время начала хранится в контексте выполнения, а не в conn.info: при ошибке запроса
+    # after_cursor_execute не вызывается, и в соединении из пула не должно оставаться лишних записей
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = context._query_started
+        stats = current_request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: латентность по шаблону маршрута (до последнего байта ответа, включая потоковые)
+    и SQL-статистика запроса. Server-Timing добавляется к заголовкам, поэтому для потоковых ответов
+    в нем только то, что выполнено до начала ответа.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if METRICS_SERVER_TIMING:
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", server_timing(stats, started).encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            route = scope.get("route")
+            # Шаблон пути, а не сам путь: /api/get/{university_id}, а не /api/get/1
+            path = getattr(route, "path_format", None) or getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_requests.inc(1, method, path, str(status_code))
+            http_duration.observe(time.perf_counter() - started, method, path)
+            db_queries.observe(stats.queries, method, path)
+            db_duration.observe(stats.db_seconds, method, path)
+
+
+def server_timing(stats: RequestStats, started: float) -> str:
+    total = (time.perf_counter() - started) * 1000
+    parts = [f"app;dur={total:.1f}", f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries"']
+    if stats.llm_calls:
+        parts.append(f"llm;dur={stats.llm_seconds * 1000:.1f}")
+    return ", ".join(parts)
@@ -0,0 +1,128 @@
+"""
+Миграции схемы — отдельный шаг перед запуском воркеров, а не побочный эффект импорта main:
+
+    python migrations.py
+
+Версия схемы SQLite хранится в PRAGMA user_version; при старте приложения проверяется только она.
+"""
+import json
+import os
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from database import dump_json
+from requests import parse_string_list, normalize_languages
+
+# Увеличивается при каждом изменении, которое должна применить run_migrations
+SCHEMA_VERSION = 2
+# auto — мигрировать при старте, только если версия схемы отстает (свежая база); true — всегда; false — никогда
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "auto").lower()
+
+# Колонки со списками строк, которые раньше хранились как произвольный текст:
+# JSON с \u-экранированием, а languages — еще и строкой через запятую
+JSON_LIST_COLUMNS = {
+    "universities": ["languages", "exchange_programs", "partners", "foreign_student_opps", "double_degree_programs"],
+    "admission_info": ["requirements", "deadlines", "scholarships"],
+}
+
+
+def canonical_json_list(table: str, column: str, value: str | None) -> str | None:
+    if value is None or not value.strip():
+        return None
+    items = parse_string_list(value)
+    if not isinstance(items, list):
+        return None
+    if table == "universities" and column == "languages":
+        items = normalize_languages(items)
+    return dump_json(items)
+
+def migrate_json_columns(engine: Engine) -> None:
+    """
+    Приводит списковые колонки существующей SQLite-базы к JSON-массивам.
+    Переписываются только строки, значение которых отличается от канонического, поэтому повторный запуск ничего не меняет.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        for table, columns in JSON_LIST_COLUMNS.items():
+            rows = conn.execute(text(f"SELECT id, {', '.join(columns)} FROM {table}")).mappings().all()
+            for row in rows:
+                changes = {}
+                for column in columns:
+                    value = canonical_json_list(table, column, row[column])
+                    if value != row[column]:
+                        changes[column] = value
+                if changes:
+                    assignments = ", ".join(f"{column} = :{column}" for column in changes)
+                    conn.execute(text(f"UPDATE {table} SET {assignments} WHERE id = :id"), {**changes, "id": row["id"]})
+
+def add_missing_columns(engine: Engine) -> None:
+    """create_all не меняет существующие таблицы: новые колонки моделей добавляются через ALTER TABLE."""
+    import models
+
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in models.Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+def fill_folded_columns(engine: Engine) -> None:
+    """name_folded и languages_folded для строк, записанных до их появления или в обход ORM (generate_catalog)."""
+    from models import folded_columns
+
+    with engine.begin() as conn:
+        rows = conn.execute(text("SELECT id, name, languages, name_folded, languages_folded FROM universities")).mappings().all()
+        for row in rows:
+            languages = row["languages"]
+            if isinstance(languages, str):  # SQLite отдает JSON-колонку текстом
+                languages = json.loads(languages) if languages.strip() else None
+            values = folded_columns(row["name"], languages)
+            if values != {"name_folded": row["name_folded"], "languages_folded": row["languages_folded"]}:
+                conn.execute(
+                    text("UPDATE universities SET name_folded = :name_folded, languages_folded = :languages_folded WHERE id = :id"),
+                    {**values, "id": row["id"]},
+                )
+
+def schema_version(engine: Engine) -> int | None:
+    if engine.dialect.name != "sqlite":
+        return None  # у серверной БД нет user_version; create_all и индексы идемпотентны
+    with engine.connect() as conn:
+        return conn.execute(text("PRAGMA user_version")).scalar()
+
+def run_migrations(engine: Engine) -> None:
+    """Таблицы, новые колонки и индексы, JSON-колонки, свернутый текст и полнотекстовый индекс; повторный запуск ничего не меняет."""
+    import models
+    from fulltext import ensure_search_index
+
+    models.Base.metadata.create_all(bind=engine)
+    # create_all не добавляет новые индексы в уже существующие таблицы
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    add_missing_columns(engine)
+    migrate_json_columns(engine)
+    fill_folded_columns(engine)
+    ensure_search_index(engine)
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            conn.execute(text(f"PRAGMA user_version = {SCHEMA_VERSION}"))
+
+def migrate_if_needed(engine: Engine) -> bool:
+    """Проверка при старте приложения: одна PRAGMA, если схема уже актуальна."""
+    if MIGRATE_ON_STARTUP == "false":
+        return False
+    if MIGRATE_ON_STARTUP == "auto" and (schema_version(engine) or 0) >= SCHEMA_VERSION:
+        return False
+    run_migrations(engine)
+    return True
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    run_migrations(engine)
+    print(f"schema version {SCHEMA_VERSION}")
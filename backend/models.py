@@ -1,6 +1,17 @@
 from database import Base
-from sqlalchemy import Integer, Column, String, ForeignKey, Date, Boolean, DECIMAL, Text
-import json
+from sqlalchemy import Integer, Column, String, ForeignKey, Date, Boolean, DECIMAL, Text, Index, JSON, event
+from sqlalchemy.orm import relationship
+
+
+def fold(value: str | None) -> str:
+    # LIKE/ILIKE в SQLite без учета регистра только для ASCII; для кириллицы сравниваем заранее свернутый текст
+    return (value or '').casefold()
+
+def folded_columns(name: str | None, languages) -> dict:
+    """Колонки для фильтров search и language (GET /api/, фасеты); пишутся вместе с name и languages."""
+    if isinstance(languages, str):
+        languages = [languages]
+    return {'name_folded': fold(name), 'languages_folded': fold(', '.join(languages or []))}
 
 class University(Base):
     __tablename__ = 'universities'
@@ -17,18 +28,39 @@ class University(Base):
     has_military_dept = Column(Boolean, default=False)  # Новое поле
     rating = Column(DECIMAL)
     has_tour = Column(Boolean)
-    languages = Column(String)  # JSON строка или разделенная запятыми
+    languages = Column(JSON(none_as_null=True))  # список строк
     number_of_grants = Column(Integer)
     exchange_program = Column(Boolean)
-    exchange_programs = Column(Text, nullable=True)  # JSON массив строк
-    partners = Column(Text, nullable=True)  # JSON массив строк
-    foreign_student_opps = Column(Text, nullable=True)  # JSON массив строк
+    exchange_programs = Column(JSON(none_as_null=True), nullable=True)  # список строк
+    partners = Column(JSON(none_as_null=True), nullable=True)  # список строк
+    foreign_student_opps = Column(JSON(none_as_null=True), nullable=True)  # список строк
     double_degree_program = Column(Boolean)
-    double_degree_programs = Column(Text, nullable=True)  # JSON массив строк
+    double_degree_programs = Column(JSON(none_as_null=True), nullable=True)  # список строк
     IELTS_sertificate = Column(Boolean)
     min_ielts = Column(DECIMAL, nullable=True)  # Минимальный балл IELTS
     format = Column(String)
     price = Column(Integer)
+    # casefold() от name и languages: поиск по подстроке без учета регистра (см. folded_columns)
+    name_folded = Column(String)
+    languages_folded = Column(String)
+
+    # Связи для eager-загрузки (selectinload) вместо запросов на каждый университет
+    programs = relationship('Program', order_by='Program.id', lazy='select')
+    # university_id в admission_info не уникален: строки грузятся списком, а в ответ идет первая по id
+    admissions = relationship('AdmissionInfo', order_by='AdmissionInfo.id', lazy='select')
+
+    @property
+    def admission_info(self):
+        return self.admissions[0] if self.admissions else None
+
+    # Составные индексы под фильтры и keyset-пагинацию GET /api/ (id — тай-брейкер сортировки)
+    __table_args__ = (
+        Index('ix_universities_city_price', 'city', 'price', 'id'),
+        Index('ix_universities_price_id', 'price', 'id'),
+        Index('ix_universities_rating_id', 'rating', 'id'),
+        Index('ix_universities_min_ent_score_id', 'min_ent_score', 'id'),
+        Index('ix_universities_name_id', 'name', 'id'),
+    )
     
 
 class Program(Base):
@@ -46,6 +78,11 @@ class Program(Base):
     double_degree_program = Column(Boolean)
     employment = Column(Integer)
 
+    __table_args__ = (
+        Index('ix_programs_university_id_id', 'university_id', 'id'),
+        Index('ix_programs_degree_university_id', 'degree', 'university_id'),
+    )
+
 
 class AdmissionInfo(Base):
     __tablename__ = 'admission_info'
@@ -53,9 +90,19 @@ class AdmissionInfo(Base):
     university_id = Column(Integer, ForeignKey('universities.id'), nullable=True)  # Связь с университетом
     deadline_date = Column(Date, nullable=True)
     requirements_text = Column(String, nullable=True)
-    requirements = Column(Text, nullable=True)  # JSON массив строк
-    deadlines = Column(Text, nullable=True)  # JSON массив строк
-    scholarships = Column(Text, nullable=True)  # JSON массив строк
+    requirements = Column(JSON(none_as_null=True), nullable=True)  # список строк
+    deadlines = Column(JSON(none_as_null=True), nullable=True)  # список строк
+    scholarships = Column(JSON(none_as_null=True), nullable=True)  # список строк
     procedure = Column(Text, nullable=True)  # Текст процедуры
-    
 
+    __table_args__ = (
+        Index('ix_admission_info_university_id_id', 'university_id', 'id'),
+    )
+
+
+@event.listens_for(University, 'before_insert')
+@event.listens_for(University, 'before_update')
+def set_folded_columns(mapper, connection, target):
+    # Запись через ORM (API); массовый импорт заполняет колонки сам (bulk.py), старые строки — миграция
+    for column, value in folded_columns(target.name, target.languages).items():
+        setattr(target, column, value)
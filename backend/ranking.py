@@ -0,0 +1,174 @@
+from typing import NamedTuple
+import re
+
+import numpy as np
+
+from models import University
+from requests import AdvisorRequest
+
+# Веса компонентов итогового скоринга
+WEIGHT_ENT = 0.35
+WEIGHT_KEYWORDS = 0.35
+WEIGHT_CITY = 0.2
+WEIGHT_LANGUAGE = 0.05
+WEIGHT_PRICE = 0.03
+WEIGHT_GRANTS = 0.02
+
+# На сколько баллов ЕНТ ниже проходного университет еще считается достижимым
+ENT_TOLERANCE = 20.0
+
+STEM_LENGTH = 6
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = {"and", "the", "for", "with", "для", "что", "как", "или", "это", "при", "над"}
+
+# Нормализация упоминаний языков обучения (по префиксу)
+LANGUAGE_ALIASES = {
+    "англ": "en", "engl": "en",
+    "рус": "ru", "russ": "ru",
+    "каз": "kk", "қаз": "kk", "kaz": "kk",
+}
+
+
+def tokenize(text: str | None) -> set[str]:
+    # Грубый стемминг обрезкой: "информатика" и "информационные" дают один токен
+    if not text:
+        return set()
+    return {
+        token[:STEM_LENGTH]
+        for token in TOKEN_RE.findall(text.lower())
+        if len(token) > 2 and token not in STOPWORDS and not token.isdigit()
+    }
+
+def normalize_language(text: str) -> str | None:
+    value = text.strip().lower()
+    for prefix, code in LANGUAGE_ALIASES.items():
+        if value.startswith(prefix):
+            return code
+    return None
+
+
+class RankedUniversity(NamedTuple):
+    position: int  # индекс университета в каталоге, по которому строился индекс
+    score: float
+    programs: list[str]  # названия наиболее подходящих программ
+
+
+class RankingIndex:
+    """
+    Предвычисленные признаки университетов и программ для детерминированного ранжирования.
+    Строится один раз на версию каталога; rank() — векторные операции NumPy.
+    """
+
+    def __init__(self, universities: list[University]):
+        n = len(universities)
+        self.size = n
+        self.cities = [(uni.city or "").strip().lower() for uni in universities]
+
+        programs = [(i, p) for i, uni in enumerate(universities) for p in uni.programs]
+        self.program_names = [p.name for _, p in programs]
+        self.program_owner = np.array([i for i, _ in programs], dtype=np.int64)
+
+        # Проходной балл: минимум по университету и его программам
+        uni_min_ent = np.array([uni.min_ent_score or 0 for uni in universities], dtype=np.float64)
+        program_min_ent = np.array([p.min_ent_score or 0 for _, p in programs], dtype=np.float64)
+        self.program_min_ent = program_min_ent
+        self.min_ent = uni_min_ent.copy()
+        if len(programs):
+            program_or_uni = np.where(program_min_ent > 0, program_min_ent, uni_min_ent[self.program_owner])
+            lowest = np.full(n, np.inf)
+            np.minimum.at(lowest, self.program_owner, program_or_uni)
+            self.min_ent = np.where(np.isfinite(lowest) & (uni_min_ent > 0), np.minimum(uni_min_ent, lowest), uni_min_ent)
+
+        prices = np.array([uni.price or 0 for uni in universities], dtype=np.float64)
+        max_price = prices.max() if n else 0
+        self.price_score = 1.0 - prices / max_price if max_price > 0 else np.zeros(n)
+
+        grants = np.log1p(np.array([uni.number_of_grants or 0 for uni in universities], dtype=np.float64))
+        max_grants = grants.max() if n else 0
+        self.grants_score = grants / max_grants if max_grants > 0 else np.zeros(n)
+
+        # Языки обучения: бинарная матрица университет x код языка
+        self.language_codes = sorted(set(LANGUAGE_ALIASES.values()))
+        self.languages = np.zeros((n, len(self.language_codes)), dtype=np.float64)
+        for i, uni in enumerate(universities):
+            languages = (uni.languages or []) + [p.language for p in uni.programs if p.language]
+            for language in languages:
+                code = normalize_language(language)
+                if code:
+                    self.languages[i, self.language_codes.index(code)] = 1.0
+
+        # Ключевые слова: бинарные матрицы по словарю каталога, строки нормированы
+        uni_tokens = [tokenize(f"{uni.name} {uni.description or ''}") for uni in universities]
+        program_tokens = [tokenize(f"{p.name} {p.description or ''}") for _, p in programs]
+        vocabulary = sorted(set().union(*uni_tokens, *program_tokens))
+        self.vocabulary = {token: j for j, token in enumerate(vocabulary)}
+        self.uni_terms = self._term_matrix(uni_tokens)
+        self.program_terms = self._term_matrix(program_tokens)
+
+    def _term_matrix(self, rows: list[set[str]]) -> np.ndarray:
+        matrix = np.zeros((len(rows), len(self.vocabulary)), dtype=np.float32)
+        for i, tokens in enumerate(rows):
+            for token in tokens:
+                matrix[i, self.vocabulary[token]] = 1.0
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms > 0, norms, 1.0)
+
+    def _query_vector(self, tokens: set[str]) -> np.ndarray:
+        vector = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for token in tokens:
+            j = self.vocabulary.get(token)
+            if j is not None:
+                vector[j] = 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def rank(self, request: AdvisorRequest, k: int) -> list[RankedUniversity]:
+        if self.size == 0:
+            return []
+        ent = float(request.ent_score)
+
+        # Балл ЕНТ: 1 если проходит, линейный спад в пределах ENT_TOLERANCE
+        ent_score = np.clip(1.0 - (self.min_ent - ent) / ENT_TOLERANCE, 0.0, 1.0)
+
+        preferred_city = (request.preferred_city or "").strip().lower()
+        city_score = np.array(
+            [1.0 if preferred_city and city and (preferred_city in city or city in preferred_city) else 0.0 for city in self.cities]
+        )
+
+        request_text = f"{request.profile_subjects} {request.interests} {request.career_goal}"
+        query = self._query_vector(tokenize(request_text))
+        keyword_score = self.uni_terms @ query
+        program_keyword = self.program_terms @ query if len(self.program_names) else np.zeros(0, dtype=np.float32)
+        if len(program_keyword):
+            # Программа проходит, если балл абитуриента не ниже ее проходного
+            program_keyword = np.where(self.program_min_ent <= ent, program_keyword, program_keyword * 0.5)
+            best_program = np.zeros(self.size, dtype=np.float32)
+            np.maximum.at(best_program, self.program_owner, program_keyword)
+            keyword_score = np.maximum(keyword_score, best_program)
+
+        wanted = {normalize_language(token) for token in TOKEN_RE.findall(request_text.lower())} - {None}
+        language_score = np.zeros(self.size)
+        if wanted:
+            mask = np.array([code in wanted for code in self.language_codes], dtype=np.float64)
+            language_score = (self.languages @ mask) / len(wanted)
+
+        scores = (
+            WEIGHT_ENT * ent_score
+            + WEIGHT_KEYWORDS * keyword_score
+            + WEIGHT_CITY * city_score
+            + WEIGHT_LANGUAGE * language_score
+            + WEIGHT_PRICE * self.price_score
+            + WEIGHT_GRANTS * self.grants_score
+        )
+
+        k = min(k, self.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.lexsort((top, -scores[top]))]  # по убыванию score, при равенстве — по порядку каталога
+        return [RankedUniversity(int(i), float(scores[i]), self._top_programs(int(i), program_keyword)) for i in top]
+
+    def _top_programs(self, position: int, program_keyword: np.ndarray, limit: int = 3) -> list[str]:
+        indices = np.flatnonzero(self.program_owner == position)
+        if len(indices) == 0:
+            return []
+        order = indices[np.argsort(-program_keyword[indices], kind="stable")][:limit]
+        return [self.program_names[i] for i in order]
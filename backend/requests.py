@@ -1,7 +1,29 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, BeforeValidator, AfterValidator
 from datetime import date
-from typing import Optional, List
+from typing import Annotated, Optional, List, Literal
 from decimal import Decimal
+import json
+
+
+def parse_string_list(value):
+    # Старый формат: JSON-строка или значения через запятую
+    if isinstance(value, str):
+        try:
+            parsed = json.loads(value)
+        except ValueError:
+            parsed = value.split(',')
+        value = parsed if isinstance(parsed, list) else [value]
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if item is not None and str(item).strip()]
+    return value
+
+def normalize_languages(languages: List[str]) -> List[str]:
+    # "русский" -> "Русский", как раньше делал фронтенд при каждом отображении
+    return [language[0].upper() + language[1:].lower() for language in languages]
+
+StringList = Annotated[List[str], BeforeValidator(parse_string_list)]
+LanguageList = Annotated[StringList, AfterValidator(normalize_languages)]
+
 
 class UniversityRequest(BaseModel):
     name: str = Field(max_length=255)
@@ -16,14 +38,14 @@ class UniversityRequest(BaseModel):
     rating: float = Field(gt=-1, lt=6)
     has_tour: bool = Field(default=False)
     history: Optional[str] = None
-    languages: str
+    languages: LanguageList
     number_of_grants: Optional[int] = None
     exchange_program: bool = Field(default=False)
-    exchange_programs: Optional[str] = None  # JSON строка
-    partners: Optional[str] = None  # JSON строка
-    foreign_student_opps: Optional[str] = None  # JSON строка
+    exchange_programs: Optional[StringList] = None
+    partners: Optional[StringList] = None
+    foreign_student_opps: Optional[StringList] = None
     double_degree_program: bool = Field(default=False)
-    double_degree_programs: Optional[str] = None  # JSON строка
+    double_degree_programs: Optional[StringList] = None
     IELTS_sertificate: bool = Field(default=False)
     min_ielts: Optional[Decimal] = None
     format: Optional[str] = None
@@ -47,21 +69,60 @@ class AdmissionInfoRequest(BaseModel):
     university_id: Optional[int] = None
     deadline_date: date | None = None
     requirements_text: Optional[str] = None
-    requirements: Optional[str] = None  # JSON строка
-    deadlines: Optional[str] = None  # JSON строка
-    scholarships: Optional[str] = None  # JSON строка
+    requirements: Optional[StringList] = None
+    deadlines: Optional[StringList] = None
+    scholarships: Optional[StringList] = None
     procedure: Optional[str] = None
 
+class UniversityFilterParams(BaseModel):
+    # Query-параметры для GET /api/ (фильтры, сортировка, keyset-пагинация)
+    city: Optional[str] = None
+    has_dormitory: Optional[bool] = None
+    price_min: Optional[int] = Field(default=None, ge=0)
+    price_max: Optional[int] = Field(default=None, ge=0)
+    language: Optional[str] = None
+    min_ent_score: Optional[int] = Field(default=None, gt=-1, lt=141)  # балл абитуриента: проходной балл не выше
+    degree: Optional[str] = None
+    search: Optional[str] = Field(default=None, max_length=255)
+    sort: Literal['id', 'name', 'price', 'rating', 'min_ent_score'] = 'id'
+    order: Literal['asc', 'desc'] = 'asc'
+    limit: Optional[int] = Field(default=None, gt=0, le=500)
+    cursor: Optional[str] = None
+
+class UniversityListParams(UniversityFilterParams):
+    # GET /api/: view=summary — карточки для списка, fields=id,name,city — только перечисленные поля
+    view: Literal['summary', 'full'] = 'full'
+    fields: Optional[str] = None
+
+class UniversityBatchRequest(BaseModel):
+    # Университеты сравнения и избранного одним запросом (POST /api/get)
+    ids: List[int] = Field(min_length=1, max_length=500)
+
 class AIRequest(BaseModel):
-    template: str
-    text: str
+    # Ограничение длины промпта: текст уходит в модель целиком
+    template: str = Field(max_length=2000)
+    text: str = Field(max_length=8000)
 
 class AdvisorRequest(BaseModel):
     ent_score: int
-    profile_subjects: str
-    interests: str
-    preferred_city: str
-    career_goal: str
+    profile_subjects: str = Field(max_length=500)
+    interests: str = Field(max_length=500)
+    preferred_city: str = Field(max_length=100)
+    career_goal: str = Field(max_length=500)
+
+class CompareUniversity(BaseModel):
+    # Фронтенд присылает университет целиком; для сравнения нужен только id
+    id: int
+
+class CompareRequest(BaseModel):
+    universities: List[CompareUniversity] = Field(min_length=1, max_length=10)
+    userGoal: str = ''
+
+class ChanceAnalysisRequest(BaseModel):
+    universityId: int
+    userScore: int = Field(ge=0, le=140)
+    subject: str = ''
+    ielts: Optional[float] = Field(default=None, ge=0, le=9)
 
 # Response models для API
 class ProgramResponse(BaseModel):
@@ -108,14 +169,14 @@ class UniversityResponse(BaseModel):
     has_military_dept: bool = False
     rating: Decimal
     has_tour: bool = False
-    languages: Optional[str] = None  # JSON строка
+    languages: Optional[List[str]] = None
     number_of_grants: Optional[int] = None
     exchange_program: bool = False
-    exchange_programs: Optional[str] = None  # JSON строка
-    partners: Optional[str] = None  # JSON строка
-    foreign_student_opps: Optional[str] = None  # JSON строка
+    exchange_programs: Optional[List[str]] = None
+    partners: Optional[List[str]] = None
+    foreign_student_opps: Optional[List[str]] = None
     double_degree_program: bool = False
-    double_degree_programs: Optional[str] = None  # JSON строка
+    double_degree_programs: Optional[List[str]] = None
     IELTS_sertificate: bool = False
     min_ielts: Optional[Decimal] = None
     format: Optional[str] = None
@@ -124,4 +185,64 @@ class UniversityResponse(BaseModel):
     admission_info: Optional[AdmissionInfoResponse] = None
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class UniversitySummaryResponse(BaseModel):
+    # Карточка в списке (GET /api/?view=summary): без длинных текстов, программ и admission info
+    id: int
+    name: str
+    city: str
+    logo_url: Optional[str] = None
+    min_ent_score: int
+    price: int
+    rating: Decimal
+    has_dormitory: bool
+    has_military_dept: bool = False
+    has_tour: bool = False
+    languages: Optional[List[str]] = None
+    number_of_grants: Optional[int] = None
+    IELTS_sertificate: bool = False
+    format: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class UniversityBatchResponse(BaseModel):
+    items: List[UniversityResponse]
+    missing: List[int]
+
+class SimilarItem(BaseModel):
+    id: int
+    name: str
+    university_id: Optional[int] = None  # для программ
+    score: float
+
+class SimilarResponse(BaseModel):
+    id: int
+    items: List[SimilarItem]
+
+class SearchResult(BaseModel):
+    kind: Literal['university', 'program']
+    id: int
+    university_id: Optional[int] = None
+    name: Optional[str] = None
+    snippet: Optional[str] = None
+    score: float
+
+class SearchResponse(BaseModel):
+    total: int
+    limit: int
+    offset: int
+    items: List[SearchResult]
+
+class CompareResponse(BaseModel):
+    winner: str
+    winner_id: Optional[int] = None
+    analysis: str
+    reasoning: str
+    comparison: dict
+
+class ChanceAnalysisResponse(BaseModel):
+    chance: Literal['High', 'Medium', 'Low']
+    message: str
+    features: dict
@@ -0,0 +1,53 @@
+from typing import Literal
+import asyncio
+import io
+import tempfile
+
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+from starlette import status
+
+from bulk import import_records, export_records
+from routers.universities import db_dependency, catalog_changed
+
+router = APIRouter()
+
+# Тело запроса больше этого размера буферизуется на диске, а не в памяти
+BULK_SPOOL_SIZE = 16 * 1024 * 1024
+
+MEDIA_TYPES = {'jsonl': 'application/x-ndjson', 'csv': 'text/csv; charset=utf-8'}
+
+BulkEntityName = Literal['universities', 'programs', 'admissions']
+
+
+@router.post('/bulk/{entity}', status_code=status.HTTP_200_OK, tags=['Bulk'])
+async def bulk_import(
+    entity: BulkEntityName,
+    request: Request,
+    db: db_dependency,
+    format: Literal['jsonl', 'csv'] = 'jsonl',
+):
+    """
+    Массовый импорт JSONL/CSV (тело запроса). Upsert по естественному ключу:
+    университет — name, программа — (university_id, name, degree), admission info — university_id.
+    Ошибочные строки пропускаются и перечисляются в отчете.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=BULK_SPOOL_SIZE) as body:
+        async for chunk in request.stream():
+            body.write(chunk)
+        body.seek(0)
+        lines = io.TextIOWrapper(body, encoding='utf-8-sig', newline='')
+        # Разбор и запись пачками — в отдельном потоке, чтобы не блокировать event loop
+        report = await asyncio.to_thread(import_records, lines, entity, format)
+    if report['inserted'] or report['updated']:
+        catalog_changed(db)
+    return report
+
+@router.get('/bulk/{entity}', status_code=status.HTTP_200_OK, tags=['Bulk'])
+async def bulk_export(entity: BulkEntityName, format: Literal['jsonl', 'csv'] = 'jsonl'):
+    """Потоковая выгрузка в формате, который принимает POST /api/bulk/{entity}."""
+    return StreamingResponse(
+        export_records(entity, format),
+        media_type=MEDIA_TYPES[format],
+        headers={'Content-Disposition': f'attachment; filename="{entity}.{format}"'},
+    )
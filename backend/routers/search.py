@@ -0,0 +1,27 @@
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Query
+from starlette import status
+
+from fulltext import search
+from requests import SearchResponse
+from routers.universities import async_db_dependency
+
+router = APIRouter()
+
+
+@router.get('/search', status_code=status.HTTP_200_OK, tags=['Search'], response_model=SearchResponse)
+async def search_catalog(
+    db: async_db_dependency,
+    q: str = Query(min_length=1, max_length=255),
+    kind: Optional[Literal['university', 'program']] = None,
+    limit: int = Query(default=20, gt=0, le=100),
+    offset: int = Query(default=0, ge=0),
+):
+    """
+    Полнотекстовый поиск по университетам (название, описание, миссия, история) и программам.
+    Поддерживает префиксы слов, кириллицу и латиницу; сортировка по релевантности (bm25).
+    Не на SQLite (нет FTS5) — поиск по подстрокам, выше те, где все слова есть в названии.
+    """
+    total, items = await search(db, q, kind, limit, offset)
+    return {'total': total, 'limit': limit, 'offset': offset, 'items': items}
@@ -1,20 +1,53 @@
 from typing import Annotated, List
+from decimal import Decimal
+from email.utils import formatdate, parsedate_to_datetime
+from functools import lru_cache
+import asyncio
+import base64
 import json
-
-from fastapi import APIRouter, Depends, HTTPException, Path
-from sqlalchemy.orm import Session
+import os
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from pydantic import BaseModel, ValidationError, create_model
 from starlette import status
 
-from models import University, Program, AdmissionInfo
+from models import University, Program, AdmissionInfo, fold
 from requests import (
-    UniversityRequest, ProgramRequest, AdmissionInfoRequest, AIRequest, AdvisorRequest,
-    UniversityResponse, ProgramResponse, AdmissionInfoResponse
+    UniversityRequest, ProgramRequest, AdmissionInfoRequest, AIRequest, AdvisorRequest, UniversityFilterParams, UniversityListParams,
+    UniversityBatchRequest, UniversityBatchResponse, UniversityResponse, UniversitySummaryResponse, ProgramResponse, AdmissionInfoResponse, CompareRequest, CompareResponse,
+    ChanceAnalysisRequest, ChanceAnalysisResponse, SimilarResponse
 )
-from database import SessionLocal
-from groq import requestAI
+from database import SessionLocal, AsyncSessionLocal
+from groq import requestAICached, streamAICached, submitAIJob, llm_queue
+from cache import ai_cache
+from snapshot import get_catalog_snapshot, build_responses, choose_encoding
+from facets import get_facet_index, compute_facets
+from similar import get_similar_index, similar_items, update_similar_index
+from streaming import SSE_HEADERS, JSONStringFields, sse_event, with_deadline
+from insights import analyze_chance, compare_universities, format_chance, format_comparison, COMPARE_METRICS
+from catalog import bump_catalog_version, get_catalog_version, get_advisor_context, rebuild_advisor_context, format_shortlist
 
 router = APIRouter()
 
+# Сколько университетов после локального ранжирования попадает в промпт советника
+ADVISOR_TOP_K = int(os.getenv("ADVISOR_TOP_K", "10"))
+# После этого таймаута советник отвечает детерминированным результатом ранжирования
+ADVISOR_LLM_TIMEOUT = float(os.getenv("ADVISOR_LLM_TIMEOUT", "20"))
+# Таймаут текстового пояснения модели в /ai/compare и /ai/analyze-chance; после него — ответ из расчетов
+AI_NARRATIVE_TIMEOUT = float(os.getenv("AI_NARRATIVE_TIMEOUT", "15"))
+# HTTP-кэширование каталога браузером и nginx (секунды)
+CATALOG_MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", "60"))
+CATALOG_STALE_WHILE_REVALIDATE = int(os.getenv("CATALOG_STALE_WHILE_REVALIDATE", "600"))
+# Размер пачки строк, читаемых из курсора при потоковой выдаче NDJSON
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "1000"))
+# Сколько id университетов в одном IN при догрузке программ и admission info для ?fields=
+RELATION_BATCH_SIZE = 500
+
 
 def get_db():
     db = SessionLocal()
@@ -25,90 +58,318 @@ def get_db():
 
 db_dependency = Annotated[Session, Depends(get_db)]
 
-# Helper function to parse JSON fields
-def parse_json_field(field: str | None) -> List[str] | None:
-    if not field:
-        return None
-    try:
-        parsed = json.loads(field)
-        return parsed if isinstance(parsed, list) else None
-    except:
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async_db_dependency = Annotated[AsyncSession, Depends(get_async_db)]
+
+
+def is_not_modified(request: Request, version: int) -> bool:
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        # If-None-Match сравнивается слабо и имеет приоритет над If-Modified-Since;
+        # сжатые варианты снимка каталога ("<версия>-br") относятся к той же версии
+        tags = [tag.strip().removeprefix('W/').strip('"') for tag in if_none_match.split(',')]
+        return '*' in tags or str(version) in {tag.split('-')[0] for tag in tags}
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since and version:
+        try:
+            return version // 1_000_000_000 <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def catalog_cache_headers(request: Request, response: Response):
+    """Условный GET по версии каталога: 304 отдается без обращения к базе."""
+    version = get_catalog_version()
+    headers = {
+        'ETag': f'"{version}"',
+        'Cache-Control': f'public, max-age={CATALOG_MAX_AGE}, stale-while-revalidate={CATALOG_STALE_WHILE_REVALIDATE}',
+    }
+    if version:
+        # Версия — время изменения каталога в наносекундах
+        headers['Last-Modified'] = formatdate(version / 1_000_000_000, usegmt=True)
+    if is_not_modified(request, version):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+
+catalog_cache = [Depends(catalog_cache_headers)]
+
+def build_admission_response(admission: AdmissionInfo | None) -> AdmissionInfoResponse | None:
+    if admission is None:
         return None
+    # Списковые поля уже хранятся как JSON и приходят из БД разобранными
+    return AdmissionInfoResponse.model_validate(admission)
 
-#get requests
-@router.get('/', status_code=status.HTTP_200_OK, tags=['Universities'], response_model=List[UniversityResponse])
-async def read_universities(db: db_dependency):
-    universities = db.query(University).all()
-    result = []
-    for uni in universities:
-        # Получаем программы для университета
-        programs = db.query(Program).filter(Program.university_id == uni.id).all()
-        program_responses = [ProgramResponse.model_validate(p) for p in programs]
-        
-        # Получаем admission info
-        admission = db.query(AdmissionInfo).filter(AdmissionInfo.university_id == uni.id).first()
-        admission_response = None
-        if admission:
-            # Парсим JSON поля перед валидацией
-            admission_dict = {
-                'id': admission.id,
-                'university_id': admission.university_id,
-                'deadline_date': admission.deadline_date,
-                'requirements_text': admission.requirements_text,
-                'requirements': parse_json_field(admission.requirements) if admission.requirements else None,
-                'deadlines': parse_json_field(admission.deadlines) if admission.deadlines else None,
-                'scholarships': parse_json_field(admission.scholarships) if admission.scholarships else None,
-                'procedure': admission.procedure,
-            }
-            admission_response = AdmissionInfoResponse.model_validate(admission_dict)
-        
-        # Создаем ответ с правильной обработкой JSON полей
-        uni_dict = {
-            **{k: v for k, v in uni.__dict__.items() if not k.startswith('_')},
-            'programs': program_responses if program_responses else None,
-            'admission_info': admission_response
-        }
-        result.append(UniversityResponse.model_validate(uni_dict))
-    return result
-
-@router.get('/get/{university_id}', status_code=status.HTTP_200_OK, tags=['Universities'], response_model=UniversityResponse)
-async def read_university(db: db_dependency, university_id: int = Path(gt=0)):
-    university_model = db.query(University).filter(University.id == university_id).first()
-    if university_model is None:
-        raise HTTPException(status_code=404, detail='university not found')
-    
-    # Получаем программы
-    programs = db.query(Program).filter(Program.university_id == university_id).all()
-    program_responses = [ProgramResponse.model_validate(p) for p in programs]
-    
-    # Получаем admission info
-    admission = db.query(AdmissionInfo).filter(AdmissionInfo.university_id == university_id).first()
-    admission_response = None
-    if admission:
-        # Парсим JSON поля перед валидацией
-        admission_dict = {
-            'id': admission.id,
-            'university_id': admission.university_id,
-            'deadline_date': admission.deadline_date,
-            'requirements_text': admission.requirements_text,
-            'requirements': parse_json_field(admission.requirements) if admission.requirements else None,
-            'deadlines': parse_json_field(admission.deadlines) if admission.deadlines else None,
-            'scholarships': parse_json_field(admission.scholarships) if admission.scholarships else None,
-            'procedure': admission.procedure,
-        }
-        admission_response = AdmissionInfoResponse.model_validate(admission_dict)
-    
-    # Создаем ответ с правильной обработкой JSON полей
+def build_university_response(uni: University) -> UniversityResponse:
+    # programs и admission_info должны быть загружены заранее (см. catalog_select)
+    program_responses = [ProgramResponse.model_validate(p) for p in uni.programs]
     uni_dict = {
-        **{k: v for k, v in university_model.__dict__.items() if not k.startswith('_')},
+        **{k: v for k, v in uni.__dict__.items() if not k.startswith('_')},
         'programs': program_responses if program_responses else None,
-        'admission_info': admission_response
+        'admission_info': build_admission_response(uni.admission_info)
     }
     return UniversityResponse.model_validate(uni_dict)
 
-@router.get('/programs', status_code=status.HTTP_200_OK, tags=['Programs'], response_model=List[ProgramResponse])
-async def read_programs(db: db_dependency):
-    programs = db.query(Program).all()
+def catalog_changed(db: Session, universities: list[int] | None = None, programs: list[int] | None = None):
+    # Вызывается после коммита изменений университетов, программ и admission info.
+    # universities/programs — измененные id для индекса похожих; None — неизвестно что (массовый импорт)
+    previous_version = get_catalog_version()
+    version = bump_catalog_version()
+    ai_cache.invalidate()
+    rebuild_advisor_context(db, version)
+    update_similar_index(db, previous_version, version, universities, programs)
+
+def snapshot_response(response: Response, content: bytes, encoding: str = 'identity') -> Response:
+    # Заголовки кэширования из catalog_cache_headers переносим в готовый ответ
+    headers = dict(response.headers)  # ключи в нижнем регистре
+    if encoding != 'identity':
+        headers['content-encoding'] = encoding
+        headers['etag'] = f'{headers["etag"][:-1]}-{encoding}"'
+    headers['vary'] = 'Accept-Encoding'
+    return Response(content, media_type='application/json', headers=headers)
+
+def wants_ndjson(request: Request, stream: bool) -> bool:
+    return stream or 'application/x-ndjson' in request.headers.get('accept', '')
+
+def ndjson_response(response: Response, query, serialize) -> StreamingResponse:
+    # Строки читаются из курсора пачками, память не зависит от размера таблицы
+    async def rows():
+        # Своя сессия: тело ответа отдается уже после выхода из хендлера
+        async with AsyncSessionLocal() as db:
+            result = await db.stream_scalars(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+            async for partition in result.partitions():
+                yield ''.join(f'{serialize(row)}\n' for row in partition)
+
+    headers = dict(response.headers)  # ключи в нижнем регистре
+    headers['etag'] = f'{headers["etag"][:-1]}-ndjson"'
+    headers['vary'] = 'Accept'
+    return StreamingResponse(rows(), media_type='application/x-ndjson', headers=headers)
+
+def catalog_select():
+    # Фиксированное число запросов (3) вне зависимости от размера каталога
+    return select(University).options(
+        selectinload(University.programs),
+        selectinload(University.admissions),
+    )
+
+SORT_COLUMNS = {
+    'id': University.id,
+    'name': University.name,
+    'price': University.price,
+    'rating': University.rating,
+    'min_ent_score': University.min_ent_score,
+}
+
+def apply_university_filters(query, filters: UniversityFilterParams):
+    if filters.city:
+        query = query.filter(University.city == filters.city)
+    if filters.has_dormitory is not None:
+        query = query.filter(University.has_dormitory == filters.has_dormitory)
+    if filters.price_min is not None:
+        query = query.filter(University.price >= filters.price_min)
+    if filters.price_max is not None:
+        query = query.filter(University.price <= filters.price_max)
+    if filters.language:
+        query = query.filter(University.languages_folded.contains(fold(filters.language), autoescape=True))
+    if filters.min_ent_score is not None:
+        query = query.filter(University.min_ent_score <= filters.min_ent_score)
+    if filters.degree:
+        query = query.filter(University.programs.any(Program.degree == filters.degree))
+    if filters.search:
+        query = query.filter(University.name_folded.contains(fold(filters.search), autoescape=True))
+    return query
+
+def encode_cursor(value, last_id: int) -> str:
+    if isinstance(value, Decimal):
+        value = float(value)
+    raw = json.dumps([value, last_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor: str):
+    # Курсор приходит от клиента: только [значение колонки сортировки или null, id], иначе SQLAlchemy не свяжет параметр
+    try:
+        value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail='invalid cursor')
+    scalar = value is None or (isinstance(value, (str, int, float)) and not isinstance(value, bool))
+    if not scalar or not isinstance(last_id, int) or isinstance(last_id, bool):
+        raise HTTPException(status_code=400, detail='invalid cursor')
+    return value, last_id
+
+def apply_keyset(query, filters: UniversityFilterParams):
+    column = SORT_COLUMNS[filters.sort]
+    descending = filters.order == 'desc'
+    if filters.cursor:
+        value, last_id = decode_cursor(filters.cursor)
+        # SQLite сортирует NULL первыми при ASC и последними при DESC
+        if filters.sort == 'id':
+            condition = University.id < last_id if descending else University.id > last_id
+        elif value is None:
+            tie = and_(column.is_(None), University.id < last_id if descending else University.id > last_id)
+            condition = or_(tie, column.isnot(None)) if not descending else tie
+        elif descending:
+            condition = or_(column < value, and_(column == value, University.id < last_id), column.is_(None))
+        else:
+            condition = or_(column > value, and_(column == value, University.id > last_id))
+        query = query.filter(condition)
+    if filters.sort == 'id':
+        return query.order_by(University.id.desc() if descending else University.id)
+    if descending:
+        return query.order_by(column.desc(), University.id.desc())
+    return query.order_by(column, University.id)
+
+UNIVERSITY_RELATIONS = ('programs', 'admission_info')
+
+def projection_fields(view: str, fields: str | None) -> tuple[str, ...] | None:
+    """Поля университета для ?fields= или ?view=summary; None — полный UniversityResponse."""
+    if fields:
+        names = {name.strip() for name in fields.split(',') if name.strip()}
+        unknown = names - UniversityResponse.model_fields.keys()
+        if unknown:
+            raise HTTPException(status_code=400, detail=f'unknown fields: {", ".join(sorted(unknown))}')
+        names.add('id')
+        # Порядок полей в ответе — как в UniversityResponse
+        return tuple(name for name in UniversityResponse.model_fields if name in names)
+    if view == 'summary':
+        return tuple(UniversitySummaryResponse.model_fields)
+    return None
+
+@lru_cache(maxsize=128)
+def projection_model(fields: tuple[str, ...]) -> type[BaseModel]:
+    if fields == tuple(UniversitySummaryResponse.model_fields):
+        return UniversitySummaryResponse
+    # Типы и значения по умолчанию берутся из UniversityResponse, сериализация та же
+    return create_model('UniversityProjection', **{
+        name: (UniversityResponse.model_fields[name].annotation, UniversityResponse.model_fields[name])
+        for name in fields
+    })
+
+async def load_relations(db: AsyncSession, items: list[dict], fields: tuple[str, ...]):
+    # Программы и admission info одним запросом на пачку id, как selectinload в catalog_select
+    ids = [item['id'] for item in items]
+    programs, admissions = {}, {}
+    for start in range(0, len(ids), RELATION_BATCH_SIZE):
+        batch = ids[start:start + RELATION_BATCH_SIZE]
+        if 'programs' in fields:
+            query = select(Program).where(Program.university_id.in_(batch)).order_by(Program.id)
+            for program in (await db.scalars(query)).all():
+                programs.setdefault(program.university_id, []).append(ProgramResponse.model_validate(program))
+        if 'admission_info' in fields:
+            query = select(AdmissionInfo).where(AdmissionInfo.university_id.in_(batch)).order_by(AdmissionInfo.id)
+            for admission in (await db.scalars(query)).all():
+                admissions.setdefault(admission.university_id, build_admission_response(admission))
+    for item in items:
+        if 'programs' in fields:
+            item['programs'] = programs.get(item['id'])
+        if 'admission_info' in fields:
+            item['admission_info'] = admissions.get(item['id'])
+
+async def read_projection(db: AsyncSession, response: Response, filters: UniversityFilterParams, fields: tuple[str, ...]) -> Response:
+    # SELECT только запрошенных колонок (и колонки сортировки для курсора), без загрузки связанных строк
+    columns = dict.fromkeys(['id', *(name for name in fields if name not in UNIVERSITY_RELATIONS), filters.sort])
+    query = apply_keyset(apply_university_filters(select(*(getattr(University, name) for name in columns)), filters), filters)
+    if filters.limit is None:
+        rows = (await db.execute(query)).all()
+    else:
+        rows = (await db.execute(query.limit(filters.limit + 1))).all()
+        if len(rows) > filters.limit:
+            rows = rows[:filters.limit]
+            response.headers['X-Next-Cursor'] = encode_cursor(getattr(rows[-1], filters.sort), rows[-1].id)
+    items = [dict(row._mapping) for row in rows]
+    if any(name in fields for name in UNIVERSITY_RELATIONS):
+        await load_relations(db, items, fields)
+    model = projection_model(fields)
+    return snapshot_response(response, orjson.dumps([model.model_validate(item).model_dump(mode='json') for item in items]))
+
+#get requests
+@router.get('/', status_code=status.HTTP_200_OK, tags=['Universities'], response_model=List[UniversityResponse], dependencies=catalog_cache)
+async def read_universities(db: async_db_dependency, request: Request, response: Response, filters: Annotated[UniversityListParams, Query()]):
+    """
+    Каталог университетов с фильтрами и сортировкой.
+    При указании limit следующая страница доступна по курсору из заголовка X-Next-Cursor.
+    view=summary отдает карточки для списка (UniversitySummaryResponse), fields=id,name,city — только
+    перечисленные поля; programs и admission_info загружаются, только если перечислены в fields.
+    """
+    if filters in (UniversityListParams(), UniversityListParams(view='summary')):
+        # Полный каталог без фильтров отдается из заранее сериализованного и сжатого снимка
+        snapshot = await get_catalog_snapshot(db, catalog_select, build_university_response)
+        encoding = choose_encoding(request.headers.get('accept-encoding'))
+        body = snapshot.summary if filters.view == 'summary' else snapshot.body
+        return snapshot_response(response, body[encoding], encoding)
+    projection = projection_fields(filters.view, filters.fields)
+    if projection is not None:
+        return await read_projection(db, response, filters, projection)
+    query = apply_keyset(apply_university_filters(catalog_select(), filters), filters)
+    if filters.limit is None:
+        universities = (await db.scalars(query)).all()
+    else:
+        universities = (await db.scalars(query.limit(filters.limit + 1))).all()
+        if len(universities) > filters.limit:
+            universities = universities[:filters.limit]
+            last = universities[-1]
+            response.headers['X-Next-Cursor'] = encode_cursor(getattr(last, filters.sort), last.id)
+    return build_responses(universities, build_university_response)
+
+@router.get('/facets', status_code=status.HTTP_200_OK, tags=['Universities'], dependencies=catalog_cache)
+async def read_facets(db: async_db_dependency, filters: Annotated[UniversityFilterParams, Query()]):
+    """
+    Фасеты для панели фильтров при тех же параметрах, что GET /api/: города, языки, степени и флаги
+    со счетчиками, гистограммы цены и проходного балла. Считаются по индексу в памяти,
+    который пересобирается при изменении каталога; сами университеты не загружаются.
+    """
+    return compute_facets(await get_facet_index(db), filters)
+
+def parse_ids(ids: str) -> UniversityBatchRequest:
+    try:
+        return UniversityBatchRequest(ids=[int(value) for value in ids.split(',') if value.strip()])
+    except (ValueError, ValidationError):
+        raise HTTPException(status_code=400, detail='ids must be 1-500 comma-separated integers')
+
+async def read_university_batch(db: AsyncSession, response: Response, ids: list[int]) -> Response:
+    # Из того же снимка, что GET /api/get/{id}: без запросов к базе, пока каталог не изменился
+    snapshot = await get_catalog_snapshot(db, catalog_select, build_university_response)
+    ids = list(dict.fromkeys(ids))  # порядок запроса, без повторов
+    items = [snapshot.universities[university_id] for university_id in ids if university_id in snapshot.universities]
+    missing = [university_id for university_id in ids if university_id not in snapshot.universities]
+    return snapshot_response(response, b'{"items":[' + b','.join(items) + b'],"missing":' + orjson.dumps(missing) + b'}')
+
+@router.get('/get', status_code=status.HTTP_200_OK, tags=['Universities'], response_model=UniversityBatchResponse, dependencies=catalog_cache)
+async def read_universities_batch(db: async_db_dependency, response: Response, ids: str):
+    """Несколько университетов по id (сравнение, избранное) в порядке запроса; отсутствующие id — в missing."""
+    return await read_university_batch(db, response, parse_ids(ids).ids)
+
+@router.post('/get', status_code=status.HTTP_200_OK, tags=['Universities'], response_model=UniversityBatchResponse)
+async def read_universities_batch_post(db: async_db_dependency, response: Response, batch_request: UniversityBatchRequest):
+    # Для длинных списков id, которые не помещаются в URL
+    return await read_university_batch(db, response, batch_request.ids)
+
+@router.get('/get/{university_id}', status_code=status.HTTP_200_OK, tags=['Universities'], response_model=UniversityResponse, dependencies=catalog_cache)
+async def read_university(db: async_db_dependency, response: Response, university_id: int = Path(gt=0)):
+    snapshot = await get_catalog_snapshot(db, catalog_select, build_university_response)
+    content = snapshot.universities.get(university_id)
+    if content is None:
+        raise HTTPException(status_code=404, detail='university not found')
+    return snapshot_response(response, content)
+
+@router.get('/get/{university_id}/similar', status_code=status.HTTP_200_OK, tags=['Universities'], response_model=SimilarResponse, response_model_exclude_none=True, dependencies=catalog_cache)
+async def read_similar_universities(db: async_db_dependency, university_id: int = Path(gt=0), limit: int = Query(default=10, gt=0, le=50)):
+    """Похожие университеты по тексту (описание, миссия, программы), цене, проходному баллу и рейтингу — без модели."""
+    items = similar_items((await get_similar_index(db)).universities, university_id, limit)
+    if items is None:
+        raise HTTPException(status_code=404, detail='university not found')
+    return {'id': university_id, 'items': items}
+
+@router.get('/programs', status_code=status.HTTP_200_OK, tags=['Programs'], response_model=List[ProgramResponse], dependencies=catalog_cache)
+async def read_programs(db: async_db_dependency, request: Request, response: Response, stream: bool = False):
+    """Список программ; с ?stream=1 или Accept: application/x-ndjson — потоково, по строке JSON на программу."""
+    query = select(Program).order_by(Program.id)
+    if wants_ndjson(request, stream):
+        return ndjson_response(response, query, lambda p: ProgramResponse.model_validate(p).model_dump_json())
+    response.headers['Vary'] = 'Accept'
+    programs = (await db.scalars(query)).all()
     return [ProgramResponse.model_validate(p) for p in programs]
 
 @router.get('/programs/get/{program_id}', status_code=status.HTTP_200_OK, tags=['Programs'])
@@ -118,9 +379,22 @@ async def read_program(db: db_dependency, program_id: int = Path(gt=0)):
         return program_model
     raise HTTPException(status_code=404, detail='programs not found')
 
-@router.get('/admissions', status_code=status.HTTP_200_OK, tags=['Admissions'])
-async def read_admissions(db: db_dependency):
-    return db.query(AdmissionInfo).all()
+@router.get('/programs/get/{program_id}/similar', status_code=status.HTTP_200_OK, tags=['Programs'], response_model=SimilarResponse, dependencies=catalog_cache)
+async def read_similar_programs(db: async_db_dependency, program_id: int = Path(gt=0), limit: int = Query(default=10, gt=0, le=50)):
+    """Похожие программы по названию и описанию, цене, проходному баллу и трудоустройству."""
+    items = similar_items((await get_similar_index(db)).programs, program_id, limit, with_university=True)
+    if items is None:
+        raise HTTPException(status_code=404, detail='program not found')
+    return {'id': program_id, 'items': items}
+
+@router.get('/admissions', status_code=status.HTTP_200_OK, tags=['Admissions'], dependencies=catalog_cache)
+async def read_admissions(db: async_db_dependency, request: Request, response: Response, stream: bool = False):
+    """Список admission info; потоковый режим NDJSON — как у GET /api/programs."""
+    query = select(AdmissionInfo).order_by(AdmissionInfo.id)
+    if wants_ndjson(request, stream):
+        return ndjson_response(response, query, lambda a: AdmissionInfoResponse.model_validate(a).model_dump_json())
+    response.headers['Vary'] = 'Accept'
+    return (await db.scalars(query)).all()
 
 @router.get('/admissions/get/{admission_id}', status_code=status.HTTP_200_OK, tags=['Admissions'])
 async def read_admission(db: db_dependency, admission_id: int = Path(gt=0)):
@@ -136,18 +410,21 @@ async def create_university(db: db_dependency, university_request: UniversityReq
     university_model = University(**university_request.model_dump())
     db.add(university_model)
     db.commit()
+    catalog_changed(db, universities=[university_model.id], programs=[])
 
 @router.post('/programs', status_code=status.HTTP_201_CREATED, tags=['Programs'])
 async def create_program(db: db_dependency, program_request: ProgramRequest):
     program_model = Program(**program_request.model_dump())
     db.add(program_model)
     db.commit()
+    catalog_changed(db, universities=[], programs=[program_model.id])
 
 @router.post('/admission', status_code=status.HTTP_201_CREATED, tags=['Admissions'])
 async def create_admission(db: db_dependency, admission_request: AdmissionInfoRequest):
     admission_model = AdmissionInfo(**admission_request.model_dump())
     db.add(admission_model)
     db.commit()
+    catalog_changed(db, universities=[], programs=[])
 
 #put requests
 @router.put('/get/{university_id}', status_code=status.HTTP_204_NO_CONTENT, tags=['Universities'])
@@ -184,6 +461,7 @@ async def update_university(db: db_dependency, university_request: UniversityReq
 
     db.add(university_model)
     db.commit()
+    catalog_changed(db, universities=[university_id], programs=[])
 
 @router.put('/programs/get/{program_id}', status_code=status.HTTP_204_NO_CONTENT, tags=['Programs'])
 async def update_program(db: db_dependency, program_request: ProgramRequest, program_id: int = Path(gt=0)):
@@ -203,6 +481,7 @@ async def update_program(db: db_dependency, program_request: ProgramRequest, pro
 
     db.add(program_model)
     db.commit()
+    catalog_changed(db, universities=[], programs=[program_id])
 
 @router.put('/admissions/get/{admission_id}', status_code=status.HTTP_204_NO_CONTENT, tags=['Admissions'])
 async def update_admission(db: db_dependency, admission_request: AdmissionInfoRequest, admission_id: int = Path(gt=0)):
@@ -220,6 +499,7 @@ async def update_admission(db: db_dependency, admission_request: AdmissionInfoRe
 
     db.add(admission_model)
     db.commit()
+    catalog_changed(db, universities=[], programs=[])
 
 #delete requests
 @router.delete('/{university_id}', status_code=status.HTTP_204_NO_CONTENT, tags=['Universities'])
@@ -229,6 +509,7 @@ async def delete_university(db: db_dependency, university_id: int = Path(gt=0)):
         raise HTTPException(status_code=404, detail='university not found')
     db.query(University).filter(University.id == university_id).delete()
     db.commit()
+    catalog_changed(db, universities=[university_id], programs=[])
 
 @router.delete('/programs/get/{program_id}', status_code=status.HTTP_204_NO_CONTENT, tags=['Programs'])
 async def delete_program(db: db_dependency, program_id: int = Path(gt=0)):
@@ -237,6 +518,7 @@ async def delete_program(db: db_dependency, program_id: int = Path(gt=0)):
         raise HTTPException(status_code=404, detail='university not found')
     db.query(Program).filter(Program.id == program_id).delete()
     db.commit()
+    catalog_changed(db, universities=[], programs=[program_id])
 
 @router.delete('/admissions/get/{admission_id}', status_code=status.HTTP_204_NO_CONTENT, tags=['Admissions'])
 async def delete_admission(db: db_dependency, admission_id: int = Path(gt=0)):
@@ -245,35 +527,62 @@ async def delete_admission(db: db_dependency, admission_id: int = Path(gt=0)):
         raise HTTPException(status_code=404, detail='university not found')
     db.query(AdmissionInfo).filter(AdmissionInfo.id == admission_id).delete()
     db.commit()
+    catalog_changed(db, universities=[], programs=[])
 
 
 #ai
+@router.get('/ai/cache/stats', tags=['Ai'])
+async def ai_cache_stats():
+    return ai_cache.stats()
+
 @router.post('/ai', tags=['Ai'])
 async def request_ai(ai_request: AIRequest):
     data = ai_request.model_dump()
     prompt = f"{data['template']}\n{data['text']}"
-    response = requestAI(prompt)
+    response = await requestAICached(prompt)
     return response
 
-@router.post('/advisor/recommend', tags=['Advisor'])
-async def advisor_recommend(advisor_request: AdvisorRequest, db: db_dependency):
+@router.post('/ai/jobs', status_code=status.HTTP_202_ACCEPTED, tags=['Ai'])
+async def submit_ai_job(ai_request: AIRequest, response: Response):
     """
-    Рекомендация университета на основе данных абитуриента.
-    Возвращает название университета и краткое обоснование.
+    Тот же запрос, что POST /api/ai, но без удержания соединения: возвращает id задания,
+    результат — через GET /api/ai/jobs/{job_id}. Одинаковые промпты в работе объединяются.
     """
-    # Получаем список доступных университетов из базы данных
-    universities = db.query(University).all()
-    
-    # Формируем список доступных университетов для промпта
-    available_universities = []
-    for uni in universities:
-        # Получаем программы для описания специализаций
-        programs = db.query(Program).filter(Program.university_id == uni.id).limit(3).all()
-        specializations = ", ".join([p.name for p in programs[:3]]) if programs else "различные направления"
-        available_universities.append(f"- {uni.name} ({uni.city}) - {specializations}")
-    
-    universities_list = "\n".join(available_universities) if available_universities else "- KIMEP University (Алматы) - бизнес, экономика"
-    
+    data = ai_request.model_dump()
+    job = await submitAIJob(f"{data['template']}\n{data['text']}")
+    response.headers['Location'] = f'/api/ai/jobs/{job.id}'
+    return job.as_dict()
+
+@router.get('/ai/jobs/{job_id}', tags=['Ai'])
+async def read_ai_job(job_id: str):
+    # Задание могло быть принято другим воркером: тогда состояние берется из общего хранилища
+    job = await llm_queue.lookup(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail='job not found')
+    return job
+
+@router.get('/ai/queue/stats', tags=['Ai'])
+async def ai_queue_stats():
+    return llm_queue.stats()
+
+@router.post('/ai/stream', tags=['Ai'])
+async def request_ai_stream(ai_request: AIRequest):
+    """То же, что POST /api/ai, но ответ приходит потоком SSE: события token, затем done (или error)."""
+    data = ai_request.model_dump()
+    prompt = f"{data['template']}\n{data['text']}"
+
+    async def events():
+        try:
+            async for delta in streamAICached(prompt):
+                yield sse_event('token', {'text': delta})
+        except Exception as e:
+            yield sse_event('error', {'detail': str(e)})
+            return
+        yield sse_event('done', {})
+
+    return StreamingResponse(events(), media_type='text/event-stream', headers=SSE_HEADERS)
+
+def build_advisor_prompt(advisor_request: AdvisorRequest, universities_list: str) -> str:
     # Формируем промпт для ИИ
     template = f"""Ты - ИИ-советник по выбору университета в Казахстане. 
 Проанализируй данные абитуриента и порекомендуй подходящий университет.
@@ -308,13 +617,19 @@ async def advisor_recommend(advisor_request: AdvisorRequest, db: db_dependency):
 
 Рекомендуй наиболее подходящий университет ИЗ СПИСКА ВЫШЕ и обоснуй выбор."""
 
-    prompt = f"{template}\n\n{text}"
-    
-    import json
-    
+    return f"{template}\n\n{text}"
+
+def advisor_fallback(shortlisted: list, reason: str) -> dict:
+    # Лучший результат локального ранжирования вместо "первого попавшегося"
+    return {
+        "university_name": shortlisted[0].name if shortlisted else "KIMEP University",
+        "short_reason": reason,
+    }
+
+def parse_advisor_response(ai_response: str, shortlisted: list) -> dict:
+    """Разбор JSON-ответа модели с проверкой, что университет из shortlist."""
+    best_university = shortlisted[0] if shortlisted else None
     try:
-        ai_response = requestAI(prompt)
-        
         # Парсим JSON ответ от ИИ
         # Убираем возможные markdown код блоки
         cleaned_response = ai_response.strip()
@@ -328,73 +643,167 @@ async def advisor_recommend(advisor_request: AdvisorRequest, db: db_dependency):
         
         result = json.loads(cleaned_response)
         
-        # Проверяем, что рекомендованный университет есть в базе
+        # Проверяем, что рекомендованный университет есть в списке
         recommended_name = result.get("university_name", "")
-        university_found = any(uni.name == recommended_name for uni in universities)
+        university_found = any(uni.name == recommended_name for uni in shortlisted)
         
-        if not university_found:
-            # Если ИИ рекомендовал университет, которого нет в базе, выбираем наиболее подходящий
-            # Ищем по городу или берем первый доступный
-            preferred_city = advisor_request.preferred_city.lower() if advisor_request.preferred_city else ""
-            matching_university = None
-            
-            if preferred_city:
-                matching_university = next(
-                    (uni for uni in universities if preferred_city in uni.city.lower() or uni.city.lower() in preferred_city),
-                    None
-                )
-            
-            if not matching_university and universities:
-                matching_university = universities[0]
-            
-            if matching_university:
-                result["university_name"] = matching_university.name
-                result["short_reason"] = f"Рекомендуем {matching_university.name} на основе ваших данных. " + (result.get("short_reason", "")[:150] if result.get("short_reason") else "")
+        if not university_found and best_university:
+            # Если ИИ рекомендовал университет не из списка, берем лучший по ранжированию
+            result["university_name"] = best_university.name
+            result["short_reason"] = f"Рекомендуем {best_university.name} на основе ваших данных. " + (result.get("short_reason", "")[:150] if result.get("short_reason") else "")
         
         # Проверяем наличие нужных полей
         if "university_name" not in result or "short_reason" not in result:
-            # Если ИИ вернул неполный ответ, выбираем первый доступный университет
-            fallback_uni = universities[0] if universities else None
-            return {
-                "university_name": fallback_uni.name if fallback_uni else "KIMEP University",
-                "short_reason": ai_response[:200] if len(ai_response) > 200 else ai_response
-            }
+            # Если ИИ вернул неполный ответ, берем лучший по ранжированию
+            return advisor_fallback(shortlisted, ai_response[:200] if len(ai_response) > 200 else ai_response)
         
         return result
     except json.JSONDecodeError:
-        # Если не удалось распарсить JSON, выбираем университет по городу или первый доступный
-        preferred_city = advisor_request.preferred_city.lower() if advisor_request.preferred_city else ""
-        matching_university = None
-        
-        if preferred_city and universities:
-            matching_university = next(
-                (uni for uni in universities if preferred_city in uni.city.lower() or uni.city.lower() in preferred_city),
-                None
-            )
-        
-        if not matching_university and universities:
-            matching_university = universities[0]
-        
-        return {
-            "university_name": matching_university.name if matching_university else "KIMEP University",
-            "short_reason": ai_response[:200] if len(ai_response) > 200 else ai_response
-        }
+        # Если не удалось распарсить JSON, берем лучший по ранжированию
+        return advisor_fallback(shortlisted, ai_response[:200] if len(ai_response) > 200 else ai_response)
+
+def advisor_timeout_reason(shortlist) -> str:
+    programs = ", ".join(shortlist[0].programs) if shortlist and shortlist[0].programs else ""
+    return (
+        "Университет подобран по баллу ЕНТ, городу и совпадению интересов с направлениями подготовки."
+        + (f" Подходящие программы: {programs}." if programs else "")
+    )
+
+@router.post('/advisor/recommend', tags=['Advisor'])
+async def advisor_recommend(advisor_request: AdvisorRequest, db: db_dependency):
+    """
+    Рекомендация университета на основе данных абитуриента.
+    Возвращает название университета и краткое обоснование.
+    """
+    # Признаки каталога собираются заранее и пересобираются только при изменении каталога
+    context = get_advisor_context(db)
+    # Локальное ранжирование: в промпт попадает только shortlist, а не весь каталог
+    shortlist = context.index.rank(advisor_request, ADVISOR_TOP_K)
+    shortlisted = [context.universities[item.position] for item in shortlist]
+    prompt = build_advisor_prompt(advisor_request, format_shortlist(context, shortlist))
+    
+    try:
+        ai_response = await asyncio.wait_for(requestAICached(prompt, version=context.version), ADVISOR_LLM_TIMEOUT)
+        return parse_advisor_response(ai_response, shortlisted)
+    except asyncio.TimeoutError:
+        return advisor_fallback(shortlisted, advisor_timeout_reason(shortlist))
     except Exception as e:
-        # В случае ошибки выбираем университет по городу или первый доступный
-        preferred_city = advisor_request.preferred_city.lower() if advisor_request.preferred_city else ""
-        matching_university = None
-        
-        if preferred_city and universities:
-            matching_university = next(
-                (uni for uni in universities if preferred_city in uni.city.lower() or uni.city.lower() in preferred_city),
-                None
-            )
-        
-        if not matching_university and universities:
-            matching_university = universities[0]
-        
-        return {
-            "university_name": matching_university.name if matching_university else "KIMEP University",
-            "short_reason": f"Рекомендуем этот университет на основе ваших данных. Ошибка обработки: {str(e)}"
-        }
+        # В случае ошибки берем лучший по ранжированию
+        return advisor_fallback(shortlisted, f"Рекомендуем этот университет на основе ваших данных. Ошибка обработки: {str(e)}")
 
+@router.post('/advisor/recommend/stream', tags=['Advisor'])
+async def advisor_recommend_stream(advisor_request: AdvisorRequest, db: db_dependency):
+    """
+    Потоковый вариант POST /api/advisor/recommend (SSE).
+    university — как только название в ответе модели дописано (уже проверенное по shortlist),
+    reason — фрагменты обоснования, done — итоговый результат в формате обычного эндпоинта.
+    """
+    context = get_advisor_context(db)
+    shortlist = context.index.rank(advisor_request, ADVISOR_TOP_K)
+    shortlisted = [context.universities[item.position] for item in shortlist]
+    prompt = build_advisor_prompt(advisor_request, format_shortlist(context, shortlist))
+
+    async def events():
+        parser = JSONStringFields(['university_name', 'short_reason'])
+        try:
+            async for delta in with_deadline(streamAICached(prompt, version=context.version), ADVISOR_LLM_TIMEOUT):
+                for field, text, complete in parser.feed(delta):
+                    if field == 'university_name' and complete:
+                        name = parser.values[field]
+                        if shortlisted and not any(uni.name == name for uni in shortlisted):
+                            name = shortlisted[0].name
+                        yield sse_event('university', {'university_name': name})
+                    elif field == 'short_reason' and text:
+                        yield sse_event('reason', {'text': text})
+            result = parse_advisor_response(parser.text, shortlisted)
+        except TimeoutError:
+            result = advisor_fallback(shortlisted, advisor_timeout_reason(shortlist))
+        except Exception as e:
+            result = advisor_fallback(shortlisted, f"Рекомендуем этот университет на основе ваших данных. Ошибка обработки: {str(e)}")
+        yield sse_event('done', result)
+
+    return StreamingResponse(events(), media_type='text/event-stream', headers=SSE_HEADERS)
+
+async def narrative(prompt: str, default: str) -> str:
+    # Промпт строится только из входа и расчетов, поэтому кэш ИИ работает по входным данным
+    try:
+        return (await asyncio.wait_for(requestAICached(prompt), AI_NARRATIVE_TIMEOUT)).strip() or default
+    except Exception:
+        return default
+
+@router.post('/ai/compare', response_model=CompareResponse, tags=['Ai'])
+async def ai_compare(compare_request: CompareRequest, db: async_db_dependency):
+    """
+    Сравнение выбранных университетов: числовые показатели бок о бок считаются локально
+    (один запрос с агрегатами программ), модель пишет только пояснение по сводке.
+    """
+    ids = list(dict.fromkeys(item.id for item in compare_request.universities))
+    stats = (
+        select(
+            Program.university_id,
+            func.count(Program.id).label('programs'),
+            func.avg(Program.employment).label('avg_employment'),
+        )
+        .group_by(Program.university_id)
+        .subquery()
+    )
+    query = (
+        select(University, func.coalesce(stats.c.programs, 0), stats.c.avg_employment)
+        .outerjoin(stats, stats.c.university_id == University.id)
+        .where(University.id.in_(ids))
+    )
+    rows = {row[0].id: tuple(row) for row in (await db.execute(query)).all()}
+    missing = [id for id in ids if id not in rows]
+    if missing:
+        raise HTTPException(status_code=404, detail=f'universities not found: {missing}')
+
+    comparison = compare_universities([rows[id] for id in ids], compare_request.userGoal)
+    summary = format_comparison(comparison)
+    labels = [metric.label.lower() for metric in COMPARE_METRICS if metric.key in comparison['boosted']]
+    reasoning = (
+        f"{comparison['winner']} лучше остальных по сумме нормированных показателей"
+        + (f" с повышенным весом: {', '.join(labels)}" if labels else "")
+        + f". Цель абитуриента: \"{compare_request.userGoal}\"."
+    )
+    prompt = f"""Ты - ИИ-советник по выбору университета в Казахстане.
+Сравни университеты по сводке показателей и цели абитуриента. Рекомендуемый вариант по расчету: {comparison['winner']}.
+Напиши короткий анализ (markdown, 3-5 предложений), опираясь только на эти данные.
+
+Показатели:
+{summary}
+
+Цель абитуриента: {compare_request.userGoal}"""
+
+    analysis = await narrative(prompt, f"## Сравнение университетов\n\n{summary}")
+    return {
+        "winner": comparison['winner'],
+        "winner_id": comparison['winner_id'],
+        "analysis": analysis,
+        "reasoning": reasoning,
+        "comparison": comparison,
+    }
+
+@router.post('/ai/analyze-chance', response_model=ChanceAnalysisResponse, tags=['Ai'])
+async def ai_analyze_chance(chance_request: ChanceAnalysisRequest, db: async_db_dependency):
+    """
+    Оценка шансов поступления: запас баллов ЕНТ над проходным баллом университета и подходящей программы,
+    число грантов и требование IELTS считаются локально; модель пишет только пояснение.
+    """
+    query = select(University).options(selectinload(University.programs)).where(University.id == chance_request.universityId)
+    university = await db.scalar(query)
+    if university is None:
+        raise HTTPException(status_code=404, detail='university not found')
+
+    features = analyze_chance(university, chance_request.userScore, chance_request.subject, chance_request.ielts)
+    summary = format_chance(features)
+    prompt = f"""Ты - ИИ-советник по поступлению в университеты Казахстана.
+Объясни абитуриенту его шансы на поступление в {features.university} по направлению "{chance_request.subject}"
+и дай 1-2 практических совета. Оценка шансов уже рассчитана, не меняй ее. 3-4 предложения, без markdown.
+
+{summary}"""
+
+    return {
+        "chance": features.chance,
+        "message": await narrative(prompt, summary),
+        "features": features._asdict(),
+    }
@@ -0,0 +1,288 @@
+"""
+Похожие университеты и программы без обращения к модели: TF-IDF по хешированным токенам текста
+(название, описание, миссия, названия программ) плюс близость числовых признаков.
+Индекс обновляется по строкам при записи через API и сохраняется на диск, поэтому
+воркеры с той же версией каталога загружают его, а не строят заново.
+"""
+from typing import Iterable
+import asyncio
+import os
+import zlib
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from catalog import get_catalog_version
+from models import University, Program
+from ranking import tokenize
+
+# Файл индекса рядом с БД; версия каталога хранится внутри
+SIMILAR_INDEX_PATH = os.getenv("SIMILAR_INDEX_PATH", "./similar_index.npz")
+# Вес текстовой близости; остальное — близость цены, проходного балла, рейтинга/трудоустройства
+SIMILAR_TEXT_WEIGHT = float(os.getenv("SIMILAR_TEXT_WEIGHT", "0.8"))
+
+UNIVERSITY_NUMERIC = ("price", "min_ent_score", "rating")
+PROGRAM_NUMERIC = ("price", "min_ent_score", "employment")
+
+
+def hash_terms(text: str) -> np.ndarray:
+    # crc32, а не hash(): номера признаков должны совпадать между процессами и после загрузки с диска
+    return np.unique(np.array([zlib.crc32(token.encode()) for token in tokenize(text)], dtype=np.uint32))
+
+def known_number(value) -> float:
+    # 0 в каталоге означает отсутствие данных (как в insights.known_score)
+    return float(value) if value else np.nan
+
+
+class TermIndex:
+    """
+    Строки одного вида (университеты или программы): хешированные токены и числовые признаки.
+    Постинги, IDF и нормы строк пересчитываются лениво после изменений.
+    """
+
+    def __init__(self, ids: list[int], names: list[str], owners: list[int], terms: list[np.ndarray], numeric: np.ndarray):
+        self.ids = list(ids)
+        self.names = list(names)
+        self.owners = list(owners)  # университет программы; для университетов — сам id
+        self.terms = list(terms)
+        self.numeric = numeric.reshape(len(self.ids), -1).astype(np.float64)
+        self.alive = np.ones(len(self.ids), dtype=bool)
+        self.positions = {id: i for i, id in enumerate(self.ids)}
+        self._prepared = None
+
+    def upsert(self, id: int, name: str, owner: int, terms: np.ndarray, numeric: list[float]) -> None:
+        i = self.positions.get(id)
+        if i is None:
+            i = len(self.ids)
+            self.positions[id] = i
+            self.ids.append(id)
+            self.names.append(name)
+            self.owners.append(owner)
+            self.terms.append(terms)
+            self.numeric = np.vstack([self.numeric, np.array(numeric, dtype=np.float64)])
+            self.alive = np.append(self.alive, True)
+        else:
+            self.names[i], self.owners[i], self.terms[i] = name, owner, terms
+            self.numeric[i] = numeric
+            self.alive[i] = True
+        self._prepared = None
+
+    def remove(self, id: int) -> None:
+        i = self.positions.get(id)
+        if i is not None and self.alive[i]:
+            self.alive[i] = False
+            self.terms[i] = np.zeros(0, dtype=np.uint32)
+            self._prepared = None
+
+    def _prepare(self):
+        if self._prepared is None:
+            rows = np.repeat(np.arange(len(self.terms)), [len(terms) for terms in self.terms])
+            features = np.concatenate(self.terms) if self.terms else np.zeros(0, dtype=np.uint32)
+            order = np.argsort(features, kind="stable")
+            features, rows = features[order], rows[order]
+            vocabulary, starts, df = np.unique(features, return_index=True, return_counts=True)
+            # Сглаженный IDF, как в sklearn: общие слова ("университет") почти не влияют на сходство
+            idf = np.log((1 + self.alive.sum()) / (1 + df)) + 1
+            entry_idf = np.repeat(idf, df)
+            norms = np.sqrt(np.bincount(rows, weights=entry_idf ** 2, minlength=len(self.terms)))
+            alive_numeric = self.numeric[self.alive]
+            # fmax/fmin пропускают NaN; столбец без данных дает NaN и не участвует в близости
+            ranges = np.fmax.reduce(alive_numeric) - np.fmin.reduce(alive_numeric) if len(alive_numeric) else np.full(self.numeric.shape[1], np.nan)
+            # Столбцы признаков, деленные на размах: разница двух значений сразу в долях от 0 до 1
+            scaled = [column / span for column, span in zip(self.numeric.T, np.where(ranges > 0, ranges, np.nan))]
+            self._prepared = (vocabulary, starts, df, idf, rows, norms, scaled)
+        return self._prepared
+
+    def similar(self, id: int, k: int) -> list[tuple[int, float]] | None:
+        """k ближайших (id, score) по убыванию сходства; None, если id нет в индексе."""
+        i = self.positions.get(id)
+        if i is None or not self.alive[i]:
+            return None
+        vocabulary, starts, df, idf, rows, norms, scaled = self._prepare()
+        n = len(self.ids)
+
+        # Косинус TF-IDF: проходим только постинги токенов запрашиваемой строки
+        text = np.zeros(n)
+        slots = np.searchsorted(vocabulary, self.terms[i])
+        slots = slots[(slots < len(vocabulary)) & (vocabulary[np.minimum(slots, len(vocabulary) - 1)] == self.terms[i])]
+        if len(slots) and norms[i] > 0:
+            postings = np.concatenate([np.arange(starts[s], starts[s] + df[s]) for s in slots])
+            weights = np.repeat(idf[slots] ** 2, df[slots])
+            text = np.bincount(rows[postings], weights=weights, minlength=n) / np.where(norms > 0, norms * norms[i], 1.0)
+
+        # Числовая близость: 1 - средняя нормированная разница по известным у обоих признакам
+        total, counts = np.zeros(n), np.zeros(n)
+        for column in scaled:
+            if np.isnan(column[i]):
+                continue
+            distance = np.abs(column - column[i])
+            known = ~np.isnan(distance)
+            total += np.where(known, distance, 0.0)
+            counts += known
+        numeric = np.where(counts > 0, 1.0 - total / np.maximum(counts, 1), 0.0)
+
+        scores = SIMILAR_TEXT_WEIGHT * text + (1 - SIMILAR_TEXT_WEIGHT) * numeric
+        scores[~self.alive] = -np.inf
+        scores[i] = -np.inf
+        k = min(k, int(self.alive.sum()) - 1)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.lexsort((top, -scores[top]))]  # по убыванию score, при равенстве — по порядку id
+        return [(self.ids[j], float(scores[j])) for j in top]
+
+    def arrays(self, prefix: str) -> dict[str, np.ndarray]:
+        return {
+            f"{prefix}_ids": np.array(self.ids, dtype=np.int64),
+            f"{prefix}_names": np.array(self.names, dtype=str),
+            f"{prefix}_owners": np.array(self.owners, dtype=np.int64),
+            f"{prefix}_offsets": np.cumsum([0] + [len(terms) for terms in self.terms]),
+            f"{prefix}_terms": np.concatenate(self.terms) if self.terms else np.zeros(0, dtype=np.uint32),
+            f"{prefix}_numeric": self.numeric,
+            f"{prefix}_alive": self.alive,
+        }
+
+    @classmethod
+    def from_arrays(cls, data, prefix: str) -> "TermIndex":
+        offsets, terms = data[f"{prefix}_offsets"], data[f"{prefix}_terms"]
+        index = cls(
+            data[f"{prefix}_ids"].tolist(), data[f"{prefix}_names"].tolist(), data[f"{prefix}_owners"].tolist(),
+            [terms[offsets[j]:offsets[j + 1]] for j in range(len(offsets) - 1)], data[f"{prefix}_numeric"],
+        )
+        index.alive = data[f"{prefix}_alive"].copy()
+        return index
+
+
+class SimilarIndex:
+    def __init__(self, version: int, universities: TermIndex, programs: TermIndex):
+        self.version = version
+        self.universities = universities
+        self.programs = programs
+
+
+_similar_index: SimilarIndex | None = None
+_similar_lock = asyncio.Lock()
+
+
+def university_entry(row, program_names: list[str]) -> tuple:
+    text = f"{row.name} {row.description or ''} {row.mission_text or ''} {' '.join(program_names)}"
+    return row.id, row.name or "", row.id, hash_terms(text), [known_number(getattr(row, name)) for name in UNIVERSITY_NUMERIC]
+
+def program_entry(row) -> tuple:
+    text = f"{row.name} {row.description or ''}"
+    return row.id, row.name or "", row.university_id or 0, hash_terms(text), [known_number(getattr(row, name)) for name in PROGRAM_NUMERIC]
+
+def university_rows(session: Session, ids: Iterable[int] | None = None):
+    query = select(University.id, University.name, University.description, University.mission_text, *(getattr(University, name) for name in UNIVERSITY_NUMERIC))
+    if ids is not None:
+        query = query.where(University.id.in_(list(ids)))
+    return session.execute(query.order_by(University.id)).all()
+
+def program_rows(session: Session, ids: Iterable[int] | None = None, university_ids: Iterable[int] | None = None):
+    query = select(Program.id, Program.university_id, Program.name, Program.description, *(getattr(Program, name) for name in PROGRAM_NUMERIC))
+    if ids is not None:
+        query = query.where(Program.id.in_(list(ids)))
+    if university_ids is not None:
+        query = query.where(Program.university_id.in_(list(university_ids)))
+    return session.execute(query.order_by(Program.id)).all()
+
+def program_names_by_university(programs) -> dict[int, list[str]]:
+    names = {}
+    for program in programs:
+        names.setdefault(program.university_id, []).append(program.name or "")
+    return names
+
+def term_index(entries: list[tuple], numeric_columns: int) -> TermIndex:
+    ids, names, owners, terms, numeric = zip(*entries) if entries else ((), (), (), (), ())
+    return TermIndex(ids, names, owners, terms, np.array(numeric, dtype=np.float64).reshape(len(entries), numeric_columns))
+
+def build_similar_index(session: Session, version: int) -> SimilarIndex:
+    programs = program_rows(session)
+    names = program_names_by_university(programs)
+    return SimilarIndex(
+        version,
+        term_index([university_entry(row, names.get(row.id, [])) for row in university_rows(session)], len(UNIVERSITY_NUMERIC)),
+        term_index([program_entry(row) for row in programs], len(PROGRAM_NUMERIC)),
+    )
+
+def save_similar_index(index: SimilarIndex) -> None:
+    # Через временный файл и os.replace, чтобы другой воркер не прочитал файл наполовину
+    tmp_path = f"{SIMILAR_INDEX_PATH}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            np.savez(f, version=np.int64(index.version), **index.universities.arrays("university"), **index.programs.arrays("program"))
+        os.replace(tmp_path, SIMILAR_INDEX_PATH)
+    except OSError:
+        # Без записи на диск индекс работает в памяти, другие воркеры построят свой
+        pass
+
+def load_similar_index(version: int) -> SimilarIndex | None:
+    try:
+        with np.load(SIMILAR_INDEX_PATH, allow_pickle=False) as data:
+            if int(data["version"]) != version:
+                return None
+            return SimilarIndex(version, TermIndex.from_arrays(data, "university"), TermIndex.from_arrays(data, "program"))
+    except (OSError, KeyError, ValueError):
+        return None
+
+async def get_similar_index(db: AsyncSession) -> SimilarIndex:
+    """Индекс текущей версии каталога: из памяти, с диска или построенный заново."""
+    global _similar_index
+    version = get_catalog_version()
+    if _similar_index is not None and _similar_index.version == version:
+        return _similar_index
+    async with _similar_lock:
+        if _similar_index is None or _similar_index.version != version:
+            index = load_similar_index(version)
+            if index is None:
+                index = await db.run_sync(build_similar_index, version)
+                save_similar_index(index)
+            _similar_index = index
+    return _similar_index
+
+def update_similar_index(db: Session, previous_version: int, version: int, university_ids: list[int] | None, program_ids: list[int] | None) -> None:
+    """
+    Обновляет строки индекса после записи. Вызывается из catalog_changed;
+    None — изменения неизвестны (массовый импорт), тогда индекс пересоберется при следующем запросе.
+    """
+    global _similar_index
+    index = _similar_index if _similar_index is not None and _similar_index.version == previous_version else load_similar_index(previous_version)
+    if index is None or university_ids is None or program_ids is None:
+        _similar_index = None
+        return
+    # Названия программ входят в текст университета: обновляем и прежнего, и нового владельца
+    affected = set(university_ids)
+    programs = program_rows(db, ids=program_ids) if program_ids else []
+    for program_id in program_ids:
+        position = index.programs.positions.get(program_id)
+        if position is not None:
+            affected.add(index.programs.owners[position])
+        index.programs.remove(program_id)
+    for row in programs:
+        index.programs.upsert(*program_entry(row))
+        affected.add(row.university_id)
+    if affected:
+        names = program_names_by_university(program_rows(db, university_ids=affected))
+        rows = university_rows(db, ids=affected)
+        for university_id in affected - {row.id for row in rows}:
+            index.universities.remove(university_id)
+        for row in rows:
+            index.universities.upsert(*university_entry(row, names.get(row.id, [])))
+    index.version = version
+    _similar_index = index
+    save_similar_index(index)
+
+def similar_items(terms: TermIndex, id: int, k: int, with_university: bool = False) -> list[dict] | None:
+    neighbors = terms.similar(id, k)
+    if neighbors is None:
+        return None
+    items = []
+    for neighbor, score in neighbors:
+        position = terms.positions[neighbor]
+        item = {"id": neighbor, "name": terms.names[position], "score": round(score, 4)}
+        if with_university:
+            item["university_id"] = terms.owners[position]
+        items.append(item)
+    return items
@@ -0,0 +1,92 @@
+from typing import NamedTuple
+import asyncio
+import gzip
+import logging
+import os
+
+import brotli
+import orjson
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from catalog import get_catalog_version
+from models import University
+from requests import UniversitySummaryResponse
+
+# Степень сжатия: варианты считаются один раз на версию каталога, поэтому можно сжимать сильно
+SNAPSHOT_GZIP_LEVEL = int(os.getenv("SNAPSHOT_GZIP_LEVEL", "9"))
+SNAPSHOT_BROTLI_QUALITY = int(os.getenv("SNAPSHOT_BROTLI_QUALITY", "9"))
+
+logger = logging.getLogger(__name__)
+
+# Предпочтение кодировок при согласовании Accept-Encoding
+ENCODINGS = ["br", "gzip"]
+
+
+class CatalogSnapshot(NamedTuple):
+    version: int
+    universities: dict[int, bytes]  # готовый JSON университета по id
+    body: dict[str, bytes]  # JSON всего каталога: "identity" и сжатые варианты
+    summary: dict[str, bytes]  # то же для GET /api/?view=summary
+
+
+_snapshot: CatalogSnapshot | None = None
+_snapshot_lock = asyncio.Lock()
+
+
+def compressed(identity: bytes) -> dict[str, bytes]:
+    return {
+        "identity": identity,
+        "gzip": gzip.compress(identity, compresslevel=SNAPSHOT_GZIP_LEVEL),
+        "br": brotli.compress(identity, quality=SNAPSHOT_BROTLI_QUALITY),
+    }
+
+def encode_snapshot(version: int, responses: list) -> CatalogSnapshot:
+    # Pydantic сериализует так же, как response_model в FastAPI; orjson — только кодирование
+    universities = {item.id: orjson.dumps(item.model_dump(mode="json")) for item in responses}
+    summary = [UniversitySummaryResponse.model_validate(item).model_dump(mode="json") for item in responses]
+    return CatalogSnapshot(
+        version=version,
+        universities=universities,
+        body=compressed(b"[" + b",".join(universities.values()) + b"]"),
+        summary=compressed(orjson.dumps(summary)),
+    )
+
+def build_responses(universities: list, build_response) -> list:
+    """Ответы по строкам каталога; строка, которая не проходит валидацию, пропускается, а не ломает весь снимок."""
+    responses = []
+    for uni in universities:
+        try:
+            responses.append(build_response(uni))
+        except Exception:
+            logger.exception("university %s skipped in catalog snapshot", uni.id)
+    return responses
+
+async def get_catalog_snapshot(db: AsyncSession, select_catalog, build_response) -> CatalogSnapshot:
+    """Снимок каталога; пересобирается только при смене версии каталога."""
+    global _snapshot
+    version = get_catalog_version()
+    if _snapshot is not None and _snapshot.version == version:
+        return _snapshot
+    async with _snapshot_lock:
+        # Пока ждали блокировку, снимок мог собрать другой запрос
+        if _snapshot is None or _snapshot.version != version:
+            universities = (await db.scalars(select_catalog().order_by(University.id))).all()
+            responses = build_responses(universities, build_response)
+            _snapshot = await asyncio.to_thread(encode_snapshot, version, responses)
+    return _snapshot
+
+def choose_encoding(accept_encoding: str | None) -> str:
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.partition(";")
+        name, _, quality = params.strip().partition("=")
+        try:
+            if name.strip() == "q" and float(quality) == 0:
+                continue  # кодировка явно запрещена клиентом
+        except ValueError:
+            pass
+        accepted.add(coding.strip().lower())
+    for encoding in ENCODINGS:
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return "identity"
@@ -0,0 +1,82 @@
+"""
+Запуск воркеров: проверка схемы и прогрев кэшей каталога до первого запроса.
+
+С gunicorn --preload (gunicorn.conf.py) прогрев выполняется один раз в мастер-процессе до fork:
+снимок каталога, индексы фасетов и похожих и контекст советника достаются воркерам
+через copy-on-write, а lifespan воркера видит, что кэши уже соответствуют версии каталога.
+"""
+import asyncio
+import gc
+import logging
+import os
+import time
+
+from catalog import get_advisor_context
+from database import SessionLocal, AsyncSessionLocal, engine, async_engine
+from facets import get_facet_index
+from migrations import migrate_if_needed
+from similar import get_similar_index
+from snapshot import get_catalog_snapshot
+
+WARM_UP_ON_STARTUP = os.getenv("WARM_UP_ON_STARTUP", "true").lower() == "true"
+
+logger = logging.getLogger(__name__)
+
+
+async def warm_up() -> dict[str, float | None]:
+    """
+    Собирает кэши текущей версии каталога; уже актуальные не пересобираются. Возвращает время этапов (мс).
+    Упавший этап не останавливает запуск: его время — None, а кэш соберется при первом запросе.
+    """
+    from routers.universities import catalog_select, build_university_response
+
+    durations = {}
+    async with AsyncSessionLocal() as db:
+        stages = {
+            "snapshot": lambda: get_catalog_snapshot(db, catalog_select, build_university_response),
+            "facets": lambda: get_facet_index(db),
+            "similar": lambda: get_similar_index(db),
+        }
+        for stage, build in stages.items():
+            started = time.perf_counter()
+            try:
+                await build()
+            except Exception:
+                logger.exception("warm-up stage %s failed, it will be built on first request", stage)
+                await db.rollback()
+                durations[stage] = None
+            else:
+                durations[stage] = round((time.perf_counter() - started) * 1000, 1)
+    started = time.perf_counter()
+    try:
+        with SessionLocal() as db:
+            get_advisor_context(db)
+    except Exception:
+        logger.exception("warm-up stage advisor failed, it will be built on first request")
+        durations["advisor"] = None
+    else:
+        durations["advisor"] = round((time.perf_counter() - started) * 1000, 1)
+    return durations
+
+async def startup() -> None:
+    """Lifespan воркера: без --preload здесь же строятся кэши, с --preload — только проверка версий."""
+    migrate_if_needed(engine)
+    if WARM_UP_ON_STARTUP:
+        await warm_up()
+
+def preload() -> None:
+    """Хук gunicorn when_ready: мастер мигрирует и прогревает кэши один раз для всех воркеров."""
+    migrate_if_needed(engine)
+    if WARM_UP_ON_STARTUP:
+        async def run():
+            try:
+                return await warm_up()
+            finally:
+                # Соединения и потоки aiosqlite не должны переживать fork
+                await async_engine.dispose()
+
+        durations = asyncio.run(run())
+        print(f"warm-up (ms): {durations}", flush=True)
+    engine.dispose()
+    # Объекты прогрева больше не трогает сборщик мусора, страницы памяти остаются общими после fork
+    gc.freeze()
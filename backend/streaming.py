@@ -0,0 +1,96 @@
+from typing import AsyncIterator
+import asyncio
+import json
+import re
+
+# Отключаем кэширование и буферизацию ответа в nginx (X-Accel-Buffering), иначе токены придут пачкой
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def with_deadline(iterator: AsyncIterator[str], timeout: float) -> AsyncIterator[str]:
+    """
+    Общий таймаут на весь поток (TimeoutError). Каждый шаг ждется через wait_for,
+    чтобы отмена по таймауту попала в итератор, а не в код, который пишет ответ клиенту.
+    """
+    deadline = asyncio.get_running_loop().time() + timeout
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(anext(iterator), deadline - asyncio.get_running_loop().time())
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        await iterator.aclose()
+
+
+class JSONStringFields:
+    """
+    Инкрементальный разбор строковых полей JSON-объекта из потока фрагментов.
+    feed() возвращает (поле, новый текст, строка завершена) для каждого продвинувшегося поля;
+    незавершенная escape-последовательность ждет следующего фрагмента.
+    """
+
+    def __init__(self, fields: list[str]):
+        self.text = ""
+        self.values: dict[str, str] = {}
+        self.complete: set[str] = set()
+        self._positions: dict[str, int] = {}
+        self._patterns = {field: re.compile(rf'"{re.escape(field)}"\s*:\s*"') for field in fields}
+
+    def feed(self, chunk: str) -> list[tuple[str, str, bool]]:
+        self.text += chunk
+        updates = []
+        for field, pattern in self._patterns.items():
+            if field in self.complete:
+                continue
+            if field not in self._positions:
+                match = pattern.search(self.text)
+                if match is None:
+                    continue
+                self._positions[field] = match.end()
+                self.values[field] = ""
+            delta, done = self._advance(field)
+            if delta or done:
+                updates.append((field, delta, done))
+        return updates
+
+    def _advance(self, field: str) -> tuple[str, bool]:
+        text, i, decoded = self.text, self._positions[field], []
+        done = False
+        while i < len(text):
+            char = text[i]
+            if char == '"':
+                done = True
+                i += 1
+                break
+            if char != "\\":
+                decoded.append(char)
+                i += 1
+                continue
+            if i + 1 >= len(text):
+                break
+            escape = text[i + 1]
+            if escape == "u":
+                if i + 6 > len(text):
+                    break
+                try:
+                    decoded.append(chr(int(text[i + 2:i + 6], 16)))
+                except ValueError:
+                    pass
+                i += 6
+            else:
+                decoded.append(_ESCAPES.get(escape, escape))
+                i += 2
+        self._positions[field] = i
+        delta = "".join(decoded)
+        self.values[field] += delta
+        if done:
+            self.complete.add(field)
+        return delta, done
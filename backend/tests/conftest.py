@@ -0,0 +1,44 @@
+import os
+import sys
+import tempfile
+
+# До импорта модулей приложения: engine, кэши и очередь настраиваются из окружения при импорте
+WORKDIR = tempfile.mkdtemp(prefix="zerohub-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORKDIR, 'test.db')}"
+os.environ["CATALOG_VERSION_PATH"] = os.path.join(WORKDIR, "catalog.version")
+os.environ["SIMILAR_INDEX_PATH"] = os.path.join(WORKDIR, "similar_index.npz")
+os.environ["AI_CACHE_BACKEND"] = "memory"
+os.environ["LLM_JOBS_PATH"] = os.path.join(WORKDIR, "llm_jobs.db")
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["WARM_UP_ON_STARTUP"] = "false"
+os.environ.setdefault("API_KEY", "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    from main import app
+    # with: запускает lifespan (миграции схемы)
+    with TestClient(app) as client:
+        yield client
+
+def add_university(client, programs: int = 2, **fields) -> int:
+    """Университет с программами и admission info через API; возвращает id."""
+    data = {
+        "name": "Тестовый университет", "description": "Описание", "city": "Алматы", "min_ent_score": 70,
+        "rating": 4.0, "languages": ["Русский"], "price": 1_000_000, **fields,
+    }
+    client.post("/api/", json=data).raise_for_status()
+    university_id = max(item["id"] for item in client.get("/api/", params={"view": "summary"}).json())
+    for i in range(programs):
+        client.post("/api/programs", json={
+            "university_id": university_id, "name": f"Программа {i}", "description": "Описание", "degree": "Бакалавриат",
+            "price": 1_000_000, "duration": 4, "language": "Русский", "min_ent_score": 70, "employment": 80,
+        }).raise_for_status()
+    client.post("/api/admission", json={"university_id": university_id, "requirements": ["ЕНТ"]}).raise_for_status()
+    return university_id
@@ -0,0 +1,45 @@
+import json
+
+from sqlalchemy import text
+
+import database
+from bulk import import_records
+from conftest import add_university
+
+
+def lines(*rows) -> list[str]:
+    return [json.dumps(row, ensure_ascii=False) for row in rows]
+
+def count(sql: str, **params) -> int:
+    with database.engine.connect() as conn:
+        return conn.execute(text(sql), params).scalar()
+
+def test_reimport_matches_null_key_parts(client):
+    # Ключ admission info — university_id, здесь он NULL
+    row = {"requirements_text": "Без университета", "requirements": ["ЕНТ"]}
+    import_records(lines(row), "admissions")
+    imported = count("SELECT COUNT(*) FROM admission_info WHERE university_id IS NULL")
+    report = import_records(lines({**row, "requirements": ["ЕНТ", "IELTS"]}), "admissions")
+    assert (report["inserted"], report["updated"]) == (0, 1)
+    assert count("SELECT COUNT(*) FROM admission_info WHERE university_id IS NULL") == imported >= 1
+
+def test_database_error_is_reported_per_line(client):
+    university_id = add_university(client, programs=0)
+    program = {
+        "university_id": university_id, "description": "Описание", "degree": "Магистратура",
+        "price": 1_000_000, "duration": 2, "language": "Русский", "min_ent_score": 70, "employment": 80,
+    }
+    with database.engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TRIGGER reject_program BEFORE INSERT ON programs WHEN NEW.name = 'reject' "
+            "BEGIN SELECT RAISE(ABORT, 'program rejected'); END"
+        ))
+    try:
+        report = import_records(lines(*({**program, "name": name} for name in ("Первая", "reject", "Третья"))), "programs")
+    finally:
+        with database.engine.begin() as conn:
+            conn.execute(text("DROP TRIGGER reject_program"))
+    assert (report["inserted"], report["failed"]) == (2, 1)
+    assert report["errors"][0]["line"] == 2
+    assert "program rejected" in report["errors"][0]["error"]
+    assert count("SELECT COUNT(*) FROM programs WHERE university_id = :id", id=university_id) == 2
@@ -0,0 +1,47 @@
+import asyncio
+import os
+import time
+
+from cache import SQLiteCache
+from conftest import WORKDIR
+
+
+def make_cache(name: str, **limits) -> SQLiteCache:
+    return SQLiteCache(os.path.join(WORKDIR, name), **{"ttl": 60, "max_entries": 100, "max_bytes": 1 << 20, **limits})
+
+def test_get_reads_without_writing():
+    cache = make_cache("cache-read.db")
+    cache.set("k", "value")
+    conn = cache._conn
+    changes = conn.total_changes
+    assert cache.get("k") == "value"
+    assert cache.get("missing") is None
+    # Одно соединение на процесс, а чтение не пишет в файл
+    assert cache._conn is conn
+    assert conn.total_changes == changes
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+def test_expired_entry_is_a_miss():
+    cache = make_cache("cache-ttl.db", ttl=0.05)
+    cache.set("k", "value")
+    time.sleep(0.1)
+    assert cache.get("k") is None
+
+def test_reads_keep_entries_from_lru_eviction():
+    cache = make_cache("cache-lru.db", max_entries=2)
+    cache.set("a", "1")
+    time.sleep(0.01)
+    cache.set("b", "2")
+    time.sleep(0.01)
+    assert cache.get("a") == "1"  # отметка доступа записывается со следующим set
+    cache.set("c", "3")
+    assert [cache.get(key) for key in ("a", "b", "c")] == ["1", None, "3"]
+
+def test_async_methods_run_in_thread():
+    cache = make_cache("cache-async.db")
+
+    async def scenario():
+        await cache.set_async("k", "value")
+        return await cache.get_async("k")
+
+    assert asyncio.run(scenario()) == "value"
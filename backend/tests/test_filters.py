@@ -0,0 +1,82 @@
+"""
+Фильтры search и language без учета регистра для кириллицы: GET /api/ и фасеты считают одинаково.
+Курсор keyset-пагинации проверяется до запроса к базе.
+"""
+import base64
+import json
+
+import pytest
+
+from sqlalchemy import text
+
+import database
+from bulk import import_records
+from catalog import bump_catalog_version
+from conftest import add_university
+from migrations import run_migrations
+
+
+def matching_ids(client, **params) -> set[int]:
+    items = client.get("/api/", params=params).json()
+    total = client.get("/api/facets", params=params).json()["total"]
+    assert total == len(items)
+    return {item["id"] for item in items}
+
+def test_cyrillic_search_and_language_ignore_case(client):
+    created = add_university(client, programs=0, name="Международный университет информационных технологий", languages=["Английский", "Русский"])
+    assert created in matching_ids(client, search="межд")
+    assert created in matching_ids(client, search="МЕЖДУНАРОДНЫЙ")
+    assert created in matching_ids(client, language="англ")
+    assert created in matching_ids(client, language="АНГЛИЙСКИЙ")
+    assert created not in matching_ids(client, search="межд_")  # _ и % — обычные символы, а не шаблон LIKE
+
+def test_update_refreshes_folded_columns(client):
+    created = add_university(client, programs=0, name="Университет Абая")
+    data = client.get(f"/api/get/{created}").json()
+    update = {key: data[key] for key in ("description", "city", "min_ent_score", "rating", "languages", "price")}
+    client.put(f"/api/get/{created}", json={**update, "name": "Университет Сатпаева"}).raise_for_status()
+    assert created in matching_ids(client, search="сатпаев")
+    assert created not in matching_ids(client, search="абая")
+
+def test_bulk_import_fills_folded_columns(client):
+    row = {"name": "Университет Туран-Астана", "description": "Описание", "city": "Астана", "min_ent_score": 60, "rating": 3.5, "languages": ["Казахский"], "price": 900000}
+    report = import_records([json.dumps(row, ensure_ascii=False)], "universities")
+    assert report["inserted"] == 1
+    bump_catalog_version()
+    assert len(matching_ids(client, search="ТУРАН-АСТАНА")) == 1
+    assert len(matching_ids(client, search="туран-астана", language="казах")) == 1
+
+def test_migration_fills_rows_written_without_orm(client):
+    created = add_university(client, programs=0, name="Евразийский национальный университет")
+    with database.engine.begin() as conn:
+        conn.execute(text("UPDATE universities SET name_folded = NULL, languages_folded = NULL WHERE id = :id"), {"id": created})
+    run_migrations(database.engine)
+    bump_catalog_version()
+    assert created in matching_ids(client, search="ЕВРАЗ")
+
+def test_facets_count_every_city_value(client):
+    # Значение "string" (пример из Swagger) — такой же город, как любой другой
+    created = add_university(client, programs=0, city="string")
+    assert created in matching_ids(client, city="string")
+    cities = {item["value"] for item in client.get("/api/facets").json()["cities"]}
+    assert "string" in cities
+
+def cursor(*parts) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(parts)).encode()).decode()
+
+@pytest.mark.parametrize("value", [
+    "W1t7fV0sIDFd",  # [[{}], 1]
+    cursor({"a": 1}, 1),
+    cursor(1000, "1"),
+    cursor(1000, 1.5),
+    cursor(1000, True),
+    cursor(1000),
+    "не base64",
+])
+def test_malformed_cursor_is_400(client, value):
+    response = client.get("/api/", params={"sort": "price", "cursor": value})
+    assert response.status_code == 400
+
+@pytest.mark.parametrize("sort, value", [("price", 1000), ("name", "А"), ("rating", None), ("id", None)])
+def test_scalar_cursor_is_accepted(client, sort, value):
+    assert client.get("/api/", params={"sort": sort, "cursor": cursor(value, 1)}).status_code == 200
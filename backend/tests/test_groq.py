@@ -0,0 +1,186 @@
+"""
+Асинхронный клиент модели против локальной заглушки Responses API (http.server в потоке):
+ретраи с backoff на 429/5xx, без ретраев на 4xx, таймаут, ограничение одновременных запросов семафором и пулом.
+Клиент создает get_async_client с настройками модуля groq, подменен только адрес API.
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from openai import APIStatusError, APITimeoutError
+
+import groq
+
+
+def response_body(text: str) -> dict:
+    return {
+        'id': 'resp_test', 'object': 'response', 'created_at': 0, 'model': groq.GROQ_MODEL, 'status': 'completed',
+        'output': [{
+            'type': 'message', 'id': 'msg_test', 'status': 'completed', 'role': 'assistant',
+            'content': [{'type': 'output_text', 'text': text, 'annotations': []}],
+        }],
+        'parallel_tool_calls': False, 'tool_choice': 'auto', 'tools': [],
+        'usage': {
+            'input_tokens': 3, 'output_tokens': 2, 'total_tokens': 5,
+            'input_tokens_details': {'cached_tokens': 0}, 'output_tokens_details': {'reasoning_tokens': 0},
+        },
+    }
+
+
+class StubResponsesAPI:
+    """POST /v1/responses: ответы по сценарию (статус, задержка), затем 200; считает запросы и одновременность."""
+
+    def __init__(self):
+        self.script: list[int] = []
+        self.delay = 0.0
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with stub.lock:
+                    stub.requests += 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    status = stub.script.pop(0) if stub.script else 200
+                try:
+                    time.sleep(stub.delay)
+                    if status != 200:
+                        self.send_json(status, {'error': {'message': f'stub {status}', 'type': 'stub', 'code': None}})
+                    elif body.get('stream'):
+                        self.send_stream(['При', 'вет'])
+                    else:
+                        self.send_json(200, response_body(f"ответ: {body['input']}"))
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # клиент ушел по таймауту
+                finally:
+                    with stub.lock:
+                        stub.in_flight -= 1
+
+            def send_json(self, status: int, data: dict):
+                payload = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def send_stream(self, deltas: list[str]):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.end_headers()
+                events = [
+                    {'type': 'response.output_text.delta', 'delta': delta, 'item_id': 'msg_test', 'output_index': 0,
+                     'content_index': 0, 'logprobs': [], 'sequence_number': i}
+                    for i, delta in enumerate(deltas)
+                ]
+                events.append({'type': 'response.completed', 'response': response_body(''.join(deltas)), 'sequence_number': len(deltas)})
+                for event in events:
+                    self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode())
+                self.wfile.flush()
+                self.close_connection = True
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True  # не ждать обработчик, от которого клиент ушел по таймауту
+        self.base_url = f'http://127.0.0.1:{self.server.server_address[1]}/v1'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    stub = StubResponsesAPI()
+    monkeypatch.setattr(groq, 'GROQ_BACKOFF_BASE', 0.01)
+    monkeypatch.setattr(groq, 'GROQ_MAX_RETRIES', 3)
+    monkeypatch.setattr(groq, '_semaphore', asyncio.Semaphore(groq.GROQ_MAX_CONCURRENCY))
+    monkeypatch.setattr(groq, '_async_client', None)
+    monkeypatch.setattr(groq, 'GROQ_BASE_URL', stub.base_url)
+    yield stub
+    stub.close()
+
+def run_with_client(coroutine_factory):
+    """get_async_client создает клиент при первом вызове внутри event loop теста, как в воркере; после теста он закрывается."""
+    async def scenario():
+        try:
+            return await coroutine_factory()
+        finally:
+            if groq._async_client is not None:
+                await groq._async_client.close()
+
+    return asyncio.run(scenario())
+
+
+def test_retries_429_and_5xx_with_backoff(stub):
+    stub.script = [429, 500, 503]
+    assert run_with_client(lambda: groq.requestAIAsync('вопрос')) == 'ответ: вопрос'
+    # Ретраи только наши: у клиента SDK max_retries=0
+    assert stub.requests == 4
+
+def test_gives_up_after_max_retries(stub, monkeypatch):
+    monkeypatch.setattr(groq, 'GROQ_MAX_RETRIES', 2)
+    stub.script = [502, 502, 502, 502]
+    with pytest.raises(APIStatusError) as error:
+        run_with_client(lambda: groq.requestAIAsync('вопрос'))
+    assert error.value.status_code == 502
+    assert stub.requests == 3
+
+def test_does_not_retry_client_errors(stub):
+    stub.script = [400]
+    with pytest.raises(APIStatusError) as error:
+        run_with_client(lambda: groq.requestAIAsync('вопрос'))
+    assert error.value.status_code == 400
+    assert stub.requests == 1
+
+def test_read_timeout(stub, monkeypatch):
+    monkeypatch.setattr(groq, 'GROQ_READ_TIMEOUT', 0.2)
+    stub.delay = 1
+    started = time.perf_counter()
+    with pytest.raises(APITimeoutError):
+        run_with_client(lambda: groq.requestAIAsync('вопрос'))
+    assert time.perf_counter() - started < 1
+
+def test_semaphore_caps_concurrency(stub, monkeypatch):
+    monkeypatch.setattr(groq, '_semaphore', asyncio.Semaphore(2))
+    stub.delay = 0.1
+
+    async def burst():
+        return await asyncio.gather(*(groq.requestAIAsync(f'вопрос {i}') for i in range(6)))
+
+    results = run_with_client(burst)
+    assert results == [f'ответ: вопрос {i}' for i in range(6)]
+    assert stub.max_in_flight == 2
+
+def test_connection_pool_caps_concurrency(stub, monkeypatch):
+    # Семафор шире пула: одновременность ограничивает httpx.Limits клиента
+    monkeypatch.setattr(groq, 'GROQ_MAX_CONCURRENCY', 2)
+    monkeypatch.setattr(groq, '_semaphore', asyncio.Semaphore(6))
+    stub.delay = 0.1
+
+    async def burst():
+        return await asyncio.gather(*(groq.requestAIAsync(f'вопрос {i}') for i in range(6)))
+
+    assert run_with_client(burst) == [f'ответ: вопрос {i}' for i in range(6)]
+    assert stub.max_in_flight == 2
+
+def test_stream_retries_before_first_event(stub, monkeypatch):
+    monkeypatch.setattr(groq, 'rate_limiter', groq.RateLimiter(0))
+    stub.script = [429]
+
+    async def collect():
+        return [delta async for delta in groq.streamAIAsync('вопрос')]
+
+    assert run_with_client(collect) == ['При', 'вет']
+    assert stub.requests == 2
@@ -0,0 +1,76 @@
+import pytest
+
+import routers.universities
+from conftest import add_university
+
+
+@pytest.fixture
+def model_reply(monkeypatch):
+    """Ответ модели без сети; prompts — промпты, с которыми ее вызвали."""
+    prompts = []
+
+    async def reply(prompt, **kwargs):
+        prompts.append(prompt)
+        return "Пояснение модели"
+
+    monkeypatch.setattr(routers.universities, "requestAICached", reply)
+    return prompts
+
+
+def test_compare_keeps_universities_with_the_same_name(client, model_reply):
+    cheap = add_university(client, programs=1, name="Same", price=500_000, rating=3.5)
+    rated = add_university(client, programs=1, name="Same", price=2_000_000, rating=4.9)
+    response = client.post("/api/ai/compare", json={
+        "universities": [{"id": cheap}, {"id": rated}], "userGoal": "подешевле",
+    })
+    assert response.status_code == 200
+    result = response.json()
+    comparison = result["comparison"]
+    # Ключи JSON-объектов — строки
+    assert set(comparison["scores"]) == {str(cheap), str(rated)}
+    assert comparison["universities"] == [{"id": cheap, "name": "Same"}, {"id": rated, "name": "Same"}]
+    # Цель «подешевле» усиливает цену
+    assert comparison["boosted"] == ["price"]
+    assert result["winner_id"] == cheap and result["winner"] == "Same"
+    price = next(metric for metric in comparison["metrics"] if metric["metric"] == "price")
+    assert price["best"] == [cheap]
+    assert price["diff"] == {str(cheap): 0, str(rated): 1_500_000}
+    assert f"Same (id {cheap})" in model_reply[0]
+    assert result["analysis"] == "Пояснение модели"
+
+def test_compare_unknown_university_is_404(client, model_reply):
+    response = client.post("/api/ai/compare", json={"universities": [{"id": 10**9}]})
+    assert response.status_code == 404
+    assert model_reply == []
+
+@pytest.mark.parametrize("score, ielts, chance", [
+    (100, None, "High"),
+    (80, None, "Medium"),
+    (60, None, "Low"),
+    (100, 5.0, "Low"),  # IELTS ниже минимума
+])
+def test_analyze_chance(client, model_reply, score, ielts, chance):
+    university_id = add_university(client, programs=1, min_ent_score=70, number_of_grants=100, min_ielts=6.0)
+    response = client.post("/api/ai/analyze-chance", json={
+        "universityId": university_id, "userScore": score, "subject": "Программа", "ielts": ielts,
+    })
+    assert response.status_code == 200
+    result = response.json()
+    assert result["chance"] == chance
+    assert result["features"]["program"] == "Программа 0"
+    assert result["features"]["margin"] == score - 70
+    assert result["message"] == "Пояснение модели"
+
+def test_analyze_chance_falls_back_to_summary_when_model_fails(client, monkeypatch):
+    async def broken(prompt, **kwargs):
+        raise RuntimeError("model is down")
+
+    monkeypatch.setattr(routers.universities, "requestAICached", broken)
+    university_id = add_university(client, programs=0, min_ent_score=70)
+    result = client.post("/api/ai/analyze-chance", json={"universityId": university_id, "userScore": 95}).json()
+    assert result["chance"] == "High"
+    assert result["message"].startswith("Балл ЕНТ абитуриента: 95.")
+
+def test_analyze_chance_unknown_university_is_404(client, model_reply):
+    response = client.post("/api/ai/analyze-chance", json={"universityId": 10**9, "userScore": 90})
+    assert response.status_code == 404
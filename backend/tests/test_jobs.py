@@ -0,0 +1,200 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from conftest import WORKDIR
+from metrics import RequestStats, current_request, record_llm
+from jobs import (
+    LLMJobQueue, RateLimiter, SQLiteRateLimiter, SQLiteJobStore, QueueFull, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND,
+)
+
+
+class FakeModel:
+    """Поддельная модель: запоминает порядок вызовов, отвечает, когда тест откроет gate."""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = asyncio.Event()
+
+    async def __call__(self, prompt: str) -> str:
+        self.calls.append(prompt)
+        await self.gate.wait()
+        if prompt == "fail":
+            raise RuntimeError("model failed")
+        return f"answer: {prompt}"
+
+
+def test_single_flight_coalesces_same_key():
+    async def scenario():
+        model = FakeModel()
+        queue = LLMJobQueue(model, RateLimiter(0), workers=2)
+        first = queue.submit("prompt", key="k")
+        second = queue.submit("prompt", key="k")
+        assert first is second
+        assert first.waiters == 2
+        model.gate.set()
+        results = await asyncio.gather(first.wait(), second.wait())
+        assert results == ["answer: prompt", "answer: prompt"]
+        assert model.calls == ["prompt"]
+        assert queue.stats()["coalesced"] == 1
+
+    asyncio.run(scenario())
+
+def test_interactive_jobs_run_before_background():
+    async def scenario():
+        model = FakeModel()
+        queue = LLMJobQueue(model, RateLimiter(0), workers=1)
+        blocker = queue.submit("blocker", key="blocker")
+        await asyncio.sleep(0)  # единственный воркер занят первым заданием
+        background = queue.submit("background", key="b", priority=PRIORITY_BACKGROUND)
+        interactive = queue.submit("interactive", key="i", priority=PRIORITY_INTERACTIVE)
+        model.gate.set()
+        await asyncio.gather(blocker.wait(), background.wait(), interactive.wait())
+        assert model.calls == ["blocker", "interactive", "background"]
+
+    asyncio.run(scenario())
+
+def test_full_queue_raises():
+    async def scenario():
+        model = FakeModel()
+        queue = LLMJobQueue(model, RateLimiter(0), workers=1, max_size=1)
+        running = queue.submit("running", key="r")
+        await asyncio.sleep(0)
+        queue.submit("queued", key="q")
+        with pytest.raises(QueueFull):
+            queue.submit("rejected", key="x")
+        assert queue.stats()["rejected"] == 1
+        # Тот же промпт, что уже в очереди, объединяется, а не отклоняется
+        assert queue.submit("queued", key="q").waiters == 2
+        model.gate.set()
+        await running.wait()
+
+    asyncio.run(scenario())
+
+def test_failed_job_reports_error():
+    async def scenario():
+        model = FakeModel()
+        model.gate.set()
+        queue = LLMJobQueue(model, RateLimiter(0), workers=1)
+        job = queue.submit("fail", key="f")
+        with pytest.raises(RuntimeError):
+            await job.wait()
+        data = await queue.lookup(job.id)
+        assert data["status"] == "failed"
+        assert data["error"] == "model failed"
+
+    asyncio.run(scenario())
+
+def test_stopped_worker_fails_its_job():
+    async def scenario():
+        model = FakeModel()
+        queue = LLMJobQueue(model, RateLimiter(0), workers=1)
+        job = queue.submit("prompt", key="k")
+        joined = queue.submit("prompt", key="k")
+        await asyncio.sleep(0)  # воркер ждет модель
+        for task in queue._tasks:
+            task.cancel()
+        with pytest.raises(RuntimeError, match="stopped"):
+            await asyncio.wait_for(job.wait(), 1)
+        with pytest.raises(RuntimeError, match="stopped"):
+            await asyncio.wait_for(joined.wait(), 1)
+        assert (await queue.lookup(job.id))["status"] == "failed"
+
+    asyncio.run(scenario())
+
+def test_finished_jobs_expire():
+    async def scenario():
+        model = FakeModel()
+        model.gate.set()
+        queue = LLMJobQueue(model, RateLimiter(0), workers=1, job_ttl=0.05)
+        job = queue.submit("prompt", key="k")
+        await job.wait()
+        assert (await queue.lookup(job.id))["result"] == "answer: prompt"
+        await asyncio.sleep(0.1)
+        assert await queue.lookup(job.id) is None
+
+    asyncio.run(scenario())
+
+def test_model_time_goes_to_each_waiting_request():
+    async def model(prompt: str) -> str:
+        record_llm("fake", "async", 0.25, "ok")
+        return prompt
+
+    async def request(queue: LLMJobQueue, prompt: str) -> RequestStats:
+        # Задача — отдельный HTTP-запрос со своей статистикой (как в MetricsMiddleware)
+        stats = RequestStats()
+        current_request.set(stats)
+        await queue.run(prompt, key=prompt)
+        return stats
+
+    async def scenario():
+        queue = LLMJobQueue(model, RateLimiter(0), workers=1)
+        # Воркеры очереди запускаются внутри первого запроса и не должны писать в его статистику
+        first = await asyncio.create_task(request(queue, "first"))
+        second = await asyncio.create_task(request(queue, "second"))
+        for stats in (first, second):
+            assert stats.llm_calls == 1
+            assert stats.llm_seconds == pytest.approx(0.25)
+
+    asyncio.run(scenario())
+
+def test_job_is_visible_from_another_worker():
+    path = os.path.join(WORKDIR, "jobs-shared.db")
+
+    async def scenario():
+        model = FakeModel()
+        accepting = LLMJobQueue(model, RateLimiter(0), workers=1, store=SQLiteJobStore(path, ttl=60))
+        # Другой воркер: своя очередь, то же хранилище
+        polling = LLMJobQueue(FakeModel(), RateLimiter(0), workers=1, store=SQLiteJobStore(path, ttl=60))
+        job = await accepting.submit_tracked("prompt", key="k")
+        assert (await polling.lookup(job.id))["status"] in ("queued", "running")
+        model.gate.set()
+        await job.wait()
+        await accepting._queue.join()  # task_done — после записи о завершении в хранилище
+        assert await polling.lookup(job.id) == await accepting.lookup(job.id)
+        assert (await polling.lookup(job.id))["result"] == "answer: prompt"
+        assert await polling.lookup("missing") is None
+
+        # Задания обычных запросов ждут на месте и в общее хранилище не пишутся
+        interactive = accepting.submit("interactive", key="i")
+        await interactive.wait()
+        assert await polling.lookup(interactive.id) is None
+        # ...пока к заданию не присоединится опрос через /ai/jobs
+        model.gate.clear()
+        running = accepting.submit("running", key="r")
+        await asyncio.sleep(0)
+        tracked = await accepting.submit_tracked("running", key="r")
+        assert tracked is running
+        assert (await polling.lookup(running.id))["status"] == "running"
+        model.gate.set()
+        await running.wait()
+        await accepting._queue.join()
+        assert (await polling.lookup(running.id))["result"] == "answer: running"
+
+    asyncio.run(scenario())
+
+def test_store_ignores_stale_writes():
+    # Записи идут из потоков и могут прийти не по порядку
+    store = SQLiteJobStore(os.path.join(WORKDIR, "jobs-order.db"), ttl=60)
+    job = {"job_id": "j", "created_at": time.time(), "finished_at": None}
+    store.save({**job, "status": "running"})
+    store.save({**job, "status": "queued"})
+    assert store.load("j")["status"] == "running"
+    store.save({**job, "status": "done", "finished_at": time.time(), "result": "answer"})
+    store.save({**job, "status": "running"})
+    assert store.load("j")["result"] == "answer"
+
+def test_shared_quota_is_split_between_workers():
+    path = os.path.join(WORKDIR, "quota-shared.db")
+    # Два воркера с общей квотой 60 в минуту и всплеском 2: третий токен — только через секунду
+    workers = [SQLiteRateLimiter(path, 60, burst=2), SQLiteRateLimiter(path, 60, burst=2)]
+    waits = [workers[0].reserve(), workers[1].reserve(), workers[0].reserve(), workers[1].reserve()]
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] == pytest.approx(1, abs=0.05)
+    assert waits[3] == pytest.approx(2, abs=0.05)
+
+    started = time.monotonic()
+    asyncio.run(SQLiteRateLimiter(os.path.join(WORKDIR, "quota-fresh.db"), 60, burst=1).acquire())
+    assert time.monotonic() - started < 0.5
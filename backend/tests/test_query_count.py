@@ -0,0 +1,47 @@
+"""Число SQL-запросов на чтение каталога не зависит от размера каталога (регрессия N+1)."""
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+import database
+from catalog import bump_catalog_version
+from conftest import add_university
+
+ENDPOINTS = ["/api/", "/api/?city=Алматы&sort=price", "/api/?view=summary", "/api/get/{id}", "/api/get?ids={id}"]
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engines = [database.engine, database.async_engine.sync_engine]
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+def measure(client, university_id: int) -> dict[str, int]:
+    counts = {}
+    for endpoint in ENDPOINTS:
+        # Новая версия каталога: снимок и кэши собираются заново внутри измеряемого запроса
+        bump_catalog_version()
+        path = endpoint.format(id=university_id)
+        with count_statements() as statements:
+            client.get(path).raise_for_status()
+        counts[path.replace(str(university_id), "{id}")] = len(statements)
+    return counts
+
+def test_statement_count_does_not_grow_with_catalog(client):
+    first = add_university(client, programs=1)
+    small = measure(client, first)
+    for i in range(20):
+        add_university(client, programs=3, name=f"Университет {i}")
+    large = measure(client, first)
+    assert large == small
+    assert all(count > 0 for count in small.values())
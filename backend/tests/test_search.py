@@ -0,0 +1,27 @@
+import asyncio
+
+from database import AsyncSessionLocal
+from conftest import add_university
+from fulltext import like_search
+
+
+def test_search_uses_fulltext_index(client):
+    university_id = add_university(client, programs=1, name="Astana Robotics Institute", description="Инженерия и робототехника")
+    result = client.get("/api/search", params={"q": "robot"}).json()
+    assert {"kind": "university", "id": university_id} in [{"kind": item["kind"], "id": item["id"]} for item in result["items"]]
+    assert client.get("/api/search", params={"q": "robot", "kind": "program"}).json()["total"] == 0
+
+def test_like_search_without_fts(client):
+    # Путь для СУБД без FTS5: тот же ответ, релевантность — совпадение в названии
+    in_name = add_university(client, programs=0, name="Kokshetau Marine Academy", description="Морское дело")
+    in_text = add_university(client, programs=0, name="Северный колледж", description="Partner of Kokshetau Marine Academy")
+
+    async def scenario(**params):
+        async with AsyncSessionLocal() as db:
+            return await like_search(db, "kokshetau marine", limit=10, offset=0, **params)
+
+    total, items = asyncio.run(scenario(kind=None))
+    assert total == 2
+    assert [(item["kind"], item["id"], item["score"]) for item in items] == [("university", in_name, 1.0), ("university", in_text, 0.0)]
+    assert items[1]["snippet"] == "Partner of Kokshetau Marine Academy"
+    assert asyncio.run(scenario(kind="program")) == (0, [])
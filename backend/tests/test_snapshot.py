@@ -0,0 +1,54 @@
+import asyncio
+import warnings
+
+from sqlalchemy import text
+
+import database
+import startup
+from catalog import bump_catalog_version
+from conftest import add_university
+
+
+def test_invalid_row_is_skipped_not_failing_catalog(client):
+    good = add_university(client, programs=0, city="Семей")
+    bad = add_university(client, programs=0, city="Семей")
+    # Строка, записанная в обход API: ответ по ней не проходит валидацию
+    with database.engine.begin() as conn:
+        conn.execute(text("UPDATE universities SET rating = NULL WHERE id = :id"), {"id": bad})
+    bump_catalog_version()
+    try:
+        ids = [item["id"] for item in client.get("/api/").json()]
+        assert good in ids and bad not in ids
+        filtered = client.get("/api/", params={"city": "Семей"})
+        assert filtered.status_code == 200
+        assert [item["id"] for item in filtered.json()] == [good]
+        assert client.get(f"/api/get/{good}").status_code == 200
+        assert client.get(f"/api/get/{bad}").status_code == 404
+    finally:
+        with database.engine.begin() as conn:
+            conn.execute(text("UPDATE universities SET rating = 4.0 WHERE id = :id"), {"id": bad})
+        bump_catalog_version()
+
+def test_failed_warm_up_stage_does_not_stop_startup(client, monkeypatch):
+    async def broken(db):
+        raise RuntimeError("facets are broken")
+
+    monkeypatch.setattr(startup, "get_facet_index", broken)
+    bump_catalog_version()
+    durations = asyncio.run(startup.warm_up())
+    assert durations["facets"] is None
+    assert all(durations[stage] is not None for stage in ("snapshot", "similar", "advisor"))
+    # Кэш фасетов соберется при первом запросе
+    assert client.get("/api/facets").status_code == 200
+
+def test_first_admission_row_is_used_without_warnings(client):
+    university_id = add_university(client, programs=0)
+    # Вторая строка admission info того же университета
+    client.post("/api/admission", json={"university_id": university_id, "requirements": ["IELTS"]}).raise_for_status()
+    bump_catalog_version()
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        detail = client.get(f"/api/get/{university_id}").json()
+        listed = client.get("/api/", params={"fields": "id,admission_info"}).json()
+    assert detail["admission_info"]["requirements"] == ["ЕНТ"]
+    assert next(item for item in listed if item["id"] == university_id)["admission_info"] == detail["admission_info"]
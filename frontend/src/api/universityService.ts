@@ -6,7 +6,9 @@ import type {
   IBackendUniversity,
   IBackendProgram,
   IAcademicProgram,
-  IInternational
+  IInternational,
+  IFacets,
+  IFacetFilters
 } from '../types';
 import { universities as mockUniversities } from '../data/mockData';
 
@@ -14,24 +16,8 @@ import { universities as mockUniversities } from '../data/mockData';
 const adaptUniversity = (backendUni: IBackendUniversity, programs: IBackendProgram[] = []): IUniversity => {
   // Используем программы из ответа API, если они есть, иначе используем переданные
   const uniPrograms = backendUni.programs || programs;
-  // Парсим languages (может быть JSON строка или разделенная запятыми)
-  let languagesArray: string[] = [];
-  try {
-    if (backendUni.languages) {
-      // Пробуем распарсить как JSON
-      const parsed = JSON.parse(backendUni.languages);
-      languagesArray = Array.isArray(parsed) ? parsed : [backendUni.languages];
-    }
-  } catch {
-    // Если не JSON, пробуем разделить по запятым
-    languagesArray = backendUni.languages ? backendUni.languages.split(',').map(l => l.trim()).filter(Boolean) : [];
-  }
-  
-  // Нормализуем регистр языков (первая буква заглавная, остальные строчные)
-  languagesArray = languagesArray.map(lang => {
-    if (!lang || !lang.trim()) return lang;
-    return lang.trim().charAt(0).toUpperCase() + lang.trim().slice(1).toLowerCase();
-  });
+  // Списковые поля приходят с бэкенда готовыми массивами (языки уже нормализованы)
+  const languagesArray = backendUni.languages ?? [];
 
   // Преобразуем программы
   const academicPrograms: IAcademicProgram[] = uniPrograms
@@ -53,27 +39,16 @@ const adaptUniversity = (backendUni: IBackendUniversity, programs: IBackendProgr
       employmentRate: (p.employment != null && p.employment > 0) ? p.employment : null,
     }));
 
-  // Парсим JSON поля для international
-  const parseJsonField = (field: string | null | undefined): string[] => {
-    if (!field) return [];
-    try {
-      const parsed = JSON.parse(field);
-      return Array.isArray(parsed) ? parsed : [];
-    } catch {
-      return [];
-    }
-  };
-
   // Формируем объект international
   const international: IInternational = {
-    exchangePrograms: parseJsonField(backendUni.exchange_programs), // Только если есть конкретные программы
-    partners: parseJsonField(backendUni.partners),
-    foreignStudentOpps: parseJsonField(backendUni.foreign_student_opps),
+    exchangePrograms: backendUni.exchange_programs ?? [], // Только если есть конкретные программы
+    partners: backendUni.partners ?? [],
+    foreignStudentOpps: backendUni.foreign_student_opps ?? [],
     hasExchangeProgram: backendUni.exchange_program,
     hasDoubleDegree: backendUni.double_degree_program,
     requiresIELTS: backendUni.IELTS_sertificate,
     minIELTS: backendUni.min_ielts ? Number(backendUni.min_ielts) : undefined,
-    doubleDegreePrograms: parseJsonField(backendUni.double_degree_programs), // Только если есть конкретные программы
+    doubleDegreePrograms: backendUni.double_degree_programs ?? [], // Только если есть конкретные программы
   };
 
   return {
@@ -141,6 +116,36 @@ export const getUniversityById = async (id: string): Promise<IUniversity | null>
   }
 };
 
+// Университеты сравнения и избранного одним запросом, в порядке ids; отсутствующие пропускаются
+export const getUniversitiesByIds = async (ids: string[]): Promise<IUniversity[]> => {
+  const universityIds = ids.map(id => parseInt(id, 10)).filter(id => !isNaN(id));
+  if (universityIds.length === 0) {
+    return [];
+  }
+  try {
+    // Длинный список не помещается в URL — тогда POST с тем же ответом
+    const response = universityIds.length > 100
+      ? await api.post<{ items: IBackendUniversity[]; missing: number[] }>('/get', { ids: universityIds })
+      : await api.get<{ items: IBackendUniversity[]; missing: number[] }>('/get', { params: { ids: universityIds.join(',') } });
+    return response.data.items.map(uni => adaptUniversity(uni, []));
+  } catch (error) {
+    console.error('Ошибка при получении университетов:', error);
+    // Fallback на mock данные
+    return mockUniversities.filter(u => ids.includes(u.id));
+  }
+};
+
+// Города, языки, степени и диапазоны для панели фильтров — без загрузки самих университетов
+export const getFacets = async (filters: IFacetFilters = {}): Promise<IFacets | null> => {
+  try {
+    const response = await api.get<IFacets>('/facets', { params: filters });
+    return response.data;
+  } catch (error) {
+    console.error('Ошибка при получении фасетов:', error);
+    return null;
+  }
+};
+
 export const getAiRecommendation = async (data: IAdvisorRequest): Promise<IAdvisorResponse> => {
   try {
     const response = await api.post<IAdvisorResponse>('/advisor/recommend', data);
@@ -1,7 +1,8 @@
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 import { Link } from 'react-router-dom';
 import { Heart, Trash2, MapPin, Star } from 'lucide-react';
 import { useFavoritesStore } from '../store/useFavoritesStore';
+import { getUniversitiesByIds } from '../api/universityService';
 import { useLocale } from './LocaleProvider';
 import {
   Dialog,
@@ -18,10 +19,22 @@ interface FavoritesModalProps {
 }
 
 const FavoritesModal = ({ children }: FavoritesModalProps) => {
-  const { favorites, removeFromFavorites } = useFavoritesStore();
+  const { favorites, removeFromFavorites, updateFavorites } = useFavoritesStore();
   const { t } = useLocale();
   const [open, setOpen] = useState(false);
 
+  // Избранное хранится в localStorage: при открытии обновляем цены и баллы одним запросом
+  useEffect(() => {
+    if (!open) {
+      return;
+    }
+    const ids = useFavoritesStore.getState().favorites.map((u) => u.id);
+    if (ids.length === 0) {
+      return;
+    }
+    getUniversitiesByIds(ids).then(updateFavorites);
+  }, [open, updateFavorites]);
+
   return (
     <Dialog open={open} onOpenChange={setOpen}>
       <DialogTrigger asChild>{children}</DialogTrigger>
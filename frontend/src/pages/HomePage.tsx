@@ -28,8 +28,8 @@ import { useCompareStore } from '../store/useCompareStore';
 import { useLocale } from '@/components/LocaleProvider';
 import UniversityCard from '@/components/UniversityCard';
 import AdvisorModal from '@/components/AdvisorModal';
-import { getAiRecommendation, getUniversities } from '../api/universityService';
-import type { IAdvisorRequest, IAdvisorResponse, IUniversity } from '../types';
+import { getAiRecommendation, getFacets, getUniversities } from '../api/universityService';
+import type { IAdvisorRequest, IAdvisorResponse, IFacets, IUniversity } from '../types';
 
 const ITEMS_PER_PAGE = 9;
 
@@ -157,6 +157,7 @@ const HomePage = () => {
   const [isAdvisorModalOpen, setIsAdvisorModalOpen] = useState<boolean>(false);
   const [advisorRecommendation, setAdvisorRecommendation] = useState<IAdvisorResponse | null>(null);
   const [universities, setUniversities] = useState<IUniversity[]>([]);
+  const [facets, setFacets] = useState<IFacets | null>(null);
   const [isLoading, setIsLoading] = useState<boolean>(true);
   const [viewMode, setViewMode] = useState<'grid' | 'list'>('grid');
   const catalogRef = useRef<HTMLDivElement>(null);
@@ -180,20 +181,28 @@ const HomePage = () => {
     };
 
     loadUniversities();
+    // Варианты фильтров считает сервер; без ответа — из загруженного списка
+    getFacets().then(setFacets);
   }, []);
 
   // Получаем уникальные города
   const cities = useMemo(() => {
+    if (facets) {
+      return facets.cities.map((c) => c.value).sort();
+    }
     const citySet = new Set(
       universities
         .map((u) => u.city)
         .filter((city) => city && city !== 'string' && city.trim() !== '')
     );
     return Array.from(citySet).sort();
-  }, [universities]);
+  }, [facets, universities]);
 
   // Получаем уникальные языки (нормализуем регистр)
   const languages = useMemo(() => {
+    if (facets) {
+      return facets.languages.map((l) => l.value).sort();
+    }
     const languageMap = new Map<string, string>(); // храним нормализованную версию как ключ
     universities.forEach((u) => {
       if (u.languages) {
@@ -210,7 +219,7 @@ const HomePage = () => {
       }
     });
     return Array.from(languageMap.values()).sort();
-  }, [universities]);
+  }, [facets, universities]);
 
   // Вычисляем диапазон цен один раз
   const priceRangeData = useMemo(() => getPriceRange(universities), []);
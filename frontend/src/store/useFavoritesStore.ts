@@ -7,6 +7,7 @@ interface FavoritesStore {
   addToFavorites: (university: IUniversity) => void;
   removeFromFavorites: (id: string) => void;
   isFavorite: (id: string) => boolean;
+  updateFavorites: (universities: IUniversity[]) => void;
 }
 
 export const useFavoritesStore = create<FavoritesStore>()(
@@ -25,6 +26,11 @@ export const useFavoritesStore = create<FavoritesStore>()(
       isFavorite: (id) => {
         return get().favorites.some((u) => u.id === id);
       },
+      updateFavorites: (universities) => {
+        // Заменяем сохраненные копии свежими данными; вузы без ответа остаются как были
+        const fresh = new Map(universities.map((u) => [u.id, u]));
+        set({ favorites: get().favorites.map((u) => fresh.get(u.id) ?? u) });
+      },
     }),
     {
       name: 'favorites-storage',
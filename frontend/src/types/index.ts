@@ -80,14 +80,14 @@ export interface IBackendUniversity {
   has_military_dept?: boolean;
   rating: number;
   has_tour: boolean;
-  languages: string; // JSON строка или разделенная запятыми
+  languages: string[] | null;
   number_of_grants: number;
   exchange_program: boolean;
-  exchange_programs?: string | null; // JSON строка
-  partners?: string | null; // JSON строка
-  foreign_student_opps?: string | null; // JSON строка
+  exchange_programs?: string[] | null;
+  partners?: string[] | null;
+  foreign_student_opps?: string[] | null;
   double_degree_program: boolean;
-  double_degree_programs?: string | null; // JSON строка
+  double_degree_programs?: string[] | null;
   IELTS_sertificate: boolean;
   min_ielts?: number | null; // Минимальный балл IELTS
   format: string; // "private" или "public"
@@ -122,3 +122,36 @@ export interface IBackendAdmissionInfo {
   procedure: string | null;
 }
 
+
+// Фасеты панели фильтров (GET /api/facets)
+export interface IFacetCount {
+  value: string;
+  count: number;
+}
+
+export interface IFacetHistogram {
+  min: number | null;
+  max: number | null;
+  buckets: { from: number; to: number; count: number }[];
+}
+
+export interface IFacets {
+  total: number;
+  cities: IFacetCount[];
+  languages: IFacetCount[];
+  degrees: IFacetCount[];
+  flags: Record<'has_dormitory' | 'has_military_dept' | 'ielts_required', { true: number; false: number }>;
+  price: IFacetHistogram;
+  min_ent_score: IFacetHistogram;
+}
+
+export interface IFacetFilters {
+  city?: string;
+  has_dormitory?: boolean;
+  price_min?: number;
+  price_max?: number;
+  language?: string;
+  min_ent_score?: number;
+  degree?: string;
+  search?: string;
+}